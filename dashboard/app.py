@@ -1,33 +1,193 @@
 # import libraries & dash
-from dash import Dash, dcc, html, Input, Output
+import functools
+import os
+
+from dash import Dash, ctx, dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
+from flask import Response, g, has_request_context, jsonify
 import dash_bootstrap_components as dbc
 import pandas as pd
-import plotly.express as px
 
 # import data processing and ml component functions
-from dashboard.data_loader import load_and_clean_data, prepare_monthly_sales
-from dashboard.components.similarity import compute_item_similarity, generate_similarity_heatmap, get_top_similar_items
+from dashboard.artifacts import ARTIFACT_ROOT, artifact_path, load_artifact, read_manifest, save_artifacts
+from dashboard.build_artifacts import STAGES, compute_artifact
+from dashboard.cache import LRUCache, cached_figure
+from dashboard.registry import DataRegistry
+from dashboard.metrics import metrics
+from dashboard.shared_state import SharedState
+from dashboard.batch_forecast import FORECAST_FILE, MAX_HORIZON, load_batch_forecasts, batch_forecast
+from dashboard.order_search import ORDERS_FILE, load_item_orders
+from dashboard.jobs import FIT_CACHE_COUNTERS, JOB_WORKERS, JobQueue, forecast_figure, split_fit_cache
+from dashboard.components.similarity import generate_similarity_heatmap, get_top_similar_items, heatmap_items, similarity_submatrix
+from dashboard.cube import GRANULARITIES
 from dashboard.components.sales_trends import plot_seasonal_sales_trends
-from dashboard.components.forecast import forecast_item_backtest, forecast_item_future
-from dashboard.components.bundles import generate_bundle_recommendations
-from dashboard.components.segmentation import segment_sales_by_review_and_payment
-from dashboard.components.customer_insights import get_customer_purchase_history, plot_customer_review_trend
-from dashboard.components.timing import calculate_item_timing
-
-# load data & process the data
-df = load_and_clean_data()
-monthly_sales = prepare_monthly_sales(df)
-user_item_matrix = df.pivot_table(index='customerID', columns='item', values='review', aggfunc='mean')
-similarity_df = compute_item_similarity(user_item_matrix)
-bundle_df = generate_bundle_recommendations(df, similarity_df)
-segmented_df = segment_sales_by_review_and_payment(df)
-timing_df = calculate_item_timing(monthly_sales)
+from dashboard.components.forecast import prepare_item_series, plot_backtest, plot_future, fit_cache, NO_SEASONAL_ORDER
+from dashboard.components.customer_insights import (get_customer_purchase_history, plot_review_trend, customer_options,
+                                                    history_columns, CUSTOMER_PAGE_SIZE)
+from dashboard.components.timing import plot_seasonality_profiles
+from dashboard.components.fast_forecast import FAST_MODELS, fast_batch_forecasts
+
+# source export behind every tab
+CSV = "retail_sales.csv"
+
+# every derived dataset is a named provider that runs the first time a tab or callback asks for it
+# (timed into the metrics under kind="dataset")
+data = DataRegistry(wrap=lambda name, provider: metrics.timed('dataset', name)(provider))
+
+# the store a loader process published (python -m dashboard.shared_state), shared by every worker;
+# when a new version appears the registry starts over from it
+shared_state = SharedState(ARTIFACT_ROOT, on_change=lambda state: data.invalidate())
+
+# this process's own store for CSV, served while nothing is published
+local_store = artifact_path(CSV)
+
+def store_path():
+    published = shared_state.current()
+    return published.path if published is not None else local_store
+
+def data_version():
+    # data/code version being served; cached figures and job results are keyed by it
+    return store_path().name
+
+def load_table(name):
+    # one table from the published version, else from the precomputed data (python -m
+    # dashboard.build_artifacts); on a cold store only the stages this table needs run, on top of the
+    # tables already computed
+    published = shared_state.current()
+    path, manifest = (published.path, published.manifest) if published is not None else (local_store, None)
+    manifest = manifest or read_manifest(path)
+    if manifest is not None:
+        return load_artifact(path, name, manifest)
+
+    table = compute_artifact(name, lambda dependency: CSV if dependency == 'csv' else data[dependency])
+    if all(data.loaded(other) for other in STAGES if other != name):
+        # every table is computed now (the prewarm gets there), so store them for the next worker;
+        # a read-only deploy just keeps serving the computed tables
+        try:
+            save_artifacts({other: table if other == name else data[other] for other in STAGES}, local_store)
+        except OSError:
+            pass
+    return table
+
+for name in STAGES:
+    data.register(name, lambda name=name: load_table(name))
+
+@data.provides('batch_forecasts')
+def load_forecasts():
+    # forecasts precomputed offline (python -m dashboard.batch_forecast), if a batch run exists
+    return load_batch_forecasts(store_path() / FORECAST_FILE)
+
+# the fast models fit the whole catalogue in one vectorized pass, on first use, in the batch layout
+for model in FAST_MODELS:
+    data.register(f'fast_forecasts:{model}',
+                  lambda model=model: fast_batch_forecasts(data['monthly_sales'], model, MAX_HORIZON))
+
+@data.provides('item_orders')
+def load_orders():
+    # per-item arima orders picked by python -m dashboard.order_search (hand-picked defaults otherwise)
+    return load_item_orders(store_path() / ORDERS_FILE)
+
+@data.provides('item_options')
+def item_options():
+    return [{'label': i, 'value': i} for i in sorted(data['df']['item'].unique())]
+
+@data.provides('first_customer')
+def first_customer():
+    # the first purchase with a customer id, as a plain int (the column is float when some ids are blank)
+    return int(data['df']['customerID'].dropna().iloc[0])
+
+@data.provides('similarity_heatmap')
+def similarity_heatmap():
+    # only the corner of the similarity matrix the heatmap shows is built
+    user_item_matrix = data['user_item_matrix']
+    return generate_similarity_heatmap(similarity_submatrix(user_item_matrix, heatmap_items(user_item_matrix)),
+                                       total_items=len(user_item_matrix.items))
+
+@data.provides('timing_table')
+def timing_table():
+    # first/peak month and lead time with each item's peak and trough season
+    timing_df = data['seasonality_df'][[
+        'item', 'first_month', 'peak_month', 'lead_time_months', 'peak_season', 'trough_season', 'seasonal_strength'
+    ]].round({'seasonal_strength': 2})
+    return {
+        'data': [{
+            'type': 'table',
+            'header': {'values': list(timing_df.columns)},
+            'cells': {'values': [timing_df[col] for col in timing_df.columns]}
+        }],
+        'layout': {'height': 1000}
+    }
+
+@data.provides('seasonality_heatmap')
+def seasonality_heatmap():
+    return plot_seasonality_profiles(data['seasonality_df'])
+
+# live forecasts run as background jobs so a slow fit never holds a request thread
+jobs = JobQueue(initializer=split_fit_cache, initargs=(JOB_WORKERS,))
+
+# serialized figures per callback input, so repeat views skip rebuilding and validating them
+figure_cache = LRUCache(maxsize=int(os.environ.get('FIGURE_CACHE_SIZE', 256)))
 
 # dash app with bootstrap theme
 app = Dash(__name__, external_stylesheets=[dbc.themes.LUX], suppress_callback_exceptions=True
 )
 server = app.server
 
+# hit/miss counters of the fitted-model caches for scraping; the fits run in the job workers, which
+# report their counters with every job, so these are totals over all workers (see dashboard.jobs)
+@server.route('/stats/forecast-cache')
+def forecast_cache_stats():
+    counters = jobs.counters('fit_cache_')
+    return jsonify({
+        **{name: counters.get(name, 0) for name in FIT_CACHE_COUNTERS},
+        'workers': jobs.workers,
+        'maxsize_per_worker': max(1, fit_cache.maxsize // jobs.workers),
+    })
+
+@server.route('/stats/figure-cache')
+def figure_cache_stats():
+    return jsonify(figure_cache.stats())
+
+# latency/error/payload histograms per callback, dataset and pipeline stage for prometheus to scrape
+@server.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# the latest sampled cProfile/tracemalloc reports per function (DASHBOARD_PROFILE_RATE > 0)
+@server.route('/metrics/profiles')
+def metric_profiles():
+    return jsonify(metrics.profiles())
+
+# size of each callback response, attributed to the callback that produced it (see instrumented)
+@server.after_request
+def record_payload(response):
+    callback = g.pop('callback', None)
+    if callback is not None:
+        metrics.observe_payload('callback', callback, response.calculate_content_length() or 0)
+    return response
+
+def instrumented(callback):
+    # time every dash callback (PreventUpdate is flow control, not an error) and tag the request with
+    # its name so the response size lands on the same series
+    timed = metrics.timed('callback', expected=(PreventUpdate,))(callback)
+
+    @functools.wraps(callback)
+    def wrapper(*args):
+        if has_request_context():
+            g.callback = callback.__name__
+        return timed(*args)
+    return wrapper
+
+# between requests, swap to a newly published version (one stat of the header most of the time)
+@server.before_request
+def follow_published_state():
+    shared_state.current()
+
+# answers as soon as the server listens; lists which datasets are materialized so far
+@server.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok', 'version': data_version(), 'data': data.status()})
+
 # layout per tab
 home_layout = dbc.Container([
     html.H3("Machine Learning vs Fashion Trends"),
@@ -62,114 +222,133 @@ home_layout = dbc.Container([
     ], className="mt-4")
 
 
-sales_layout = dbc.Container([
-    html.H2("Seasonal Sales Trends"),
-    dcc.Dropdown(
-        id='sales-dropdown',
-        options=[{'label': i, 'value': i} for i in sorted(df['item'].unique())],
-        value=['Tunic', 'Jeans'],
-        multi=True,
-        placeholder='Select items'
-    ),
-    dcc.Graph(id='sales-graph')
-], className="mt-4")
-
-forecast_layout = dbc.Container([
-    html.H2("Forecasting Sales"),
-    html.Label("Select Item:"),
-    dcc.Dropdown(
-        id='forecast-dropdown',
-        options=[{'label': i, 'value': i} for i in sorted(df['item'].unique())],
-        value='Tunic'
-    ),
-    html.Label("Forecast Type:"),
-    dcc.RadioItems(
-        id='forecast-type',
-        options=[
-            {'label': 'Testing', 'value': 'backtest'},
-            {'label': 'Future', 'value': 'future'}
-        ],
-        value='backtest',
-        inline=True
-    ),
-    html.Label("Forecast Period (months):"),
-    dcc.Slider(
-        id='forecast-slider',
-        min=3,
-        max=24,
-        step=1,
-        value=6,
-        marks={i: str(i) for i in range(3, 25, 3)}
-    ),
-    dcc.Graph(id='forecast-graph')
-], className="mt-4")
-
-similarity_layout = dbc.Container([
-    html.H2("Item Similarity", className="mb-4"),
-    dbc.Row([
-        dbc.Col(dcc.Graph(figure=generate_similarity_heatmap(similarity_df)), md=7),
-        dbc.Col([
-            html.H5("Find Top 5 Similar Items"),
-            dcc.Dropdown(
-                id='similar-item-dropdown',
-                options=[{'label': item, 'value': item} for item in similarity_df.columns],
-                placeholder='Select item to find similar products',
-                style={'marginBottom': '20px'}
-            ),
-            dcc.Graph(id='similar-items-table')
-        ], md=5)
-    ])
-], className="mt-4")
-
-bundle_layout = dbc.Container([
-    html.H2("Bundle Recommendations"),
-    dcc.Dropdown(
-        id='bundle-dropdown',
-        options=[{'label': i, 'value': i} for i in bundle_df['item'].unique()],
-        value='Tunic'
-    ),
-    dcc.Graph(id='bundle-graph')
-], className="mt-4")
-
-segmentation_layout = dbc.Container([
-    html.H2("Sales by Payment & Review Level"),
-    dcc.Dropdown(
-        id='segmentation-dropdown',
-        options=[{'label': i, 'value': i} for i in segmented_df['item'].unique()],
-        value='Tunic'
-    ),
-    dcc.Graph(id='segmentation-graph')
-], className="mt-4")
-
-customer_layout = dbc.Container([
-    html.H2("Customer Purchase History"),
+def sales_layout():
+    return dbc.Container([
+        html.H2("Seasonal Sales Trends"),
+        dcc.Dropdown(
+            id='sales-dropdown',
+            options=data['item_options'],
+            value=['Tunic', 'Jeans'],
+            multi=True,
+            placeholder='Select items'
+        ),
+        dcc.RadioItems(
+            id='sales-granularity',
+            options=[{'label': g.capitalize(), 'value': g} for g in GRANULARITIES],
+            value='month',
+            inline=True,
+            inputStyle={'margin-right': '5px', 'margin-left': '15px'}
+        ),
+        dcc.Graph(id='sales-graph')
+    ], className="mt-4")
+
+def forecast_layout():
+    return dbc.Container([
+        html.H2("Forecasting Sales"),
+        html.Label("Select Item:"),
+        dcc.Dropdown(
+            id='forecast-dropdown',
+            options=data['item_options'],
+            value='Tunic'
+        ),
+        html.Label("Forecast Type:"),
+        dcc.RadioItems(
+            id='forecast-type',
+            options=[
+                {'label': 'Testing', 'value': 'backtest'},
+                {'label': 'Future', 'value': 'future'}
+            ],
+            value='backtest',
+            inline=True
+        ),
+        html.Label("Model:"),
+        dcc.RadioItems(
+            id='forecast-model',
+            options=[{'label': 'ARIMA', 'value': 'arima'}] +
+                    [{'label': label, 'value': model} for model, label in FAST_MODELS.items()],
+            value='arima',
+            inline=True
+        ),
+        html.Label("Forecast Period (months):"),
+        dcc.Slider(
+            id='forecast-slider',
+            min=3,
+            max=24,
+            step=1,
+            value=6,
+            marks={i: str(i) for i in range(3, 25, 3)}
+        ),
+        dcc.Graph(id='forecast-graph'),
+        # polls for a background forecast while one is running
+        dcc.Interval(id='forecast-poll', interval=1000, disabled=True)
+    ], className="mt-4")
+
+def similarity_layout():
+    return dbc.Container([
+        html.H2("Item Similarity", className="mb-4"),
+        dbc.Row([
+            dbc.Col(dcc.Graph(figure=data['similarity_heatmap']), md=7),
+            dbc.Col([
+                html.H5("Find Top 5 Similar Items"),
+                dcc.Dropdown(
+                    id='similar-item-dropdown',
+                    options=[{'label': item, 'value': item} for item in data['neighbor_index'].items],
+                    placeholder='Select item to find similar products',
+                    style={'marginBottom': '20px'}
+                ),
+                dcc.Graph(id='similar-items-table')
+            ], md=5)
+        ])
+    ], className="mt-4")
+
+def bundle_layout():
+    return dbc.Container([
+        html.H2("Bundle Recommendations"),
+        dcc.Dropdown(
+            id='bundle-dropdown',
+            options=[{'label': i, 'value': i} for i in data['bundle_df']['item'].unique()],
+            value='Tunic'
+        ),
+        dcc.Graph(id='bundle-graph')
+    ], className="mt-4")
+
+def segmentation_layout():
+    return dbc.Container([
+        html.H2("Sales by Payment & Review Level"),
+        dcc.Dropdown(
+            id='segmentation-dropdown',
+            options=[{'label': i, 'value': i} for i in data['sales_cube'].items],
+            value='Tunic'
+        ),
+        dcc.Graph(id='segmentation-graph')
+    ], className="mt-4")
+
+def customer_layout():
+    return dbc.Container([
+        html.H2("Customer Purchase History"),
     
-    dcc.Dropdown(
-        id='customer-dropdown',
-        options=[{'label': i, 'value': i} for i in df['customerID'].unique()],
-        value=df['customerID'].unique()[0],
-        style={'marginBottom': '20px'}
-    ),
+        # options are filled server-side from what the user types (see update_customer_options)
+        dcc.Dropdown(
+            id='customer-dropdown',
+            options=[{'label': data['first_customer'], 'value': data['first_customer']}],
+            value=data['first_customer'],
+            placeholder='Type a customer id',
+            style={'marginBottom': '20px'}
+        ),
     
-    dbc.Row([
-        dbc.Col(html.Div(id='customer-table'), md=6),
-        dbc.Col(dcc.Graph(id='customer-review-graph'), md=6)
-    ])
-], className="mt-4")
-
-timing_layout = dbc.Container([
-    html.H2("Item Timing Table"),
-    dcc.Graph(
-        figure={
-            'data': [{
-                'type': 'table',
-                'header': {'values': list(timing_df.columns)},
-                'cells': {'values': [timing_df[col] for col in timing_df.columns]}
-            }],
-            'layout': {'height': 1000}
-        }
-    )
-], className="mt-4")
+        dbc.Row([
+            dbc.Col(html.Div(id='customer-table'), md=6),
+            dbc.Col(dcc.Graph(id='customer-review-graph'), md=6)
+        ])
+    ], className="mt-4")
+
+def timing_layout():
+    return dbc.Container([
+        html.H2("Item Timing Table"),
+        dcc.Graph(figure=data['timing_table']),
+        html.H2("Seasonality Profiles"),
+        dcc.Graph(figure=data['seasonality_heatmap'])
+    ], className="mt-4")
 
 # navigation layout
 app.layout = dbc.Container([
@@ -191,46 +370,118 @@ app.layout = dbc.Container([
 
 # callback to render tab content
 @app.callback(Output('tabs-content', 'children'), Input('tabs', 'value'))
+@instrumented
 def render_tab(tab):
     if tab == 'tab-home':
         return home_layout
     elif tab == 'tab-sales':
-        return sales_layout
+        return sales_layout()
     elif tab == 'tab-forecast':
-        return forecast_layout
+        return forecast_layout()
     elif tab == 'tab-similarity':
-        return similarity_layout
+        return similarity_layout()
     elif tab == 'tab-bundles':
-        return bundle_layout
+        return bundle_layout()
     elif tab == 'tab-segmentation':
-        return segmentation_layout
+        return segmentation_layout()
     elif tab == 'tab-customers':
-        return customer_layout
+        return customer_layout()
     elif tab == 'tab-timing':
-        return timing_layout
+        return timing_layout()
 
 # callbacks to update visualizations
-@app.callback(Output('sales-graph', 'figure'), Input('sales-dropdown', 'value'))
-def update_sales_trends(items):
-    return plot_seasonal_sales_trends(monthly_sales, items)
+@app.callback(Output('sales-graph', 'figure'),
+              Input('sales-dropdown', 'value'),
+              Input('sales-granularity', 'value'),
+              Input('sales-graph', 'relayoutData'))
+@instrumented
+def update_sales_trends(items, granularity, relayout):
+    # zooming redraws only the visible window, downsampled to the same point budget
+    start, end = zoom_window(relayout)
+    if ctx.triggered_id == 'sales-graph' and start is None and not (relayout or {}).get('xaxis.autorange'):
+        # relayouts that don't touch the date axis (y zoom, autosize) leave the figure as it is
+        raise PreventUpdate
+    return sales_trends_figure(items, granularity, start, end)
+
+@cached_figure(figure_cache, data_version)
+def sales_trends_figure(items, granularity, start, end):
+    return plot_seasonal_sales_trends(data['sales_rollups'], items, granularity, start, end)
+
+def zoom_window(relayout):
+    # (start, end) dates of a date-axis zoom in relayoutData, (None, None) for the full history
+    relayout = relayout or {}
+    if 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        bounds = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        bounds = relayout['xaxis.range']
+    else:
+        return None, None
+    # whole days, so nearby zooms share cached figures
+    start, end = (pd.Timestamp(bound) for bound in bounds)
+    return start.floor('D').strftime('%Y-%m-%d'), end.ceil('D').strftime('%Y-%m-%d')
 
 @app.callback(Output('forecast-graph', 'figure'),
+              Output('forecast-poll', 'disabled'),
               Input('forecast-dropdown', 'value'),
               Input('forecast-type', 'value'),
-              Input('forecast-slider', 'value'))
-def update_forecast(item, forecast_type, period):
+              Input('forecast-slider', 'value'),
+              Input('forecast-model', 'value'),
+              Input('forecast-poll', 'n_intervals'))
+@instrumented
+def update_forecast(item, forecast_type, period, model, _):
+    # the fast models are sliced from their all-items arrays, no fitting per request
+    if model in FAST_MODELS:
+        return fast_forecast_figure(model, item, forecast_type, period), True
+
+    # slice the precomputed batch forecasts instead of fitting inside the request when possible
+    if batch_forecast(data['batch_forecasts'], item, forecast_type, period) is not None:
+        return batch_forecast_figure(item, forecast_type, period), True
+
+    # otherwise fit in the background job pool and poll until the figure is ready
+    # (the backtest ignores the slider, so its key leaves the period out)
+    order, seasonal_order = data['item_orders'].get(item, (None, NO_SEASONAL_ORDER))
+    periods = period if forecast_type == 'future' else None
+    store = store_path()
+    key = f"forecast:{store.name}:{item}:{forecast_type}:{periods}:{order}:{seasonal_order}"
+    # a poll only reads the job; changing an input is a new request, which retries a failed fit
+    status, value = jobs.run(key, forecast_figure, CSV, ARTIFACT_ROOT,
+                             item, forecast_type, period, order, seasonal_order, str(store),
+                             retry=ctx.triggered_id != 'forecast-poll')
+    if status == 'done':
+        return value, True
+    if status == 'failed':
+        return {'data': [], 'layout': {'title': f"forecast failed: {value}"}}, True
+    return {'data': [], 'layout': {'title': f"fitting forecast for {item}..."}}, False
+
+@cached_figure(figure_cache, data_version)
+def batch_forecast_figure(item, forecast_type, period):
+    forecast = batch_forecast(data['batch_forecasts'], item, forecast_type, period)
+    item_data = prepare_item_series(data['monthly_sales'], item)
+    if forecast_type == 'future':
+        return plot_future(item_data, item, period, *forecast)
+    return plot_backtest(item_data, item, *forecast)
+
+@cached_figure(figure_cache, data_version)
+def fast_forecast_figure(model, item, forecast_type, period):
+    forecast = batch_forecast(data[f'fast_forecasts:{model}'], item, forecast_type, period)
+    if forecast is None:
+        return {'data': [], 'layout': {'title': f"not enough data for {item}"}}
+    item_data = prepare_item_series(data['monthly_sales'], item)
     if forecast_type == 'future':
-        return forecast_item_future(monthly_sales, item, period)
+        fig = plot_future(item_data, item, period, *forecast)
     else:
-        return forecast_item_backtest(monthly_sales, item)
+        fig = plot_backtest(item_data, item, *forecast)
+    return fig.update_layout(title=f"{fig.layout.title.text} | {FAST_MODELS[model].lower()}")
 
 @app.callback(Output('similar-items-table', 'figure'), Input('similar-item-dropdown', 'value'))
+@instrumented
+@cached_figure(figure_cache, data_version)
 def update_similar_items(item_name):
     if not item_name:
         # return an empty layout 
         return {'data': [], 'layout': {'xaxis': {'visible': False}, 'yaxis': {'visible': False}}}
     
-    df_top = get_top_similar_items(similarity_df, item_name)
+    df_top = get_top_similar_items(data['neighbor_index'], item_name)
     return {
         'data': [{
             'type': 'table',
@@ -241,7 +492,10 @@ def update_similar_items(item_name):
     }
 
 @app.callback(Output('bundle-graph', 'figure'), Input('bundle-dropdown', 'value'))
+@instrumented
+@cached_figure(figure_cache, data_version)
 def update_bundle_chart(item):
+    bundle_df = data['bundle_df']
     df_bundles = bundle_df[bundle_df['item'] == item]
     return {
         'data': [{
@@ -259,8 +513,10 @@ def update_bundle_chart(item):
     }
 
 @app.callback(Output('segmentation-graph', 'figure'), Input('segmentation-dropdown', 'value'))
+@instrumented
+@cached_figure(figure_cache, data_version)
 def update_segmentation(item):
-    df_seg = segmented_df[segmented_df['item'] == item]
+    df_seg = data['sales_cube'].item_segments(item)
     return {
         'data': [{
             'type': 'bar',
@@ -278,20 +534,39 @@ def update_segmentation(item):
         }
     }
 
+@app.callback(Output('customer-dropdown', 'options'),
+              Input('customer-dropdown', 'search_value'),
+              State('customer-dropdown', 'value'))
+@instrumented
+def update_customer_options(search_value, value):
+    # a bounded page of ids matching the typed prefix; the full customer list never leaves the server
+    if not search_value:
+        raise PreventUpdate
+    return customer_options(data['customer_index'], search_value, value, CUSTOMER_PAGE_SIZE)
+
 @app.callback(Output('customer-table', 'children'),
               Output('customer-review-graph', 'figure'),
               Input('customer-dropdown', 'value'))
+@instrumented
 def update_customer_view(customer_id):
-    history = get_customer_purchase_history(df, customer_id)
+    # the table reads one contiguous slice of the customer index
+    history = get_customer_purchase_history(data['customer_index'], customer_id)
+    columns = [history[col].tolist() for col in history_columns]
     table = html.Table([
-        html.Thead(html.Tr([html.Th(col) for col in ['date', 'item', 'amount_usd', 'review', 'payment']])),
-        html.Tbody([
-            html.Tr([html.Td(row[col]) for col in ['date', 'item', 'amount_usd', 'review', 'payment']])
-            for _, row in history.iterrows()
-        ])
+        html.Thead(html.Tr([html.Th(col) for col in history_columns])),
+        html.Tbody([html.Tr([html.Td(value) for value in row]) for row in zip(*columns)])
     ])
-    review_fig = plot_customer_review_trend(df, customer_id)
+    review_fig = customer_review_figure(customer_id)
     return table, review_fig
 
+@cached_figure(figure_cache, data_version)
+def customer_review_figure(customer_id):
+    # a repeat view comes straight from the figure cache; a miss costs one more o(1) index slice
+    return plot_review_trend(get_customer_purchase_history(data['customer_index'], customer_id), customer_id)
+
+# materialize the datasets in the background once the server is up (DASHBOARD_PREWARM=0 keeps it fully lazy)
+if os.environ.get('DASHBOARD_PREWARM', '1') != '0':
+    data.prewarm(delay=float(os.environ.get('DASHBOARD_PREWARM_DELAY', 1.0)))
+
 if __name__ == "__main__":
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from dashboard.data_loader import InteractionMatrix
+from dashboard.components.similarity import NeighborIndex
+from dashboard.components.customer_insights import CustomerIndex
+from dashboard.cube import DIMENSIONS, GRANULARITIES, MEASURES, SalesCube, SalesRollups
+
+# default location of the precomputed artifact store (override with DASHBOARD_ARTIFACTS)
+ARTIFACT_ROOT = os.environ.get('DASHBOARD_ARTIFACTS', 'artifacts')
+
+# bump when the on-disk layout changes
+STORE_FORMAT = 1
+
+# modules whose code shapes the derived tables; editing any of them invalidates the store
+_PACKAGE_DIR = Path(__file__).resolve().parent
+_SOURCE_FILES = ['data_loader.py', 'cube.py', 'artifacts.py', 'build_artifacts.py', 'components/*.py']
+
+def code_version():
+    # hash the source of every module that produces an artifact
+    digest = hashlib.sha256(str(STORE_FORMAT).encode())
+    for pattern in _SOURCE_FILES:
+        for path in sorted(_PACKAGE_DIR.glob(pattern)):
+            digest.update(path.relative_to(_PACKAGE_DIR).as_posix().encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+def source_hash(csv, root=ARTIFACT_ROOT):
+    # hashing a multi-gigabyte export on every start is slow, so digests are remembered per (size, mtime)
+    stat = os.stat(csv)
+    stamp = f"{os.path.abspath(csv)}:{stat.st_size}:{stat.st_mtime_ns}"
+    memo_path = Path(root) / 'source_hashes.json'
+    try:
+        memo = json.loads(memo_path.read_text())
+    except (OSError, ValueError):
+        memo = {}
+    if stamp in memo:
+        return memo[stamp]
+
+    digest = hashlib.sha256()
+    with open(csv, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    memo[stamp] = digest.hexdigest()[:16]
+
+    # best effort: an unwritable store just means hashing again next time
+    try:
+        memo_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = memo_path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_text(json.dumps(memo))
+        os.replace(tmp_path, memo_path)
+    except OSError:
+        pass
+    return memo[stamp]
+
+def artifact_key(csv, root=ARTIFACT_ROOT):
+    # artifacts are valid for one exact source file and one version of the code
+    return f"{source_hash(csv, root)}-{code_version()}"
+
+def artifact_path(csv, root=ARTIFACT_ROOT):
+    return Path(root) / artifact_key(csv, root)
+
+def save_artifacts(artifacts, path):
+    path = Path(path)
+    if (path / 'manifest.json').exists():
+        return path
+
+    # write into a scratch directory and rename it into place, so readers never see a partial store
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    manifest = {'format': STORE_FORMAT, 'artifacts': {}}
+    for name, value in artifacts.items():
+        manifest['artifacts'][name] = _save_value(value, tmp_path / name)
+    (tmp_path / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # another builder won the race; its copy is equivalent
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+def load_artifacts(csv, root=ARTIFACT_ROOT, names=None):
+    # return None when nothing has been built for this csv/code version yet
+    path = artifact_path(csv, root)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return None
+    names = names or list(manifest['artifacts'])
+    return {name: load_artifact(path, name, manifest) for name in names}
+
+def read_manifest(path):
+    try:
+        manifest = json.loads((Path(path) / 'manifest.json').read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != STORE_FORMAT:
+        return None
+    return manifest
+
+def load_artifact(path, name, manifest=None):
+    manifest = manifest or read_manifest(path)
+    return _load_value(manifest['artifacts'][name], Path(path) / name)
+
+# on-disk layout: every array is a plain .npy file so it can be memory-mapped
+# and shared between worker processes through the page cache
+
+def _save_value(value, path):
+    path.mkdir()
+    if isinstance(value, InteractionMatrix):
+        matrix = value.matrix.tocsr()
+        for part in ['data', 'indices', 'indptr']:
+            np.save(path / f'{part}.npy', getattr(matrix, part))
+        return {
+            'kind': 'sparse',
+            'shape': list(matrix.shape),
+            'customers': _save_labels(value.customers, path / 'customers'),
+            'items': _save_labels(value.items, path / 'items'),
+        }
+    if isinstance(value, NeighborIndex):
+        np.save(path / 'neighbors.npy', value.neighbors)
+        np.save(path / 'scores.npy', value.scores)
+        return {'kind': 'neighbors', 'items': _save_labels(value.items, path / 'items')}
+    if isinstance(value, CustomerIndex):
+        np.save(path / 'customers.npy', value.customers)
+        np.save(path / 'offsets.npy', value.offsets)
+        np.save(path / 'search_keys.npy', value.search_keys)
+        np.save(path / 'search_ids.npy', value.search_ids)
+        return {'kind': 'customers', 'history': _save_value(value.history, path / 'history')}
+    if isinstance(value, SalesCube):
+        for name in DIMENSIONS:
+            np.save(path / f'{name}.npy', value.codes[name])
+        for name in MEASURES:
+            np.save(path / f'{name}.npy', value.measures[name])
+        return {
+            'kind': 'cube',
+            'items': _save_labels(value.items, path / 'items'),
+            'months': _save_labels(value.months, path / 'months'),
+            'payments': _save_labels(value.payments, path / 'payments'),
+        }
+    if isinstance(value, SalesRollups):
+        for granularity in GRANULARITIES:
+            np.save(path / f'{granularity}_offsets.npy', value.offsets[granularity])
+            np.save(path / f'{granularity}_periods.npy', value.periods[granularity])
+            for name, values in value.measures[granularity].items():
+                np.save(path / f'{granularity}_{name}.npy', values)
+        return {'kind': 'rollups', 'items': _save_labels(value.items, path / 'items')}
+    if _is_square_matrix(value):
+        np.save(path / 'values.npy', value.to_numpy())
+        return {
+            'kind': 'matrix',
+            'index': _save_labels(value.index, path / 'index'),
+            'columns': _save_labels(value.columns, path / 'columns'),
+        }
+    return {
+        'kind': 'frame',
+        'index': _save_labels(value.index, path / 'index'),
+        'columns': [_save_column(value[col], path / f'col{i}') for i, col in enumerate(value.columns)],
+    }
+
+def _load_value(spec, path):
+    if spec['kind'] == 'sparse':
+        parts = [_mmap(path / f'{part}.npy') for part in ['data', 'indices', 'indptr']]
+        matrix = sparse.csr_matrix(tuple(parts), shape=tuple(spec['shape']), copy=False)
+        return InteractionMatrix(matrix,
+                                 _load_labels(spec['customers'], path / 'customers'),
+                                 _load_labels(spec['items'], path / 'items'))
+    if spec['kind'] == 'neighbors':
+        items = _load_labels(spec['items'], path / 'items')
+        name_to_id = {}
+        for i, name in enumerate(items):
+            name_to_id.setdefault(str(name).lower(), i)
+        return NeighborIndex(items, name_to_id, _mmap(path / 'neighbors.npy'), _mmap(path / 'scores.npy'))
+    if spec['kind'] == 'customers':
+        return CustomerIndex(_load_value(spec['history'], path / 'history'),
+                             _mmap(path / 'customers.npy'), _mmap(path / 'offsets.npy'),
+                             _mmap(path / 'search_keys.npy'), _mmap(path / 'search_ids.npy'))
+    if spec['kind'] == 'cube':
+        return SalesCube(_load_labels(spec['items'], path / 'items'),
+                         _load_labels(spec['months'], path / 'months'),
+                         _load_labels(spec['payments'], path / 'payments'),
+                         {name: _mmap(path / f'{name}.npy') for name in DIMENSIONS},
+                         {name: _mmap(path / f'{name}.npy') for name in MEASURES})
+    if spec['kind'] == 'rollups':
+        return SalesRollups(_load_labels(spec['items'], path / 'items'),
+                            {g: _mmap(path / f'{g}_offsets.npy') for g in GRANULARITIES},
+                            {g: _mmap(path / f'{g}_periods.npy') for g in GRANULARITIES},
+                            {g: {name: _mmap(path / f'{g}_{name}.npy') for name in ['total_sales', 'units_sold']}
+                             for g in GRANULARITIES})
+    if spec['kind'] == 'matrix':
+        return pd.DataFrame(_mmap(path / 'values.npy'),
+                            index=_load_labels(spec['index'], path / 'index'),
+                            columns=_load_labels(spec['columns'], path / 'columns'),
+                            copy=False)
+    columns = {col['name']: _load_column(col, path / f'col{i}') for i, col in enumerate(spec['columns'])}
+    return pd.DataFrame(columns, index=_load_labels(spec['index'], path / 'index'), copy=False)
+
+def _is_square_matrix(value):
+    return (
+        isinstance(value, pd.DataFrame)
+        and len(value.columns) > 0
+        and value.index.equals(value.columns)
+        and all(np.issubdtype(dtype, np.floating) for dtype in value.dtypes)
+    )
+
+def _save_column(series, path):
+    spec = {'name': series.name}
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # categoricals keep their integer codes; categories are small and go in the manifest
+        np.save(f'{path}.npy', series.cat.codes.to_numpy())
+        spec.update(kind='category', categories=series.cat.categories.tolist(),
+                    ordered=bool(series.cat.ordered))
+    elif pd.api.types.is_datetime64_dtype(series.dtype):
+        np.save(f'{path}.npy', series.to_numpy().view('int64'))
+        spec.update(kind='datetime', dtype=str(series.dtype))
+    elif series.dtype == object:
+        # strings are dictionary-encoded so the column stays memory-mappable
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        np.save(f'{path}.npy', codes)
+        spec.update(kind='object', categories=uniques.tolist())
+    else:
+        np.save(f'{path}.npy', series.to_numpy())
+        spec.update(kind='numeric')
+    return spec
+
+def _load_column(spec, path):
+    values = _mmap(f'{path}.npy')
+    if spec['kind'] == 'category':
+        dtype = pd.CategoricalDtype(spec['categories'], ordered=spec['ordered'])
+        return pd.Categorical.from_codes(values, dtype=dtype)
+    if spec['kind'] == 'datetime':
+        return values.view(spec['dtype'])
+    if spec['kind'] == 'object':
+        categories = np.array(spec['categories'] + [np.nan], dtype=object)
+        return categories[values]
+    return values
+
+def _save_labels(index, path):
+    return _save_column(pd.Series(index, name=index.name), path)
+
+def _load_labels(spec, path):
+    values = _load_column(spec, path)
+    if spec['kind'] == 'numeric' and spec['name'] is None and _is_range(values):
+        return pd.RangeIndex(len(values))
+    return pd.Index(values, name=spec['name'])
+
+def _is_range(values):
+    return values.ndim == 1 and np.issubdtype(values.dtype, np.integer) and np.array_equal(values, np.arange(len(values)))
+
+def _mmap(path):
+    # plain read-only ndarray view over the mapped file (the memmap subclass leaks into results otherwise)
+    return np.load(path, mmap_mode='r').view(np.ndarray)
@@ -0,0 +1,136 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dashboard.artifacts import ARTIFACT_ROOT, artifact_path
+from dashboard.build_artifacts import load_or_build_artifacts
+from dashboard.components.forecast import (
+    prepare_item_series, backtest_split, fit_arima_forecast, BACKTEST_ORDER, FUTURE_ORDER, NO_SEASONAL_ORDER
+)
+from dashboard.order_search import ORDERS_FILE, load_item_orders
+
+# longest horizon the forecast slider can ask for
+MAX_HORIZON = 24
+
+# file name of the batch results inside an artifact directory
+FORECAST_FILE = 'forecasts.npz'
+
+def run_batch_forecasts(monthly_sales, max_horizon=MAX_HORIZON, workers=None, orders=None):
+    # fit every item's models in parallel; a single max_horizon forecast covers every shorter
+    # horizon too, since arima forecasts for step h don't depend on how many steps are requested
+    items = sorted(monthly_sales['item'].unique())
+    orders = orders or {}
+    jobs = [
+        (item, prepare_item_series(monthly_sales, item)['Total_Sales'], max_horizon, orders.get(item))
+        for item in items
+    ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_forecast_item, jobs))
+
+    # pack everything into fixed-shape arrays (backtests are nan-padded to the longest test window)
+    n_items = len(items)
+    backtest_width = max([len(r['backtest'][0]) for r in results if r['backtest'] is not None] or [0])
+    forecasts = {
+        'items': np.array(items, dtype=object),
+        'future': np.full((n_items, 3, max_horizon), np.nan),
+        'backtest': np.full((n_items, 3, backtest_width), np.nan),
+        'backtest_steps': np.zeros(n_items, dtype=np.int64),
+        'future_errors': np.array([r['future_error'] or '' for r in results], dtype=object),
+        'backtest_errors': np.array([r['backtest_error'] or '' for r in results], dtype=object),
+    }
+    for i, result in enumerate(results):
+        if result['future'] is not None:
+            forecasts['future'][i] = result['future']
+        if result['backtest'] is not None:
+            steps = len(result['backtest'][0])
+            forecasts['backtest'][i, :, :steps] = result['backtest']
+            forecasts['backtest_steps'][i] = steps
+    return forecasts
+
+def _forecast_item(job):
+    item, sales, max_horizon, searched_order = job
+    result = {'item': item, 'future': None, 'backtest': None, 'future_error': None, 'backtest_error': None}
+
+    # same models as the forecast tab: the searched order when there is one, else the hand-picked defaults
+    future_order, backtest_order, seasonal_order = FUTURE_ORDER, BACKTEST_ORDER, NO_SEASONAL_ORDER
+    if searched_order is not None:
+        future_order = backtest_order = searched_order[0]
+        seasonal_order = searched_order[1]
+
+    # the two fits fail independently, so a failed backtest keeps a good future forecast and vice versa
+    try:
+        result['future'] = np.vstack(fit_arima_forecast(sales, future_order, max_horizon, item, seasonal_order))
+    except Exception as e:
+        result['future_error'] = str(e)
+    if len(sales) >= 12:
+        try:
+            train, test = backtest_split(sales)
+            result['backtest'] = np.vstack(fit_arima_forecast(train, backtest_order, len(test), item, seasonal_order))
+        except Exception as e:
+            result['backtest_error'] = str(e)
+    return result
+
+def save_batch_forecasts(forecasts, path):
+    # write to a temporary name first so the app never loads a half-written file
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **{name: values.astype(str) if values.dtype == object else values
+                          for name, values in forecasts.items()})
+    os.replace(tmp_path, path)
+
+def load_batch_forecasts(path):
+    # return None when no batch run exists for this data/code version
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        forecasts = {name: data[name] for name in data.files}
+
+    # runs saved before the fits were tracked separately have one error per item for both
+    if 'errors' in forecasts:
+        errors = forecasts.pop('errors')
+        forecasts['future_errors'] = forecasts['backtest_errors'] = errors
+    forecasts['index'] = {item: i for i, item in enumerate(forecasts['items'])}
+    return forecasts
+
+def batch_forecast(forecasts, item_name, forecast_type, periods=None):
+    # slice the precomputed (mean, lower, upper) arrays for one item; None means "fit it live"
+    if forecasts is None or item_name not in forecasts['index']:
+        return None
+    i = forecasts['index'][item_name]
+    if forecast_type == 'future':
+        if forecasts['future_errors'][i] or periods > forecasts['future'].shape[2]:
+            return None
+        return tuple(forecasts['future'][i, :, :periods])
+    steps = forecasts['backtest_steps'][i]
+    if forecasts['backtest_errors'][i] or steps == 0:
+        return None
+    return tuple(forecasts['backtest'][i, :, :steps])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="fit forecasts for every item offline")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--root', default=ARTIFACT_ROOT, help="artifact store directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--horizon', type=int, default=MAX_HORIZON, help="longest forecast horizon")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    monthly_sales = load_or_build_artifacts(args.csv, args.root)['monthly_sales']
+
+    # per-item orders from python -m dashboard.order_search, when that has been run first
+    store = artifact_path(args.csv, args.root)
+    orders = load_item_orders(store / ORDERS_FILE)
+    forecasts = run_batch_forecasts(monthly_sales, args.horizon, args.workers, orders)
+
+    path = store / FORECAST_FILE
+    save_batch_forecasts(forecasts, path)
+    failed = {kind: int((forecasts[f'{kind}_errors'] != '').sum()) for kind in ['future', 'backtest']}
+    print(f"{len(forecasts['items'])} items forecast ({failed['future']} future and {failed['backtest']} backtest "
+          f"fits failed) -> {path} ({time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
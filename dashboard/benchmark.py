@@ -0,0 +1,265 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data_loader import (
+    clothing_items, date_format, load_and_clean_data, prepare_monthly_sales, build_interaction_matrix
+)
+from dashboard.components.similarity import compute_item_similarity, build_neighbor_index
+from dashboard.components.bundles import blockwise_bundle_recommendations
+from dashboard.components.segmentation import segment_sales_by_review_and_payment
+from dashboard.components.timing import calculate_item_timing
+from dashboard.components.forecast import fit_cache, forecast_item_backtest, forecast_item_future
+from dashboard.streaming import stream_aggregates
+
+# items that appear in the export but are not clothing, so the cleaning filter has rows to drop
+accessory_items = ['Sandals', 'Bowtie', 'Flip-Flops', 'Sun Hat', 'Backpack', 'Belt', 'Scarf', 'Gloves']
+
+# the dense similarity matrix stage holds several n_items^2 float arrays at once
+MAX_DENSE_ITEMS = 4000
+
+# synthetic data
+
+def synthetic_catalogue(n_items):
+    # the real clothing items first, then numbered variants of them once the list runs out
+    names = list(clothing_items[:n_items])
+    for i in range(len(names), n_items):
+        names.append(f"{clothing_items[i % len(clothing_items)]} {i // len(clothing_items)}")
+    return names
+
+def synthetic_sales(rows, items=30, customers=None, months=13, start='2022-10-01', seed=0,
+                    accessory_share=0.1, missing_amount=0.19, missing_review=0.095):
+    # a frame with the export's schema (customerID, item, amount_usd, date, review, payment) and roughly
+    # its shape: ~20 purchases per customer, long-tailed item popularity and amounts, one decimal reviews,
+    # and the same shares of missing amounts, missing reviews and non-clothing rows
+    rng = np.random.default_rng(seed)
+    customers = customers or max(1, rows // 20)
+    catalogue = synthetic_catalogue(items)
+
+    # zipf-like popularity so large catalogues have a realistic tail of rarely bought items
+    weights = 1.0 / np.arange(1, items + 1) ** 0.8
+    weights = rng.permutation(weights / weights.sum())
+    item_codes = rng.choice(items, size=rows, p=weights)
+    item = pd.Categorical.from_codes(item_codes, categories=catalogue + accessory_items)
+
+    # a share of the rows are accessories, which cleaning drops
+    accessory_rows = rng.random(rows) < accessory_share
+    item[accessory_rows] = np.asarray(accessory_items)[rng.integers(0, len(accessory_items), accessory_rows.sum())]
+
+    # amounts: lognormal around the export's median of ~110 usd
+    amount = np.round(rng.lognormal(np.log(110), 0.9, rows).clip(10, 5000))
+    amount[rng.random(rows) < missing_amount] = np.nan
+
+    review = np.round(rng.uniform(1, 5, rows), 1)
+    review[rng.random(rows) < missing_review] = np.nan
+
+    # dates uniform over the requested months
+    first = pd.Timestamp(start)
+    span_days = (first + pd.DateOffset(months=months) - first).days
+    date = first + pd.to_timedelta(rng.integers(0, span_days, rows), unit='D')
+
+    return pd.DataFrame({
+        'customerID': 4000 + rng.integers(0, customers, rows),
+        'item': item,
+        'amount_usd': amount,
+        'date': date,
+        'review': review,
+        'payment': pd.Categorical.from_codes(rng.integers(0, 2, rows), categories=['Cash', 'Credit Card']),
+    })
+
+def write_synthetic_csv(path, rows, items=30, customers=None, months=13, seed=0, chunk_rows=1_000_000):
+    # written a chunk at a time (each chunk its own seed) so 10^7 rows never sit in memory at once
+    customers = customers or max(1, rows // 20)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    for i, chunk_start in enumerate(range(0, rows, chunk_rows)):
+        chunk = synthetic_sales(min(chunk_rows, rows - chunk_start), items, customers, months, seed=[seed, i])
+        chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False, date_format=date_format)
+    os.replace(tmp_path, path)
+    return path
+
+# measurement
+
+def measure(fn, repeat=1, memory=True, setup=None):
+    # best wall time over `repeat` runs, then one traced run for peak python/numpy allocations
+    seconds = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            result = fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result, {'seconds': min(seconds), 'peak_mb': peak_mb}
+
+def benchmark_pipeline(csv, catalogue, repeat=1, memory=True, forecast_items=5, max_dense_items=MAX_DENSE_ITEMS):
+    # time every stage of the data & model pipeline on one csv; later stages use earlier stages' output
+    parquet = Path(csv).with_suffix('.parquet')
+    stages = []
+
+    def run(name, fn, setup=None, **extra):
+        result, stats = measure(fn, repeat, memory, setup)
+        stages.append({'stage': name, **stats, **extra})
+        return result
+
+    def skip(name, reason):
+        stages.append({'stage': name, 'seconds': None, 'peak_mb': None, 'skipped': reason})
+
+    def clear_fits():
+        fit_cache.clear()
+
+    df = run('load_and_clean_data', lambda: load_and_clean_data(csv, items=catalogue))
+    run('load_and_clean_data[columnar csv]', lambda: load_and_clean_data(csv, columnar=True, items=catalogue),
+        setup=lambda: parquet.unlink(missing_ok=True))
+    df = run('load_and_clean_data[columnar parquet]', lambda: load_and_clean_data(csv, columnar=True, items=catalogue))
+    run('stream_aggregates', lambda: stream_aggregates(csv, items=catalogue))
+    n_items = df['item'].nunique()
+
+    monthly_sales = run('prepare_monthly_sales', lambda: prepare_monthly_sales(df))
+    user_item_matrix = run('build_interaction_matrix', lambda: build_interaction_matrix(df, values='review'))
+    basket = build_interaction_matrix(df)
+    run('build_neighbor_index', lambda: build_neighbor_index(user_item_matrix))
+    run('blockwise_bundle_recommendations', lambda: blockwise_bundle_recommendations(basket, user_item_matrix))
+
+    if n_items <= max_dense_items:
+        run('compute_item_similarity', lambda: compute_item_similarity(user_item_matrix))
+    else:
+        skip('compute_item_similarity', f"{n_items} items > max_dense_items={max_dense_items}")
+
+    run('segment_sales_by_review_and_payment', lambda: segment_sales_by_review_and_payment(df))
+    run('calculate_item_timing', lambda: calculate_item_timing(monthly_sales))
+
+    # arima fits are per item, so only a sample of the best sellers is fitted (cache cleared every run)
+    sample = monthly_sales.groupby('item', observed=True)['Total_Sales'].sum().nlargest(forecast_items).index
+    if len(sample):
+        run('forecast_item_backtest', lambda: [forecast_item_backtest(monthly_sales, item) for item in sample],
+            setup=clear_fits, fitted_items=len(sample))
+        run('forecast_item_future', lambda: [forecast_item_future(monthly_sales, item, 6) for item in sample],
+            setup=clear_fits, fitted_items=len(sample))
+
+    sizes = {'clean_rows': len(df), 'items': int(n_items), 'customers': int(df['customerID'].nunique()),
+             'months': int(df['month'].nunique())}
+    return sizes, stages
+
+def run_suite(rows, items, customers=None, months=13, seed=0, repeat=1, memory=True, forecast_items=5,
+              max_dense_items=MAX_DENSE_ITEMS, data_dir=None):
+    # every rows x items combination; generated csvs are kept in data_dir (and reused) when one is given
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(data_dir or tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        runs = []
+        for n_rows, n_items in itertools.product(rows, items):
+            n_customers = customers or max(1, n_rows // 20)
+            csv = data_dir / f"synthetic_{n_rows}_{n_items}_{n_customers}_{months}_{seed}.csv"
+
+            start = time.perf_counter()
+            if not csv.exists():
+                write_synthetic_csv(csv, n_rows, n_items, n_customers, months, seed)
+            generate_seconds = time.perf_counter() - start
+
+            sizes, stages = benchmark_pipeline(csv, synthetic_catalogue(n_items), repeat, memory,
+                                               forecast_items, max_dense_items)
+            runs.append({
+                'rows': n_rows, 'n_items': n_items, 'n_customers': n_customers, 'n_months': months, 'seed': seed,
+                'generate_seconds': generate_seconds, **sizes, 'stages': stages,
+            })
+            print(f"{n_rows} rows x {n_items} items: "
+                  f"{sum(s['seconds'] or 0 for s in stages):.2f}s over {len(stages)} stages", file=sys.stderr)
+    return {'environment': environment(), 'repeat': repeat, 'runs': runs}
+
+def environment():
+    # enough context to tell whether two result files are comparable
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+# reporting
+
+def results_frame(results):
+    # one row per run and stage
+    return pd.DataFrame([
+        {'rows': run['rows'], 'n_items': run['n_items'], **stage}
+        for run in results['runs'] for stage in run['stages']
+    ])
+
+def compare_results(baseline, current, tolerance=0.2):
+    # current / baseline time and peak memory per matching run and stage; anything more than
+    # `tolerance` slower or bigger is flagged
+    keys = ['rows', 'n_items', 'stage']
+    merged = results_frame(baseline).merge(results_frame(current), on=keys, suffixes=('_base', '_new'))
+    merged['time_ratio'] = merged['seconds_new'] / merged['seconds_base']
+    merged['memory_ratio'] = merged['peak_mb_new'] / merged['peak_mb_base']
+    merged['regression'] = (merged['time_ratio'] > 1 + tolerance) | (merged['memory_ratio'] > 1 + tolerance)
+    return merged[keys + ['seconds_base', 'seconds_new', 'time_ratio', 'peak_mb_base', 'peak_mb_new',
+                          'memory_ratio', 'regression']]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the data & model pipeline on synthetic sales data")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="transaction counts to generate (10^3 to 10^7)")
+    parser.add_argument('--items', type=int, nargs='+', default=[30, 300], help="catalogue sizes (30 to 10^4)")
+    parser.add_argument('--customers', type=int, default=None, help="distinct customers (default: rows / 20)")
+    parser.add_argument('--months', type=int, default=13, help="months of history")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help="timed runs per stage (the best is reported)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced peak-memory run")
+    parser.add_argument('--forecast-items', type=int, default=5, help="items to fit arima forecasts for")
+    parser.add_argument('--max-dense-items', type=int, default=MAX_DENSE_ITEMS,
+                        help="skip the dense similarity matrix stage above this many items")
+    parser.add_argument('--data-dir', default=None, help="keep generated csvs here and reuse them")
+    parser.add_argument('--output', default=None, help="write the results json here")
+    parser.add_argument('--compare', default=None, help="baseline results json to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.rows, args.items, args.customers, args.months, args.seed, args.repeat,
+                        not args.no_memory, args.forecast_items, args.max_dense_items, args.data_dir)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    report = results_frame(results)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    if args.compare:
+        comparison = compare_results(json.loads(Path(args.compare).read_text()), results, args.tolerance)
+        print()
+        print(comparison.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+        if comparison['regression'].any():
+            print(f"{comparison['regression'].sum()} stage(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
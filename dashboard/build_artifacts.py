@@ -0,0 +1,81 @@
+import argparse
+import time
+
+from dashboard.artifacts import ARTIFACT_ROOT, artifact_path, load_artifacts, save_artifacts
+from dashboard.metrics import metrics
+from dashboard.data_loader import load_and_clean_data, prepare_monthly_sales, build_interaction_matrix
+from dashboard.cube import SalesCube, SalesRollups
+from dashboard.components.similarity import build_neighbor_index
+from dashboard.components.bundles import blockwise_bundle_recommendations
+from dashboard.components.customer_insights import build_customer_index
+from dashboard.components.timing import item_timing, seasonality_profiles
+
+# every derived table as (stage function, the tables it is computed from, keyword arguments);
+# 'csv' stands for the source export
+STAGES = {
+    'df': (load_and_clean_data, ['csv'], {'columnar': True}),
+    'monthly_sales': (prepare_monthly_sales, ['df'], {}),
+    'user_item_matrix': (build_interaction_matrix, ['df'], {'values': 'review'}),
+    'basket': (build_interaction_matrix, ['df'], {}),
+    # the item x item similarity is only ever held a block of columns at a time
+    'neighbor_index': (build_neighbor_index, ['user_item_matrix'], {}),
+    'bundle_df': (blockwise_bundle_recommendations, ['basket', 'user_item_matrix'], {}),
+    'sales_cube': (SalesCube.from_frame, ['df'], {}),
+    'segmented_df': (SalesCube.segments, ['sales_cube'], {}),
+    'sales_rollups': (SalesRollups.from_frame, ['df'], {}),
+    # timing is a subset of the seasonality profiles, so the item x month pass runs once
+    'seasonality_df': (seasonality_profiles, ['monthly_sales'], {}),
+    'timing_df': (item_timing, ['seasonality_df'], {}),
+    'customer_index': (build_customer_index, ['df'], {}),
+}
+
+def compute_artifact(name, inputs):
+    # run the stage producing one table, timed into dashboard.metrics; inputs(name) supplies the
+    # tables it depends on (e.g. from a cache, so shared stages run once)
+    fn, depends_on, kwargs = STAGES[name]
+    return metrics.timed('stage')(fn)(*[inputs(dependency) for dependency in depends_on], **kwargs)
+
+def compute_artifacts(csv="retail_sales.csv", names=None):
+    # run the data & model pipeline behind every tab, or only the stages the `names` tables need
+    tables = {'csv': csv}
+
+    def inputs(name):
+        if name not in tables:
+            tables[name] = compute_artifact(name, inputs)
+        return tables[name]
+
+    return {name: inputs(name) for name in (names or STAGES)}
+
+def build_artifacts(csv="retail_sales.csv", root=ARTIFACT_ROOT):
+    # compute the pipeline once and write it to the store for this csv & code version
+    path = artifact_path(csv, root)
+    if not path.exists():
+        save_artifacts(compute_artifacts(csv), path)
+    return path
+
+def load_or_build_artifacts(csv="retail_sales.csv", root=ARTIFACT_ROOT):
+    # memory-map the store when it is current, otherwise compute (and store for the next worker)
+    artifacts = load_artifacts(csv, root)
+    if artifacts is not None:
+        return artifacts
+
+    artifacts = compute_artifacts(csv)
+    try:
+        save_artifacts(artifacts, artifact_path(csv, root))
+    except OSError:
+        # a read-only deploy still serves from the freshly computed tables
+        pass
+    return artifacts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="precompute the dashboard's derived tables")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--root', default=ARTIFACT_ROOT, help="artifact store directory")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    path = build_artifacts(args.csv, args.root)
+    print(f"artifacts ready at {path} ({time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
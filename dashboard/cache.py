@@ -0,0 +1,102 @@
+import functools
+import json
+import threading
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+class LRUCache:
+    # bounded least-recently-used cache with hit/miss/eviction counters, safe to share between threads.
+    # concurrent misses on one key are coalesced: the first caller computes, the rest wait for it
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._inflight = {}   # key -> event set when the computing caller is done
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            # evict the least recently used entries once over capacity
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        # the expensive compute runs outside the lock so other keys stay available meanwhile; a caller
+        # that finds the key already being computed waits and reads the result instead of computing again
+        # (if that computation failed, or its result was evicted already, the next waiter computes)
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+                done = self._inflight.get(key)
+                if done is None:
+                    self.misses += 1
+                    done = self._inflight[key] = threading.Event()
+                    break
+                self.coalesced += 1
+            done.wait()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._inflight),
+            }
+
+def cached_figure(cache, version):
+    # memoize a figure-building function on (function, data version, arguments); the figure is stored
+    # as the same json dash would send, so a repeat view skips both the computation and plotly's validation.
+    # `version` may be a callable for data that is swapped while the process runs
+    def decorate(build):
+        @functools.wraps(build)
+        def wrapper(*args):
+            key = (build.__qualname__, version() if callable(version) else version, _freeze(args))
+            return json.loads(cache.get_or_compute(key, lambda: to_json_plotly(build(*args))))
+        return wrapper
+    return decorate
+
+def _freeze(value):
+    # hashable form of callback inputs (multi-select dropdowns arrive as lists)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
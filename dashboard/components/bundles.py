@@ -1,37 +1,101 @@
+import warnings
+
+import numpy as np
 import pandas as pd
 
-def generate_bundle_recommendations(df, similarity_df):
-    # create a binary matrix indicating whether a customer bought an item (1) or not (0)
-    basket = df.groupby(['customerID', 'item']).size().unstack(fill_value=0)
-    basket[basket > 0] = 1
-
-    # compute co-purchase frequency count by dot product of the binary basket matrix
-    co_purchase = basket.T.dot(basket).fillna(0)
-
-    # initialize list to store bundle recommendations
-    bundle_recommendations = []
-
-    # loop through each item to generate top bundle recommendations
-    for item in co_purchase.columns:
-        try:
-            # combine co-purchase frequency and item similarity (equal weight)
-            combined_score = (
-                (co_purchase[item] / co_purchase[item].max()) * 0.5 +
-                (similarity_df[item] / similarity_df[item].max()) * 0.5
-            )
-
-            # get top 3 recommended bundle items (excluding the item itself)
-            top_bundle = combined_score.drop(item).sort_values(ascending=False).head(3)
-
-            # store results
-            for related_item, score in top_bundle.items():
-                bundle_recommendations.append({
-                    'item': item,
-                    'recommended_bundle': related_item,
-                    'bundle_score': round(score, 3)
-                })
-        except Exception:
-            # skip items that fail due to missing data
-            continue
-
-    return pd.DataFrame(bundle_recommendations)
+from dashboard.data_loader import build_interaction_matrix
+from dashboard.components.similarity import similarity_columns
+
+def generate_bundle_recommendations(df, similarity_df, basket=None, weight=0.5, top_k=3):
+    # create a sparse binary matrix indicating whether a customer bought an item (1) or not (empty)
+    if basket is None:
+        basket = build_interaction_matrix(df)
+
+    # compute co-purchase frequency count by product of the binary basket matrix
+    co_purchase = pd.DataFrame(
+        (basket.matrix.T @ basket.matrix).toarray(),
+        index=basket.items, columns=basket.items
+    )
+
+    return score_bundles(co_purchase, similarity_df, weight=weight, top_k=top_k)
+
+def blockwise_bundle_recommendations(basket, user_item_matrix, weight=0.5, top_k=3, block_size=1024):
+    # the same lists as generate_bundle_recommendations, scored a block of columns at a time: every column
+    # is normalized by its own max, so only an n_items x block_size slice of the co-purchase counts and
+    # of the similarity matrix exists at once
+    items = basket.items
+    rated, similarity_block = similarity_columns(user_item_matrix)
+    rated = pd.Index(rated)
+    basket_csc = basket.matrix.tocsc()
+
+    parts, skipped = [], {}
+    for start in range(0, len(items), block_size):
+        names = items[start:start + block_size]
+        co_purchase = pd.DataFrame((basket_csc.T @ basket_csc[:, start:start + block_size]).toarray(),
+                                   index=items, columns=names)
+        positions = rated.get_indexer(names)
+        positions = positions[positions >= 0]
+        similarity = pd.DataFrame(similarity_block(positions), index=rated, columns=rated[positions])
+
+        # skipped items are reported once for the whole catalogue below
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            part = score_bundles(co_purchase, similarity, items=names, weight=weight, top_k=top_k)
+        skipped.update(part.attrs['skipped'])
+        parts.append(part)
+
+    if skipped:
+        warnings.warn(f"bundle scoring skipped {len(skipped)} item(s): {', '.join(map(str, skipped))}")
+    bundle_df = pd.concat(parts, ignore_index=True) if parts else \
+        pd.DataFrame(columns=['item', 'recommended_bundle', 'bundle_score'])
+    bundle_df.attrs['skipped'] = skipped
+    return bundle_df
+
+def score_bundles(co_purchase, similarity_df, items=None, weight=0.5, top_k=3):
+    # score every requested item's column at once: weight * co-purchase + (1 - weight) * similarity,
+    # each normalized by its column max, keeping the top_k other items per column
+    requested = list(co_purchase.columns if items is None else items)
+
+    # items without a co-purchase or similarity column can't be scored; report them instead of dropping silently
+    skipped = {}
+    for item in requested:
+        if item not in co_purchase.columns:
+            skipped[item] = 'no co-purchase data'
+        elif item not in similarity_df.columns:
+            skipped[item] = 'no similarity data'
+    scored = [item for item in requested if item not in skipped]
+    if skipped:
+        warnings.warn(f"bundle scoring skipped {len(skipped)} item(s): {', '.join(map(str, skipped))}")
+
+    # candidates are every item in either matrix (a missing entry scores nan, like the series sum it replaces)
+    labels = co_purchase.index.union(similarity_df.index)
+    co = co_purchase.reindex(index=labels, columns=scored).to_numpy(dtype=float)
+    sim = similarity_df.reindex(index=labels, columns=scored).to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        combined = (co / np.nanmax(co, axis=0)) * weight + \
+                   (sim / np.nanmax(sim, axis=0)) * (1 - weight)
+
+    # rank best first with nan scores after every real one and the item itself excluded
+    k = min(top_k, len(labels) - 1)
+    ranking = -combined
+    ranking[np.isposinf(ranking)] = np.finfo(float).max
+    ranking[np.isnan(ranking)] = np.inf
+    ranking[labels.get_indexer(scored), np.arange(len(scored))] = np.nan
+
+    if k <= 0 or not scored:
+        top = np.zeros((0, len(scored)), dtype=np.int64)
+    else:
+        top = np.argpartition(ranking, k - 1, axis=0)[:k]
+        # order each column's k survivors best first (ties keep the lower item position first)
+        order = np.lexsort((top, np.take_along_axis(ranking, top, axis=0)), axis=0)
+        top = np.take_along_axis(top, order, axis=0)
+
+    bundle_df = pd.DataFrame({
+        'item': np.repeat(np.asarray(scored, dtype=object), top.shape[0]),
+        'recommended_bundle': np.asarray(labels, dtype=object)[top.T.ravel()],
+        'bundle_score': np.round(np.take_along_axis(combined, top, axis=0).T.ravel(), 3),
+    })
+    bundle_df.attrs['skipped'] = skipped
+    return bundle_df
@@ -1,13 +1,74 @@
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+# purchase rows sorted by (customerID, date); customer i's history is history[offsets[i]:offsets[i + 1]].
+# search_keys are the ids as sorted strings (search_ids in the same order) for prefix search
+CustomerIndex = namedtuple('CustomerIndex', ['history', 'customers', 'offsets', 'search_keys', 'search_ids'])
+
+# columns shown in the customers tab
+history_columns = ['date', 'item', 'amount_usd', 'review', 'payment']
+
+# most customer ids the dropdown search sends back per keystroke
+CUSTOMER_PAGE_SIZE = 50
+
+def build_customer_index(df):
+    # sort once by customer and date (ties keep file order) and record where each customer's run starts
+    # purchases without a customer id can't be looked up, so they stay out of the index
+    df = df.dropna(subset=['customerID'])
+    customer_ids = df['customerID'].to_numpy().astype(np.int64)
+    order = np.lexsort((df['date'].to_numpy(), customer_ids))
+    history = df.iloc[order][history_columns].reset_index(drop=True)
+
+    sorted_ids = customer_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) if len(order) else np.zeros(0, dtype=np.int64)
+    offsets = np.append(starts, len(order))
+    customers = sorted_ids[starts]
+
+    keys = customers.astype(str)
+    key_order = np.argsort(keys, kind='stable')
+    return CustomerIndex(history, customers, offsets, keys[key_order], customers[key_order])
+
+def search_customers(index, query, limit=CUSTOMER_PAGE_SIZE):
+    # ids starting with the typed text, in string order; a prefix is one contiguous range of the sorted keys
+    query = str(query).strip()
+    if not query:
+        return index.search_ids[:limit].tolist()
+    successor = query[:-1] + chr(ord(query[-1]) + 1)
+    start = np.searchsorted(index.search_keys, query, side='left')
+    stop = np.searchsorted(index.search_keys, successor, side='left')
+    return index.search_ids[start:min(stop, start + limit)].tolist()
+
+def customer_options(index, query, selected=None, limit=CUSTOMER_PAGE_SIZE):
+    # dropdown options for the ids matching the typed prefix; the current selection stays among them
+    # so the dropdown can still display it
+    matches = search_customers(index, query, limit)
+    if selected is not None and selected not in matches:
+        matches.append(selected)
+    return [{'label': i, 'value': i} for i in matches]
+
 def get_customer_purchase_history(df, customer_id):
+    # a customer index answers with one binary search and a contiguous slice
+    if isinstance(df, CustomerIndex):
+        return _lookup_history(df, customer_id)
+
     # filter purchases for a specific customer and sort by date
     return df[df['customerID'] == customer_id].sort_values(by='date')
 
+def _lookup_history(index, customer_id):
+    i = np.searchsorted(index.customers, customer_id)
+    if i == len(index.customers) or index.customers[i] != customer_id:
+        return index.history.iloc[:0]
+    return index.history.iloc[index.offsets[i]:index.offsets[i + 1]]
+
 def plot_customer_review_trend(df, customer_id):
     # get and sort data for the selected customer
-    cust_data = df[df['customerID'] == customer_id].sort_values('date')
+    return plot_review_trend(get_customer_purchase_history(df, customer_id), customer_id)
+
+def plot_review_trend(cust_data, customer_id):
+    # plot an already selected purchase history (shared with the history table)
 
     # initialize the plotly figure
     fig = go.Figure()
@@ -0,0 +1,190 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from dashboard.components.timing import item_month_matrix
+
+# lightweight models fitted for every item at once (the forecast tab's alternative to per-item arima)
+FAST_MODELS = {
+    'seasonal_naive': 'Seasonal naive',
+    'holt': 'Exponential smoothing (Holt)',
+    'ar': 'AR(2) least squares',
+}
+
+# smoothing parameters tried for every item in one batched pass (beta = 0 is simple exponential smoothing)
+HOLT_ALPHAS = np.linspace(0.1, 0.9, 9)
+HOLT_BETAS = np.array([0.0, 0.05, 0.1, 0.2, 0.3])
+
+# 95% intervals, same as the arima forecasts
+_Z = NormalDist().inv_cdf(0.975)
+
+def fast_batch_forecasts(monthly_sales, model='holt', max_horizon=24):
+    # future and backtest forecasts for the whole catalogue in the layout of
+    # dashboard.batch_forecast.run_batch_forecasts, so batch_forecast() slices either one
+    #
+    # every item's series runs from its first to its last month with sales, months in between filled
+    # with 0 (as prepare_item_series does); the backtest trains on the first 80% like backtest_split
+    matrix = item_month_matrix(monthly_sales)
+    observed = matrix.units > 0
+    n_items, n_months = observed.shape
+    first = np.argmax(observed, axis=1)
+    last = n_months - 1 - np.argmax(observed[:, ::-1], axis=1)
+    lengths = last - first + 1
+
+    future = np.stack(fast_forecasts(_right_align(matrix.sales, first, last + 1), max_horizon, model), axis=1)
+
+    # backtests only for items with a year of history, like forecast_item_backtest
+    splits = (lengths * 0.8).astype(np.int64)
+    steps = np.where(lengths >= 12, lengths - splits, 0)
+    width = int(steps.max()) if n_items else 0
+    backtest = np.full((n_items, 3, width), np.nan)
+    if width:
+        train = _right_align(matrix.sales, first, first + splits)
+        in_test = (np.arange(width) < steps[:, None])[:, None, :]
+        backtest = np.where(in_test, np.stack(fast_forecasts(train, width, model), axis=1), np.nan)
+
+    items = np.asarray(matrix.items, dtype=object)
+    return {
+        'items': items,
+        'future': future,
+        'backtest': backtest,
+        'backtest_steps': steps,
+        'future_errors': np.full(n_items, '', dtype=object),
+        'backtest_errors': np.full(n_items, '', dtype=object),
+        'index': {item: i for i, item in enumerate(items)},
+    }
+
+def fast_forecasts(series, horizon, model='holt'):
+    # (mean, lower, upper), each (n_items, horizon), for right-aligned series: row i ends with the
+    # item's last month and is nan before its first one
+    if model == 'seasonal_naive':
+        mean, variance = seasonal_naive(series, horizon)
+    elif model == 'holt':
+        mean, variance = holt(series, horizon)
+    elif model == 'ar':
+        mean, variance = autoregressive(series, horizon)
+    else:
+        raise ValueError(f"unknown fast forecast model {model!r}")
+    spread = _Z * np.sqrt(variance)
+    return mean, mean - spread, mean + spread
+
+def seasonal_naive(series, horizon, period=12):
+    # next year repeats the last one; forecast variance grows with every full season ahead.
+    # items with less than a season plus one month of history fall back to the naive forecast
+    n_items, n_months = series.shape
+    lengths = (~np.isnan(series)).sum(axis=1)
+    mean, variance = naive(series, horizon)
+    seasonal = lengths > period
+    if n_months <= period or not seasonal.any():
+        return mean, variance
+
+    steps = np.arange(horizon)
+    last_season = series[:, n_months - period:]
+    errors = series[:, period:] - series[:, :-period]
+    sigma2 = _mean_square(errors)
+    mean[seasonal] = last_season[seasonal][:, steps % period]
+    variance[seasonal] = sigma2[seasonal, None] * (steps // period + 1)
+    return mean, variance
+
+def naive(series, horizon):
+    # last value carried forward with random-walk intervals (variance h * sigma^2)
+    last = series[:, -1]
+    sigma2 = _mean_square(np.diff(series, axis=1))
+    steps = np.arange(1, horizon + 1)
+    return np.repeat(last[:, None], horizon, axis=1), sigma2[:, None] * steps
+
+def holt(series, horizon, alphas=HOLT_ALPHAS, betas=HOLT_BETAS):
+    # holt's linear exponential smoothing with every (alpha, beta) pair run side by side; each item
+    # keeps the pair with the smallest one-step-ahead squared error
+    #
+    # state is (pairs, items) and advances one month per step for all of them at once; an item's level
+    # starts at its first observation with zero trend (state stays 0 and errors are masked before that).
+    # intervals are the ets(a,a,n) closed form, with ets trend smoothing b = alpha * beta:
+    # var_h = sigma^2 (1 + (h - 1)(alpha^2 + alpha b h + b^2 h (2h - 1) / 6))
+    n_items, n_months = series.shape
+    alpha, beta = (grid.ravel()[:, None] for grid in np.meshgrid(alphas, betas, indexing='ij'))
+    start = np.argmax(~np.isnan(series), axis=1)
+    values = np.nan_to_num(series)
+    columns = np.arange(n_months)
+    started = (columns > start[:, None]).T.astype(float)
+    begins = (columns == start[:, None]).T * values.T
+
+    level = np.zeros((len(alpha), n_items))
+    trend = np.zeros((len(alpha), n_items))
+    sse = np.zeros((len(alpha), n_items))
+    alpha_beta = alpha * beta
+    for t in range(n_months):
+        predicted = level + trend
+        error = (values[:, t] - predicted) * started[t]
+        sse += error * error
+        level = predicted + alpha * error + begins[t]
+        trend += alpha_beta * error
+
+    # best pair per item and the variance of its one-step errors
+    best = np.argmin(sse, axis=0)
+    items = np.arange(n_items)
+    level, trend = level[best, items], trend[best, items]
+    alpha, beta = alpha[best, 0], beta[best, 0]
+    sigma2 = sse[best, items] / np.maximum(n_months - start - 1, 1)
+
+    h = np.arange(1, horizon + 1)
+    mean = level[:, None] + trend[:, None] * h
+    a, b = alpha[:, None], (alpha * beta)[:, None]
+    variance = sigma2[:, None] * (1 + (h - 1) * (a ** 2 + a * b * h + b ** 2 * h * (2 * h - 1) / 6))
+    return mean, variance
+
+def autoregressive(series, horizon, order=2):
+    # ar(order) with intercept, fitted by least squares for every item in one batched solve of the
+    # (order + 1) x (order + 1) normal equations; months without a full set of lags drop out of the fit.
+    # intervals come from the model's psi weights, var_h = sigma^2 (psi_0^2 + ... + psi_{h-1}^2).
+    # items with fewer than order + 3 usable months fall back to the naive forecast
+    n_items, n_months = series.shape
+    k = order + 1
+    mean, variance = naive(series, horizon)
+    if n_months <= k:
+        return mean, variance
+
+    # design: [1, y_{t-1}, ..., y_{t-order}] -> y_t, rows with a missing value zeroed out
+    lags = np.stack([series[:, order - j:n_months - j] for j in range(1, order + 1)], axis=2)
+    target = series[:, order:]
+    design = np.concatenate([np.ones_like(lags[:, :, :1]), lags], axis=2)
+    usable = ~np.isnan(target) & ~np.isnan(lags).any(axis=2)
+    design = np.where(usable[:, :, None], design, 0.0)
+    target = np.where(usable, target, 0.0)
+
+    # a tiny ridge keeps flat series solvable
+    gram = np.einsum('nti,ntj->nij', design, design) + 1e-9 * np.eye(k)
+    coefficients = np.linalg.solve(gram, np.einsum('nti,nt->ni', design, target)[:, :, None])[:, :, 0]
+    residuals = np.where(usable, target - np.einsum('nti,ni->nt', design, coefficients), 0.0)
+    n_rows = usable.sum(axis=1)
+    sigma2 = (residuals ** 2).sum(axis=1) / np.maximum(n_rows - k, 1)
+
+    # recursive point forecasts and psi weights for all items at once
+    intercept, phi = coefficients[:, 0], coefficients[:, 1:]
+    history = series[:, n_months - order:][:, ::-1]   # most recent first
+    psi = np.zeros((n_items, horizon))
+    psi[:, 0] = 1.0
+    ar_mean = np.empty((n_items, horizon))
+    for h in range(horizon):
+        ar_mean[:, h] = intercept + (phi * history).sum(axis=1)
+        history = np.concatenate([ar_mean[:, h:h + 1], history[:, :-1]], axis=1)
+        if h:
+            recent = psi[:, max(0, h - order):h][:, ::-1]
+            psi[:, h] = (phi[:, :recent.shape[1]] * recent).sum(axis=1)
+
+    fitted = n_rows >= order + 3
+    mean[fitted] = ar_mean[fitted]
+    variance[fitted] = sigma2[fitted, None] * np.cumsum(psi ** 2, axis=1)[fitted]
+    return mean, variance
+
+def _right_align(values, starts, ends):
+    # row i of the result is values[i, starts[i]:ends[i]], flush right and nan-padded on the left
+    width = int((ends - starts).max()) if len(starts) else 0
+    columns = ends[:, None] - width + np.arange(width)
+    aligned = np.take_along_axis(values, np.clip(columns, 0, None), axis=1)
+    return np.where(columns >= starts[:, None], aligned, np.nan)
+
+def _mean_square(errors):
+    # per-row mean of the squared non-missing errors (0 when there are none)
+    count = (~np.isnan(errors)).sum(axis=1)
+    return np.nansum(errors ** 2, axis=1) / np.maximum(count, 1)
@@ -1,39 +1,76 @@
+import hashlib
+import os
+
 from statsmodels.tsa.arima.model import ARIMA
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
-def forecast_item_backtest(monthly_sales, item_name):
+from dashboard.cache import LRUCache
+
+# fitted arima results keyed by (item, order, training window, data hash); bounded by entry count
+fit_cache = LRUCache(maxsize=int(os.environ.get('FORECAST_CACHE_SIZE', 64)))
+
+# hand-picked default orders; per-item orders from dashboard.order_search take precedence
+BACKTEST_ORDER = (0, 0, 1)
+FUTURE_ORDER = (1, 1, 1)
+NO_SEASONAL_ORDER = (0, 0, 0, 0)
+
+def prepare_item_series(monthly_sales, item_name):
     # filter the monthly sales data for the selected item
     item_data = monthly_sales[monthly_sales['item'] == item_name].copy()
     
     # resample data to ensure monthly frequency and fill missing months with 0
-    item_data = item_data.set_index('month').resample('M').sum().fillna(0)
+    return item_data.set_index('month')[['Total_Sales', 'Units_Sold']].resample('M').sum().fillna(0)
+
+def backtest_split(item_data):
+    # split data into training and testing sets (80% train, 20% test)
+    split_idx = int(len(item_data) * 0.8)
+    return item_data.iloc[:split_idx], item_data.iloc[split_idx:]
+
+def fit_arima(sales, order, item_name=None, seasonal_order=NO_SEASONAL_ORDER):
+    # reuse the fit when the same item, order, window and data come back (e.g. only the horizon changed)
+    key = (
+        item_name, tuple(order), tuple(seasonal_order), sales.index[0], sales.index[-1],
+        hashlib.sha1(np.ascontiguousarray(sales.to_numpy(dtype=float))).hexdigest()
+    )
+    return fit_cache.get_or_compute(key, lambda: ARIMA(sales, order=order, seasonal_order=seasonal_order).fit())
+
+def fit_arima_forecast(sales, order, steps, item_name=None, seasonal_order=NO_SEASONAL_ORDER):
+    # fit the arima model and return the forecast mean with its 95% confidence interval
+    model_fit = fit_arima(sales, order, item_name, seasonal_order)
+    forecast_result = model_fit.get_forecast(steps=steps)
+    conf_int = forecast_result.conf_int(alpha=0.05)
+    return np.asarray(forecast_result.predicted_mean), np.asarray(conf_int.iloc[:, 0]), np.asarray(conf_int.iloc[:, 1])
+
+def future_index(item_data, periods):
+    # generate future month index
+    return pd.date_range(start=item_data.index[-1] + pd.offsets.MonthBegin(), periods=periods, freq='MS')
+
+def forecast_item_backtest(monthly_sales, item_name, order=None, seasonal_order=NO_SEASONAL_ORDER):
+    item_data = prepare_item_series(monthly_sales, item_name)
 
     # skip forecasting if there is not enough historical data
     if len(item_data) < 12:
         return go.Figure().update_layout(title=f"not enough data for {item_name}")
 
-    # split data into training and testing sets (80% train, 20% test)
-    split_idx = int(len(item_data) * 0.8)
-    train = item_data.iloc[:split_idx]
-    test = item_data.iloc[split_idx:]
+    train, test = backtest_split(item_data)
 
     # fit the arima model and generate forecast for the test period
     try:
-        model = ARIMA(train['Total_Sales'], order=(0, 0, 1))
-        model_fit = model.fit()
-        forecast_result = model_fit.get_forecast(steps=len(test))
+        forecast = fit_arima_forecast(train['Total_Sales'], order or BACKTEST_ORDER, len(test), item_name, seasonal_order)
     except Exception as e:
         return go.Figure().update_layout(title=f"forecast failed: {e}")
 
-    # extract forecast results
-    forecast_mean = forecast_result.predicted_mean
-    conf_int = forecast_result.conf_int(alpha=0.05)
+    return plot_backtest(item_data, item_name, *forecast)
+
+def plot_backtest(item_data, item_name, forecast_mean, lower, upper):
+    _, test = backtest_split(item_data)
+    forecast_mean = pd.Series(forecast_mean, index=test.index)
     forecast_index = test.index
 
     # calculate percentage error margin from confidence interval
-    margin_error = ((conf_int.iloc[:, 1] - conf_int.iloc[:, 0]) / (2 * forecast_mean.abs())) * 100
+    margin_error = ((upper - lower) / (2 * forecast_mean.abs())) * 100
     
     # calculate mean absolute percentage error (mape)
     abs_error = (forecast_mean - test['Total_Sales']).abs()
@@ -45,7 +82,7 @@ def forecast_item_backtest(monthly_sales, item_name):
     fig.add_trace(go.Scatter(x=forecast_index, y=forecast_mean, mode='lines+markers', name='forecast'))
     fig.add_trace(go.Scatter(
         x=forecast_index.tolist() + forecast_index[::-1].tolist(),
-        y=conf_int.iloc[:, 0].tolist() + conf_int.iloc[:, 1][::-1].tolist(),
+        y=list(lower) + list(upper[::-1]),
         fill='toself', name='95% ci', fillcolor='rgba(0,100,80,0.2)',
         line=dict(color='rgba(255,255,255,0)'), hoverinfo="skip"
     ))
@@ -57,27 +94,19 @@ def forecast_item_backtest(monthly_sales, item_name):
     )
     return fig
 
-def forecast_item_future(monthly_sales, item_name, periods=6):
-    # filter the monthly sales data for the selected item
-    item_data = monthly_sales[monthly_sales['item'] == item_name].copy()
-    
-    # resample data to ensure monthly frequency and fill missing months with 0
-    item_data = item_data.set_index('month').resample('M').sum().fillna(0)
+def forecast_item_future(monthly_sales, item_name, periods=6, order=None, seasonal_order=NO_SEASONAL_ORDER):
+    item_data = prepare_item_series(monthly_sales, item_name)
 
     # fit arima model and forecast into future periods
     try:
-        model = ARIMA(item_data['Total_Sales'], order=(1, 1, 1))
-        model_fit = model.fit()
-        forecast_result = model_fit.get_forecast(steps=periods)
+        forecast = fit_arima_forecast(item_data['Total_Sales'], order or FUTURE_ORDER, periods, item_name, seasonal_order)
     except Exception as e:
         return go.Figure().update_layout(title=f"forecast failed: {e}")
 
-    # extract forecast results and confidence intervals
-    forecast_mean = forecast_result.predicted_mean
-    conf_int = forecast_result.conf_int(alpha=0.05)
+    return plot_future(item_data, item_name, periods, *forecast)
 
-    # generate future month index
-    forecast_index = pd.date_range(start=item_data.index[-1] + pd.offsets.MonthBegin(), periods=periods, freq='MS')
+def plot_future(item_data, item_name, periods, forecast_mean, lower, upper):
+    forecast_index = future_index(item_data, periods)
 
     # create the forecast plot
     fig = go.Figure()
@@ -85,7 +114,7 @@ def forecast_item_future(monthly_sales, item_name, periods=6):
     fig.add_trace(go.Scatter(x=forecast_index, y=forecast_mean, mode='lines+markers', name='forecast'))
     fig.add_trace(go.Scatter(
         x=forecast_index.tolist() + forecast_index[::-1].tolist(),
-        y=conf_int.iloc[:, 0].tolist() + conf_int.iloc[:, 1][::-1].tolist(),
+        y=list(lower) + list(upper[::-1]),
         fill='toself', name='95% ci', fillcolor='rgba(0,100,80,0.2)',
         line=dict(color='rgba(255,255,255,0)'), hoverinfo="skip"
     ))
@@ -1,23 +1,46 @@
+import os
+
+import numpy as np
 import plotly.graph_objects as go
 
+from dashboard.cube import SalesCube, SalesRollups
+
+# points shipped to the browser: at most MAX_TRACE_POINTS per item and POINT_BUDGET over all items,
+# so the payload stays the same size however long the history or however many items are selected
+POINT_BUDGET = int(os.environ.get('SALES_POINT_BUDGET', 2000))
+MAX_TRACE_POINTS = int(os.environ.get('SALES_TRACE_POINTS', 500))
+
+# hover date format per granularity
+_hover_dates = {'day': '%d %b %Y', 'week': 'week of %d %b %Y', 'month': '%b %Y'}
+
 # create plotly time analysis
-def plot_seasonal_sales_trends(ts_sales_full, selected_items):
+def plot_seasonal_sales_trends(ts_sales_full, selected_items, granularity='month', start=None, end=None):
     fig = go.Figure()
+    points = max(3, min(MAX_TRACE_POINTS, POINT_BUDGET // max(1, len(selected_items))))
 
     for item in selected_items:
-        # filter the time series data for the current item
-        item_data = ts_sales_full[ts_sales_full['item'] == item]
-        
+        # read the item's series from the pre-rolled per-item arrays or the cube's per-item index,
+        # or filter the time series data for it
+        if isinstance(ts_sales_full, SalesRollups):
+            series = ts_sales_full.item_series(item, granularity, start, end)
+            keep = lttb(series['period'].astype(np.int64), series['Total_Sales'], points)
+            item_data = {'month': series['period'][keep], 'Total_Sales': series['Total_Sales'][keep],
+                         'Units_Sold': series['Units_Sold'][keep]}
+        elif isinstance(ts_sales_full, SalesCube):
+            item_data = ts_sales_full.item_monthly(item)
+        else:
+            item_data = ts_sales_full[ts_sales_full['item'] == item]
+
         # add a trace to the figure for this item
         fig.add_trace(go.Scatter(
             x=item_data['month'],
             y=item_data['Total_Sales'],
             mode='lines+markers',
             name=item,
-            customdata=item_data[['Units_Sold']],
+            customdata=np.asarray(item_data['Units_Sold'])[:, None],
             hovertemplate=(
                 f"<b>{item}</b><br>" +
-                "month: %{x|%b %Y}<br>" +
+                f"{granularity}: %{{x|{_hover_dates[granularity]}}}<br>" +
                 "sales: $%{y:.2f}<br>" +
                 "units sold: %{customdata[0]}<extra></extra>"
             ),
@@ -30,16 +53,51 @@ def plot_seasonal_sales_trends(ts_sales_full, selected_items):
     # update overall layout of the chart
     fig.update_layout(
         title="seasonal sales trends",
-        xaxis_title="month",
+        xaxis_title=granularity,
         yaxis_title="total sales (usd)",
         hovermode='closest',
         template='plotly_white',
         height=600,
         legend=dict(
             # disable interactive legend
-            itemclick=False,  
-            itemdoubleclick=False 
+            itemclick=False,
+            itemdoubleclick=False
         ),
     )
-    
+
+    # keep a zoomed view on the requested window
+    if start is not None and end is not None:
+        fig.update_xaxes(range=[str(start), str(end)])
+
     return fig
+
+def lttb(x, y, threshold):
+    # largest-triangle-three-buckets downsampling: positions of `threshold` points that keep the
+    # series' visual shape (first and last point always kept)
+    #
+    # the interior is split into threshold - 2 buckets; from each bucket the point forming the largest
+    # triangle with the previously kept point and the next bucket's average is kept. only that chain
+    # is sequential; bucket averages and each bucket's areas are array operations
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+
+    # the last bucket looks ahead to the final point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for b, (lo, hi) in enumerate(zip(edges[:-1], edges[1:])):
+        areas = np.abs((x[a] - next_x[b]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[b] - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[b + 1] = a
+    return selected
@@ -1,16 +1,20 @@
 # extra
 import pandas as pd
 
+# review score bins and corresponding labels
+review_bins = [0, 2, 3.5, 5]
+review_labels = ['low (<=2)', 'medium (2-3.5)', 'high (>3.5)']
+
+def assign_review_level(review):
+    # bucket review scores into the review levels (missing reviews stay nan)
+    return pd.cut(review, bins=review_bins, labels=review_labels, include_lowest=True)
+
 def segment_sales_by_review_and_payment(df):
-    # define review score bins and corresponding labels
-    bins = [0, 2, 3.5, 5]
-    labels = ['low (<=2)', 'medium (2-3.5)', 'high (>3.5)']
-    
-    # assign each row a review level based on review score
-    df['review_level'] = pd.cut(df['review'], bins=bins, labels=labels, include_lowest=True)
+    # assign each row a review level based on review score (as a grouping key, leaving the caller's df untouched)
+    review_level = assign_review_level(df['review']).rename('review_level')
 
     # group data by item, payment method, and review level
-    segmented_sales = df.groupby(['item', 'payment', 'review_level']).agg(
+    segmented_sales = df.groupby([df['item'], df['payment'], review_level], observed=False).agg(
         total_sales=('amount_usd', 'sum'),   # total sales amount
         units_sold=('item', 'count'),        # number of units sold
         avg_review=('review', 'mean')        # average review score
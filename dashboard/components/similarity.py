@@ -1,66 +1,190 @@
+import functools
+import os
+from collections import namedtuple
+
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import plotly.express as px
+import plotly.graph_objects as go
+from scipy import sparse
+
+from dashboard.data_loader import InteractionMatrix
+
+# top-k neighbours per item (positions into items, best first) and a lowercase name -> position lookup
+NeighborIndex = namedtuple('NeighborIndex', ['items', 'name_to_id', 'neighbors', 'scores'])
+
+# most items the heatmap draws (the most-rated ones); only that corner of the matrix is ever built, and the
+# title says so when the catalogue is larger
+HEATMAP_ITEMS = int(os.environ.get('SIMILARITY_HEATMAP_ITEMS', 60))
 
 # item-item
 def compute_item_similarity(user_item_matrix):
+    centered, squared, rated, item_names = _centered_ratings(user_item_matrix)
+
+    # calculate cosine similarity between all pairs of items at once
+    similarity = _masked_cosine_similarity(centered, squared, rated)
+    return pd.DataFrame(similarity, index=item_names, columns=item_names)
+
+def similarity_submatrix(user_item_matrix, items):
+    # the similarity matrix restricted to `items`: a pair's score only depends on its two items' ratings,
+    # so this is compute_item_similarity on just those columns
+    if isinstance(user_item_matrix, InteractionMatrix):
+        positions = user_item_matrix.items.get_indexer(items)
+        user_item_matrix = InteractionMatrix(user_item_matrix.matrix.tocsc()[:, positions],
+                                             user_item_matrix.customers, user_item_matrix.items[positions])
+    else:
+        user_item_matrix = user_item_matrix[list(items)]
+    return compute_item_similarity(user_item_matrix)
+
+def heatmap_items(user_item_matrix, limit=HEATMAP_ITEMS):
+    # every item when there are few, else the `limit` items with the most ratings, in name order
+    if isinstance(user_item_matrix, InteractionMatrix):
+        items = user_item_matrix.items
+        counts = np.diff(user_item_matrix.matrix.tocsc().indptr)
+    else:
+        items = user_item_matrix.columns
+        counts = user_item_matrix.notna().sum(axis=0).to_numpy()
+    if len(items) <= limit:
+        return list(items)
+    top = np.argsort(-counts, kind='stable')[:limit]
+    return sorted(items[top])
+
+def similarity_columns(user_item_matrix):
+    # item names and a function cols -> similarity of every item against the items at positions `cols`,
+    # for working through the matrix a block of columns at a time; the ratings are centered once
+    centered, squared, rated, item_names = _centered_ratings(user_item_matrix)
+    return item_names, functools.partial(_masked_cosine_block, centered, squared, rated)
+
+def _centered_ratings(user_item_matrix):
+    # sparse interaction matrices (see data_loader.build_interaction_matrix) skip the dense pivot
+    if isinstance(user_item_matrix, InteractionMatrix):
+        return _centered_sparse_ratings(user_item_matrix)
+
     # convert the dataframe to a numpy array
-    item_mat = user_item_matrix.to_numpy()
+    item_mat = user_item_matrix.to_numpy(dtype=float)
     
     # calculate the mean rating for each item (ignoring nan values)
     item_means = np.nanmean(item_mat, axis=0)
     
-    # center the matrix by subtracting the mean from each rating
-    item_mat_centered = item_mat - item_means
-
-    # prepare for similarity matrix construction
-    item_names = user_item_matrix.columns
-    n_items = item_mat_centered.shape[1]
-    similarity_df = pd.DataFrame(index=item_names, columns=item_names, dtype=float)
-
-    # calculate cosine similarity between all pairs of items
-    for i in range(n_items):
-        for j in range(n_items):
-            vec_i = item_mat_centered[:, i]
-            vec_j = item_mat_centered[:, j]
-            
-            # find indices where both items have a rating
-            shared = ~np.isnan(vec_i) & ~np.isnan(vec_j)
-            
-            # compute similarity only if there are at least two shared ratings
-            if np.sum(shared) > 1:
-                sim = cosine_similarity(vec_i[shared].reshape(1, -1), vec_j[shared].reshape(1, -1))[0, 0]
-            else:
-                sim = np.nan
-            
-            similarity_df.iloc[i, j] = sim
-
-    return similarity_df
+    # center the matrix and zero out missing ratings so they drop out of every product
+    rated = ~np.isnan(item_mat)
+    item_mat_centered = np.where(rated, item_mat - item_means, 0.0)
+
+    return item_mat_centered, item_mat_centered ** 2, rated.astype(float), user_item_matrix.columns
+
+def _centered_sparse_ratings(interactions):
+    ratings = interactions.matrix.tocsr()
+
+    # stored entries are the observed ratings, so the mask shares their sparsity pattern
+    rated = ratings.copy()
+    rated.data = np.ones_like(rated.data)
+
+    # mean rating for each item over its observed ratings
+    with np.errstate(invalid='ignore', divide='ignore'):
+        item_means = np.asarray(ratings.sum(axis=0)).ravel() / np.asarray(rated.sum(axis=0)).ravel()
+
+    # center only the stored entries (csr indices are the item columns)
+    centered = ratings.copy()
+    centered.data = centered.data - item_means[centered.indices]
+    squared = centered.copy()
+    squared.data = squared.data ** 2
+
+    # column slices are cheap on csc, which the blockwise neighbour search relies on
+    return centered.tocsc(), squared.tocsc(), rated.tocsc(), interactions.items
+
+def _masked_cosine_similarity(centered, squared, rated):
+    # dot product of every item pair over their shared ratings
+    numerators = _to_dense(centered.T @ centered)
+
+    # norm of item i restricted to the customers who also rated item j
+    pair_norms = np.sqrt(_to_dense(squared.T @ rated))
+
+    # number of customers who rated both items
+    shared_counts = _to_dense(rated.T @ rated)
+
+    # the result is symmetric, so only the upper triangle is evaluated and then mirrored
+    n_items = centered.shape[1]
+    upper = np.triu_indices(n_items)
+    values = _cosine(numerators[upper], pair_norms[upper], pair_norms.T[upper], shared_counts[upper])
+
+    similarity = np.empty((n_items, n_items))
+    similarity[upper] = values
+    similarity.T[upper] = values
+    return similarity
+
+def _masked_cosine_block(centered, squared, rated, cols):
+    # similarity of every item against the items in `cols`, without forming the full matrix
+    block_centered, block_squared, block_rated = centered[:, cols], squared[:, cols], rated[:, cols]
+    numerators = _to_dense(centered.T @ block_centered)
+    row_norms = np.sqrt(_to_dense(squared.T @ block_rated))
+    col_norms = np.sqrt(_to_dense(block_squared.T @ rated)).T
+    shared_counts = _to_dense(rated.T @ block_rated)
+    return _cosine(numerators, row_norms, col_norms, shared_counts)
+
+def _cosine(numerators, norms_a, norms_b, shared_counts):
+    # zero-norm pairs score 0 (same as sklearn), pairs with fewer than two shared ratings are nan
+    denominators = norms_a * norms_b
+    values = np.divide(numerators, denominators,
+                       out=np.zeros_like(denominators), where=denominators > 0)
+    values[shared_counts < 2] = np.nan
+    return values
+
+def _to_dense(mat):
+    # item x item products are small, so sparse results are densified
+    return mat.toarray() if sparse.issparse(mat) else np.asarray(mat)
+
+# top-k neighbours
+def build_neighbor_index(user_item_matrix, k=10, block_size=1024):
+    centered, squared, rated, item_names = _centered_ratings(user_item_matrix)
+    n_items = len(item_names)
+    k = min(k, n_items - 1)
+
+    neighbors = np.zeros((n_items, max(k, 0)), dtype=np.int64)
+    scores = np.full((n_items, max(k, 0)), np.nan)
+
+    # work through the similarity matrix a block of columns at a time, keeping only each column's top k
+    for start in range(0, n_items if k > 0 else 0, block_size):
+        cols = np.arange(start, min(start + block_size, n_items))
+        block = _masked_cosine_block(centered, squared, rated, cols)
+
+        # similarities lie in [-1, 1]: nan pairs rank after every real score and the item itself after those
+        ranking = np.where(np.isnan(block), -2.0, block)
+        ranking[cols, np.arange(len(cols))] = -3.0
+
+        top = np.argpartition(-ranking, k - 1, axis=0)[:k]
+        top_scores = np.take_along_axis(ranking, top, axis=0)
+
+        # order each column's k survivors best first (ties keep the lower item position first)
+        order = np.lexsort((top, -top_scores), axis=0)
+        top = np.take_along_axis(top, order, axis=0)
+        neighbors[cols] = top.T
+        scores[cols] = np.take_along_axis(block, top, axis=0).T
+
+    # first item wins when two names only differ by case (same as the column scan it replaces)
+    name_to_id = {}
+    for i, name in enumerate(item_names):
+        name_to_id.setdefault(str(name).lower(), i)
+
+    return NeighborIndex(pd.Index(item_names), name_to_id, neighbors, scores)
 
 # heatmap
-def generate_similarity_heatmap(similarity_df):
-    sim_df = similarity_df.copy()
-    sim_df.index.name = 'item1'
-    sim_df = sim_df.reset_index().melt(id_vars='item1', var_name='item2', value_name='similarity')
-
-    # create a heatmap using plotly
-    fig = px.density_heatmap(
-        sim_df,
-        x='item2',
-        y='item1',
-        z='similarity',
-        color_continuous_scale='RdBu_r',
-        hover_data={
-            'item1': True,
-            'item2': True,
-            'similarity': ':.2f'
-        },
-        title='item-item similarity heatmap (cosine similarity)'
-    )
+def generate_similarity_heatmap(similarity_df, total_items=None):
+    # draw the matrix directly (no long-format melt); pairs without a score show as 0 like the binned
+    # density heatmap this replaces. total_items is the catalogue size when only some items are drawn
+    fig = go.Figure(go.Heatmap(
+        z=np.nan_to_num(similarity_df.to_numpy(dtype=float)),
+        x=list(similarity_df.columns),
+        y=list(similarity_df.index),
+        colorscale='RdBu_r',
+        colorbar=dict(title='similarity'),
+        hovertemplate='item1=%{y}<br>item2=%{x}<br>similarity=%{z:.2f}<extra></extra>'
+    ))
 
     # update layout for better readability
+    title = 'item-item similarity heatmap (cosine similarity)'
+    if total_items is not None and total_items > len(similarity_df.columns):
+        title += f" | top {len(similarity_df.columns)} of {total_items} items by ratings"
     fig.update_layout(
+        title=title,
         xaxis_title='item',
         yaxis_title='item',
         xaxis_tickangle=90,
@@ -71,6 +195,10 @@ def generate_similarity_heatmap(similarity_df):
 
 # find similar items
 def get_top_similar_items(similarity_df, item_name, top_n=5):
+    # precomputed neighbour index: constant-time lookup and array reads
+    if isinstance(similarity_df, NeighborIndex):
+        return _lookup_neighbors(similarity_df, item_name, top_n)
+
     # convert input to lowercase for flexible matching
     item_name_lower = item_name.lower()
     
@@ -89,3 +217,11 @@ def get_top_similar_items(similarity_df, item_name, top_n=5):
     similar_items = similarity_df[matched_item].drop(matched_item).sort_values(ascending=False).head(top_n)
     
     return pd.DataFrame({'similar_item': similar_items.index, 'similarity': similar_items.values})
+
+def _lookup_neighbors(index, item_name, top_n):
+    item_id = index.name_to_id.get(item_name.lower())
+    if item_id is None:
+        return pd.DataFrame(columns=['similar_item', 'similarity'])
+
+    neighbors = index.neighbors[item_id, :top_n]
+    return pd.DataFrame({'similar_item': index.items[neighbors], 'similarity': index.scores[item_id, :top_n]})
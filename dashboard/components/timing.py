@@ -1,23 +1,149 @@
 # extra
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 # When should I market this product?
 # Which items peak in summer vs. winter?
 
+# seasons (northern hemisphere) and the season of each calendar month, plus the month-of-year profile columns
+season_names = ['winter', 'spring', 'summer', 'autumn']
+month_seasons = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+profile_columns = [f'share_{m:02d}' for m in range(1, 13)]
+
+# monthly totals as one dense items x months array (months contiguous, months without sales are 0)
+ItemMonthMatrix = namedtuple('ItemMonthMatrix', ['items', 'months', 'sales', 'units'])
+
+def item_month_matrix(monthly_sales):
+    # pivot the long monthly table once: integer-code items and months, then one bincount per measure
+    item_codes, items = pd.factorize(monthly_sales['item'], sort=True)
+    month = pd.DatetimeIndex(monthly_sales['month'])
+    ordinals = month.year.to_numpy() * 12 + month.month.to_numpy() - 1
+    first = ordinals.min() if len(ordinals) else 0
+    month_codes = ordinals - first
+    n_items, n_months = len(items), int(month_codes.max()) + 1 if len(ordinals) else 0
+
+    keys = item_codes * n_months + month_codes
+    size = n_items * n_months
+    sales = np.bincount(keys, weights=monthly_sales['Total_Sales'].to_numpy(dtype=float), minlength=size)
+    units = np.bincount(keys, weights=monthly_sales['Units_Sold'].to_numpy(dtype=float), minlength=size)
+
+    months = pd.date_range(pd.Timestamp(year=first // 12, month=first % 12 + 1, day=1), periods=n_months, freq='MS')
+    return ItemMonthMatrix(items, months, sales.reshape(n_items, n_months), units.reshape(n_items, n_months))
+
 def calculate_item_timing(monthly_sales):
-    # get the first month each item appeared in the dataset
-    first_months = monthly_sales.groupby('item')['month'].min().reset_index(name='first_month')
-    
-    # get the month with highest sales (peak) for each item
-    peak_months = monthly_sales.loc[
-        monthly_sales.groupby('item')['Total_Sales'].idxmax()
-    ][['item', 'month']].rename(columns={'month': 'peak_month'})
-
-    # merge first and peak months into one dataframe
-    timing_df = pd.merge(first_months, peak_months, on='item')
-    
-    # calculate the number of months between first and peak month (lead time)
-    timing_df['lead_time_months'] = (
-        timing_df['peak_month'].dt.to_period('M') - timing_df['first_month'].dt.to_period('M')
-    ).apply(lambda x: x.n)
-
-    return timing_df
+    # first month each item appeared, its best month and the months in between
+    return item_timing(seasonality_profiles(monthly_sales))
+
+def item_timing(seasonality_df):
+    # the timing columns of already computed seasonality profiles
+    return seasonality_df[['item', 'first_month', 'peak_month', 'lead_time_months']]
+
+def seasonality_profiles(monthly_sales):
+    # timing and seasonality for every item in one vectorized pass over the item x month array:
+    #   first_month / peak_month / lead_time_months: first month with sales, best month, months in between
+    #   share_01 .. share_12: month-of-year profile, the item's average sales in each calendar month over
+    #     its active span (first to last month with sales) as a share of the twelve averages
+    #   peak/trough month and season: the calendar month and season with the highest/lowest profile share
+    #   seasonal_strength: share of the detrended series' variance at the annual cycle and its harmonics
+    #     (see seasonal_strength; nan with less than two full years of history)
+    matrix = item_month_matrix(monthly_sales)
+    n_items, n_months = matrix.sales.shape
+    columns = np.arange(n_months)
+
+    # an item is active from its first to its last month with a row in the monthly table
+    observed = matrix.units > 0
+    first = np.argmax(observed, axis=1)
+    last = n_months - 1 - np.argmax(observed[:, ::-1], axis=1)
+    active = (columns >= first[:, None]) & (columns <= last[:, None])
+
+    # best month (the earliest one on ties, like idxmax) and the lead time from launch to peak
+    peak = np.argmax(np.where(observed, matrix.sales, -np.inf), axis=1)
+
+    # average sales per calendar month over the active span, normalized to shares
+    month_of_year = np.asarray(matrix.months.month) - 1
+    calendar = np.eye(12)[month_of_year]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = ((matrix.sales * active) @ calendar) / (active @ calendar)
+        shares = averages / np.nansum(averages, axis=1, keepdims=True)
+
+    # months never inside an item's active span have no average; they rank below every real share
+    ranked = np.where(np.isnan(shares), -np.inf, shares)
+    peak_moy = np.argmax(ranked, axis=1)
+    trough_moy = np.argmin(np.where(np.isnan(shares), np.inf, shares), axis=1)
+
+    # season totals of the profile (a season with no observed month is left out of the comparison)
+    season_onehot = np.eye(len(season_names))[month_seasons]
+    season_shares = np.nan_to_num(shares) @ season_onehot
+    season_seen = (~np.isnan(shares)) @ season_onehot > 0
+
+    summary = pd.DataFrame({
+        'item': matrix.items,
+        'first_month': matrix.months[first],
+        'peak_month': matrix.months[peak],
+        'lead_time_months': (peak - first).astype(np.int64),
+        'peak_month_of_year': peak_moy + 1,
+        'trough_month_of_year': trough_moy + 1,
+        'peak_season': np.asarray(season_names)[np.argmax(np.where(season_seen, season_shares, -np.inf), axis=1)],
+        'trough_season': np.asarray(season_names)[np.argmin(np.where(season_seen, season_shares, np.inf), axis=1)],
+        'seasonal_strength': seasonal_strength(matrix.sales, active),
+    })
+    for m, column in enumerate(profile_columns):
+        summary[column] = shares[:, m]
+    return summary
+
+def seasonal_strength(sales, active=None):
+    # spectral seasonal strength for every row of an items x months array at once
+    #
+    # the most recent whole years are linearly detrended per item (one least-squares solve for all rows)
+    # and transformed with a real fft; with m years, bins m, 2m, ..., 6m are the annual cycle and its
+    # harmonics, and the strength is their share of the non-constant power (1 = purely seasonal, about
+    # 1/m for noise). rows not active over the whole window, or without any variation, are nan
+    n_items, n_months = sales.shape
+    years = n_months // 12
+    strength = np.full(n_items, np.nan)
+    if years < 2:
+        return strength
+
+    window = sales[:, n_months - 12 * years:]
+    usable = np.ones(n_items, dtype=bool) if active is None else active[:, n_months - 12 * years:].all(axis=1)
+
+    t = np.arange(12 * years, dtype=float)
+    design = np.column_stack([np.ones_like(t), t])
+    coefficients, *_ = np.linalg.lstsq(design, window.T, rcond=None)
+    residuals = window - (design @ coefficients).T
+
+    # one-sided power spectrum: every bin but the constant and nyquist stands for two frequencies
+    power = np.abs(np.fft.rfft(residuals, axis=1)) ** 2
+    weights = np.full(power.shape[1], 2.0)
+    weights[0] = 0.0
+    weights[-1] = 1.0
+    power *= weights
+
+    total = power.sum(axis=1)
+    annual = power[:, years::years].sum(axis=1)
+    valid = usable & (total > 1e-12 * np.maximum(1.0, (window ** 2).sum(axis=1)))
+    strength[valid] = annual[valid] / total[valid]
+    return strength
+
+def plot_seasonality_profiles(seasonality_df):
+    # month-of-year profile of every item, items ordered by their peak calendar month (summer peakers
+    # sit together, apart from the winter ones)
+    ordered = seasonality_df.sort_values(['peak_month_of_year', 'item'])
+    fig = go.Figure(go.Heatmap(
+        z=ordered[profile_columns].to_numpy(dtype=float),
+        x=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'],
+        y=[str(item) for item in ordered['item']],
+        colorscale='YlOrRd',
+        colorbar=dict(title='share'),
+        hovertemplate='%{y}<br>%{x}: %{z:.1%} of sales<extra></extra>'
+    ))
+    fig.update_layout(
+        title='month-of-year sales profile by item',
+        xaxis_title='month of year',
+        yaxis_title='item',
+        height=max(400, 20 * len(ordered)),
+        template='plotly_white'
+    )
+    return fig
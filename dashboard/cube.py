@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+
+from dashboard.components.segmentation import assign_review_level, review_labels
+
+# cube dimensions and additive measures, in cell sort order
+DIMENSIONS = ['item', 'month', 'payment', 'review_level']
+MEASURES = ['total_sales', 'units_sold', 'review_sum']
+
+class SalesCube:
+    # pre-aggregated sales over (item, month, payment, review level)
+    #
+    # only occupied cells are stored, as parallel integer-coded arrays sorted by item, month, payment
+    # and review level; offsets[i]:offsets[i + 1] is item i's run of cells, so per-item queries never
+    # touch the rest. a missing payment or review is coded as len(labels) for that dimension: it counts
+    # towards roll-ups that don't group by the dimension and is left out of those that do
+
+    def __init__(self, items, months, payments, codes, measures):
+        self.items = items              # sorted item labels
+        self.months = months            # sorted month starts
+        self.payments = payments        # sorted payment methods
+        self.codes = codes              # dimension name -> per-cell label code
+        self.measures = measures        # measure name -> per-cell total
+        self.item_lookup = {item: i for i, item in enumerate(items)}
+        self.offsets = np.searchsorted(codes['item'], np.arange(len(items) + 1))
+        self._month_values = np.asarray(months)
+        self._segment_grid = np.unravel_index(np.arange(len(payments) * len(review_labels)),
+                                              (len(payments), len(review_labels)))
+
+    @classmethod
+    def from_frame(cls, df):
+        # one pass over the cleaned rows; the caller's frame is not modified
+        item_codes, items = _factorize(df['item'], 'item')
+        month_codes, months = _factorize(df['month'], 'month')
+        payment_codes, payments = _factorize(df['payment'], 'payment')
+        level_codes = np.asarray(assign_review_level(df['review']).cat.codes, dtype=np.int64)
+        level_codes[level_codes < 0] = len(review_labels)
+
+        # one integer key per row (missing codes included), then one bincount per measure
+        shape = (len(items) + 1, len(months) + 1, len(payments) + 1, len(review_labels) + 1)
+        keys = np.ravel_multi_index((item_codes, month_codes, payment_codes, level_codes), shape)
+        cells, inverse = np.unique(keys, return_inverse=True)
+
+        reviews = df['review'].to_numpy(dtype=float)
+        measures = {
+            'total_sales': np.bincount(inverse, weights=df['amount_usd'].to_numpy(dtype=float), minlength=len(cells)),
+            'units_sold': np.bincount(inverse, minlength=len(cells)).astype(np.int64),
+            'review_sum': np.bincount(inverse, weights=np.nan_to_num(reviews), minlength=len(cells)),
+        }
+        code_dtypes = [np.int32, np.int32, np.int16, np.int8]
+        codes = {
+            name: values.astype(dtype)
+            for name, values, dtype in zip(DIMENSIONS, np.unravel_index(cells, shape), code_dtypes)
+        }
+        return cls(items, months, payments, codes, measures)
+
+    def labels(self, dimension):
+        if dimension == 'item':
+            return self.items
+        if dimension == 'month':
+            return self.months
+        if dimension == 'payment':
+            return self.payments
+        return pd.CategoricalIndex(review_labels, categories=review_labels, ordered=True, name='review_level')
+
+    def cells(self, items=None):
+        # positions of the cells for the given item(s), found through the per-item offsets
+        if items is None:
+            return np.arange(len(self.codes['item']))
+        if isinstance(items, str):
+            items = [items]
+        runs = [
+            np.arange(self.offsets[i], self.offsets[i + 1])
+            for i in (self.item_lookup.get(item) for item in items) if i is not None
+        ]
+        return np.concatenate(runs) if runs else np.array([], dtype=np.int64)
+
+    def item_monthly(self, item):
+        # one item's monthly totals as plain arrays (the per-callback path: an offsets slice and one reduceat)
+        i = self.item_lookup.get(item)
+        if i is None:
+            return {'month': self._month_values[:0], 'Total_Sales': np.zeros(0), 'Units_Sold': np.zeros(0, dtype=np.int64)}
+        cells = slice(self.offsets[i], self.offsets[i + 1])
+
+        # an item's cells are sorted by month (every known item has at least one), so each month is one run
+        months = self.codes['month'][cells]
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        return {
+            'month': self._month_values[months[starts]],
+            'Total_Sales': np.add.reduceat(self.measures['total_sales'][cells], starts),
+            'Units_Sold': np.add.reduceat(self.measures['units_sold'][cells], starts),
+        }
+
+    def item_segments(self, item):
+        # one item's payment x review level grid as plain arrays, best-selling segment first
+        i = self.item_lookup.get(item)
+        if i is None:
+            return {'payment': np.zeros(0, dtype=object), 'review_level': np.zeros(0, dtype=object),
+                    'total_sales': np.zeros(0), 'units_sold': np.zeros(0, dtype=np.int64), 'avg_review': np.zeros(0)}
+        cells = slice(self.offsets[i], self.offsets[i + 1])
+        n_levels = len(review_labels)
+        n_groups = len(self.payments) * n_levels
+
+        payments = self.codes['payment'][cells].astype(np.int64)
+        levels = self.codes['review_level'][cells].astype(np.int64)
+        keep = (payments < len(self.payments)) & (levels < n_levels)
+        keys = payments[keep] * n_levels + levels[keep]
+
+        total_sales = np.bincount(keys, weights=self.measures['total_sales'][cells][keep], minlength=n_groups)
+        units_sold = np.bincount(keys, weights=self.measures['units_sold'][cells][keep], minlength=n_groups).astype(np.int64)
+        review_sum = np.bincount(keys, weights=self.measures['review_sum'][cells][keep], minlength=n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_review = np.where(units_sold > 0, review_sum / units_sold, np.nan)
+
+        order = np.argsort(-total_sales, kind='stable')
+        payment_codes, level_codes = (grid[order] for grid in self._segment_grid)
+        return {
+            'payment': np.asarray(self.payments)[payment_codes],
+            'review_level': np.asarray(review_labels, dtype=object)[level_codes],
+            'total_sales': total_sales[order],
+            'units_sold': units_sold[order],
+            'avg_review': avg_review[order],
+        }
+
+    def rollup(self, by, items=None, observed=False):
+        # sum the measures over every dimension not in `by`, optionally for some items only; the result
+        # covers the full grid of `by` labels (just the cells with sales when observed=True)
+        cells = self.cells(items)
+        codes, labels = [], []
+        for dimension in by:
+            dim_codes = self.codes[dimension][cells].astype(np.int64)
+            dim_labels = self.labels(dimension)
+            if dimension == 'item' and items is not None:
+                # restrict the item axis to the requested items
+                selected = np.unique(dim_codes)
+                dim_codes = np.searchsorted(selected, dim_codes)
+                dim_labels = dim_labels[selected]
+            codes.append(dim_codes)
+            labels.append(dim_labels)
+
+        # cells with a missing label in a grouped dimension drop out (like a groupby on nan keys)
+        sizes = tuple(len(dim_labels) for dim_labels in labels)
+        keep = np.ones(len(cells), dtype=bool)
+        for dim_codes, size in zip(codes, sizes):
+            keep &= dim_codes < size
+        keys = np.ravel_multi_index([dim_codes[keep] for dim_codes in codes], sizes) if by else np.zeros(keep.sum(), dtype=np.int64)
+        n_groups = int(np.prod(sizes))
+
+        totals = {
+            name: np.bincount(keys, weights=values[cells][keep], minlength=n_groups)
+            for name, values in self.measures.items()
+        }
+        totals['units_sold'] = totals['units_sold'].astype(np.int64)
+
+        grid = np.unravel_index(np.arange(n_groups), sizes) if by else ()
+        rollup = pd.DataFrame({
+            **{dimension: dim_labels.take(grid_codes) for dimension, dim_labels, grid_codes in zip(by, labels, grid)},
+            **totals,
+        })
+        if observed:
+            rollup = rollup[rollup['units_sold'] > 0].reset_index(drop=True)
+        return rollup
+
+    def monthly_sales(self, items=None):
+        # same layout as prepare_monthly_sales (months with sales only)
+        monthly = self.rollup(['item', 'month'], items, observed=True)
+        return monthly.rename(columns={'total_sales': 'Total_Sales', 'units_sold': 'Units_Sold'})[
+            ['item', 'month', 'Total_Sales', 'Units_Sold']
+        ]
+
+    def segments(self, items=None):
+        # same layout as segment_sales_by_review_and_payment
+        segments = self.rollup(['item', 'payment', 'review_level'], items)
+        segments['avg_review'] = segments['review_sum'] / segments['units_sold'].where(segments['units_sold'] > 0)
+        return segments.drop(columns='review_sum').sort_values(['item', 'total_sales'], ascending=[True, False])
+
+def _factorize(values, name):
+    # sorted integer codes (categoricals included), with missing values coded as len(labels)
+    codes, labels = pd.factorize(values, sort=True)
+    codes = codes.astype(np.int64)
+    codes[codes < 0] = len(labels)
+    labels = pd.Index(np.asarray(labels), name=name)
+    return codes, labels
+
+# time granularities of the pre-rolled per-item series, finest first
+GRANULARITIES = ['day', 'week', 'month']
+
+class SalesRollups:
+    # per-item daily, weekly and monthly sales totals, pre-rolled for time-series views
+    #
+    # for every granularity the periods with sales are stored as contiguous runs per item (sorted by
+    # item, then period): offsets[g][i]:offsets[g][i + 1] is item i's run, and periods[g] holds the
+    # period starts as days since the epoch (weeks start on monday), so a date range within a run is
+    # two binary searches
+
+    def __init__(self, items, offsets, periods, measures):
+        self.items = items              # sorted item labels
+        self.offsets = offsets          # granularity -> item run boundaries
+        self.periods = periods          # granularity -> period start per cell (days since epoch)
+        self.measures = measures        # granularity -> {'total_sales', 'units_sold'} per cell
+        self.item_lookup = {item: i for i, item in enumerate(items)}
+
+    @classmethod
+    def from_frame(cls, df):
+        item_codes, items = _factorize(df['item'], 'item')
+        days = df['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        amounts = df['amount_usd'].to_numpy(dtype=float)
+
+        offsets, periods, measures = {}, {}, {}
+        for granularity in GRANULARITIES:
+            starts = _period_starts(days, granularity)
+            first = starts.min() if len(starts) else 0
+            span = (starts.max() - first + 1) if len(starts) else 1
+
+            # one key per (item, period), then one bincount per measure
+            cells, inverse = np.unique(item_codes * span + (starts - first), return_inverse=True)
+            cell_items = cells // span
+            offsets[granularity] = np.searchsorted(cell_items, np.arange(len(items) + 1))
+            periods[granularity] = cells % span + first
+            measures[granularity] = {
+                'total_sales': np.bincount(inverse, weights=amounts, minlength=len(cells)),
+                'units_sold': np.bincount(inverse, minlength=len(cells)).astype(np.int64),
+            }
+        return cls(items, offsets, periods, measures)
+
+    def item_series(self, item, granularity='month', start=None, end=None):
+        # one item's totals per period as plain arrays, optionally limited to [start, end] (plus the
+        # neighbouring period on each side, so a zoomed line still runs to the edges of the view)
+        i = self.item_lookup.get(item)
+        if i is None:
+            return {'period': np.zeros(0, dtype='datetime64[D]'), 'Total_Sales': np.zeros(0),
+                    'Units_Sold': np.zeros(0, dtype=np.int64)}
+        lo, hi = self.offsets[granularity][i], self.offsets[granularity][i + 1]
+        periods = self.periods[granularity]
+        if start is not None:
+            lo += max(np.searchsorted(periods[lo:hi], _epoch_day(start)) - 1, 0)
+        if end is not None:
+            hi = min(lo + np.searchsorted(periods[lo:hi], _epoch_day(end), side='right') + 1, hi)
+        measures = self.measures[granularity]
+        return {
+            'period': periods[lo:hi].astype('datetime64[D]'),
+            'Total_Sales': measures['total_sales'][lo:hi],
+            'Units_Sold': measures['units_sold'][lo:hi],
+        }
+
+def _period_starts(days, granularity):
+    # first day of the day/week/month containing each day (1970-01-01 was a thursday)
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        return days - (days + 3) % 7
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+def _epoch_day(value):
+    return np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64)
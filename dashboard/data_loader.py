@@ -1,4 +1,9 @@
+import os
+from collections import namedtuple
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
 
 # list of valid clothing items to keep from the dataset
 clothing_items = [
@@ -9,29 +14,138 @@ clothing_items = [
     'Vest', 'Jumpsuit', 'Raincoat', 'Skirt', 'Pants'
 ]
 
-def load_and_clean_data(csv="retail_sales.csv"):
-    # load data from csv
-    df = pd.read_csv(csv)
-    
-    # convert date column to datetime format
-    df['date'] = pd.to_datetime(df['date'])
-    
+# explicit schema for the columnar ingest path (no type or date-format inference); customer ids are
+# parsed as float64 since exports can have blank ones (the nullable Int64 parser is several times slower)
+csv_dtypes = {
+    'customerID': 'float64',
+    'item': 'category',
+    'amount_usd': 'float64',
+    'review': 'float64',
+    'payment': 'category',
+}
+date_format = '%m/%d/%Y'
+
+# sparse customer x item matrix plus the labels behind its integer codes
+InteractionMatrix = namedtuple('InteractionMatrix', ['matrix', 'customers', 'items'])
+
+def load_and_clean_data(csv="retail_sales.csv", columnar=False, items=clothing_items):
+    if columnar:
+        # typed columnar copy of the csv (categorical item/payment, parsed dates)
+        df = load_columnar_sales(csv)
+    else:
+        # load data from csv
+        df = pd.read_csv(csv)
+        
+        # convert date column to datetime format
+        df['date'] = pd.to_datetime(df['date'])
+
+    return clean_sales_data(df, items)
+
+def clean_sales_data(df, items=clothing_items):
+    # create a new column for month using timestamp (on the freshly read frame, before any row filtering)
+    df['month'] = df['date'].dt.to_period('M').dt.to_timestamp()
+
     # remove rows with missing sales amounts
     df = df.dropna(subset=['amount_usd'])
     
-    # create a new column for month using timestamp
-    df['month'] = df['date'].dt.to_period('M').dt.to_timestamp()
-    
-    # keep only rows where item is in the list of clothing items
-    df = df[df['item'].isin(clothing_items)].copy()
+    # keep only rows where item is in the list of clothing items (or another catalogue, e.g. synthetic data)
+    df = df[df['item'].isin(items)].copy()
+
+    # drop categories that only belonged to filtered-out rows
+    for col in ['item', 'payment']:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
     
     return df
 
+def load_columnar_sales(csv="retail_sales.csv"):
+    # the csv stays the source of truth; the parquet copy is reused while it was written from a csv
+    # with the same content hash as the artifact store's (mtimes alone miss a copy with older timestamps)
+    from dashboard.artifacts import source_hash
+
+    parquet = os.path.splitext(csv)[0] + '.parquet'
+    digest = source_hash(csv)
+    if _parquet_source_hash(parquet) == digest:
+        return pd.read_parquet(parquet)
+
+    # parse with a fixed schema and date format instead of per-value inference
+    df = pd.read_csv(csv, dtype=csv_dtypes)
+    df['date'] = pd.to_datetime(df['date'], format=date_format)
+
+    # ids come back as plain int64 like before; with blank ids they stay float64, as the untyped parse gives,
+    # and whatever is keyed by customer (interaction matrices, customer index) drops those rows and casts back
+    if not df['customerID'].hasnans:
+        df['customerID'] = df['customerID'].astype('int64')
+
+    # write to a temporary name first so a concurrent reader never sees a half-written file
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'source_hash': digest.encode()})
+        tmp_path = f"{parquet}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, parquet)
+    except (ImportError, OSError):
+        # no parquet engine or a read-only deploy: keep serving from the typed csv parse
+        pass
+
+    return df
+
+def _parquet_source_hash(parquet):
+    # the source hash stamped into a parquet copy's metadata (None when missing, unreadable or unstamped)
+    try:
+        import pyarrow.parquet as pq
+        metadata = pq.read_schema(parquet).metadata or {}
+    except (ImportError, OSError, ValueError):
+        return None
+    digest = metadata.get(b'source_hash')
+    return digest.decode() if digest else None
+
 def prepare_monthly_sales(df):
     # group data by item and month, summing sales and counting units sold
-    monthly_sales = df.groupby(['item', 'month']).agg(
+    monthly_sales = df.groupby(['item', 'month'], observed=True).agg(
         Total_Sales=('amount_usd', 'sum'),
         Units_Sold=('item', 'count')
     ).reset_index()
     
     return monthly_sales
+
+def build_interaction_matrix(df, values=None):
+    # only rows with a value count as interactions when aggregating a column
+    # purchases without a customer id belong to no row (the pivot_table this replaces dropped them too)
+    df = df.dropna(subset=['customerID'])
+    if values is None:
+        return interaction_matrix(known_customer_ids(df), df['item'])
+
+    df = df.dropna(subset=[values])
+    return interaction_matrix(known_customer_ids(df), df['item'], sums=df[values].to_numpy(dtype=float))
+
+def known_customer_ids(df):
+    # integer customer ids of rows that have one (a column with blank ids is parsed as float64)
+    return df['customerID'].dropna().to_numpy().astype(np.int64)
+
+def interaction_matrix(customer_ids, item_ids, sums=None, counts=None):
+    # integer-code customers and items (sorted, like the pivot_table axes)
+    customer_codes, customers = pd.factorize(customer_ids, sort=True)
+    item_codes, items = pd.factorize(item_ids, sort=True)
+    shape = (len(customers), len(items))
+    coords = (customer_codes, item_codes)
+
+    # count interactions per customer/item pair (duplicate coordinates are summed on conversion)
+    if counts is None:
+        counts = np.ones(len(customer_codes))
+    matrix = sparse.coo_matrix((counts, coords), shape=shape).tocsr()
+
+    if sums is None:
+        # binary matrix indicating whether a customer bought an item (1) or not (empty)
+        matrix.data[:] = 1.0
+    else:
+        # mean value per customer/item pair, stored on the same sparsity pattern as the counts
+        matrix.data = sparse.coo_matrix((sums, coords), shape=shape).tocsr().data / matrix.data
+
+    # plain labels even when the source columns are categorical
+    customers = pd.Index(np.asarray(customers), name='customerID')
+    items = pd.Index(np.asarray(items), name='item')
+    return InteractionMatrix(matrix, customers, items)
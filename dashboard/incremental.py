@@ -0,0 +1,317 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data_loader import clothing_items, clean_sales_data, date_format
+from dashboard.components.bundles import score_bundles
+
+class IncrementalState:
+    # maintained aggregates behind monthly sales, item similarity and bundles, updated
+    # batch by batch in time proportional to the batch instead of recomputing from scratch
+    #
+    # the pairwise statistics are item x item arrays, but an update only reads and writes the
+    # rows/columns of the items it touches. a bundle list is only rescored when a changed entry of its
+    # column can change it (see _refresh_bundles), and the full matrices are only built when asked
+    # for (similarity_df, co_purchase)
+
+    def __init__(self, items=clothing_items, weight=0.5, top_k=3):
+        self.catalogue = items    # items kept by cleaning
+        self.weight = weight      # bundle scoring, as score_bundles
+        self.top_k = top_k
+        self.items = []           # item names in order of first appearance
+        self.item_index = {}      # item name -> row/column position
+        self.order = []           # positions in item name order (the layout of every output)
+        self.monthly = {}         # (item, month) -> [total sales, units sold]
+        self.ratings = {}         # customerID -> {item position: [review sum, review count]}
+        self.purchases = {}       # customerID -> set of purchased item positions
+        self.bundles = {}         # item name -> bundle recommendation rows
+        self._allocate(0)
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        # seed the state from an initial load (the same update path as every later batch)
+        state = cls(**kwargs)
+        state.update(df)
+        return state
+
+    def update(self, batch):
+        # fold a batch of new transactions into the state and return the items whose outputs changed
+        batch = self._clean(batch)
+        if batch.empty:
+            return set()
+        added = self._add_items(batch['item'].unique())
+
+        # monthly item aggregates
+        monthly = batch.groupby(['item', 'month'], observed=True).agg(
+            Total_Sales=('amount_usd', 'sum'),
+            Units_Sold=('item', 'count')
+        )
+        for key, total, units in zip(monthly.index, monthly['Total_Sales'], monthly['Units_Sold']):
+            totals = self.monthly.setdefault(key, [0.0, 0])
+            totals[0] += total
+            totals[1] += units
+
+        # per customer: new purchases feed the co-occurrence counts, new reviews the rating statistics
+        pairs = batch.groupby(['customerID', 'item'], observed=True).agg(
+            review_sum=('review', 'sum'),
+            review_count=('review', 'count')
+        )
+        rated_items, bought_items = set(), set()
+        co_rows, co_cols = [], []
+        for customer, group in pairs.groupby(level='customerID', sort=False):
+            positions = [self.item_index[item] for item in group.index.get_level_values('item')]
+            new, owned = self._add_purchases(customer, positions)
+            if len(new):
+                # entries (new, owned) of the co-occurrence matrix changed, mirrored
+                bought_items.update(new.tolist())
+                co_rows += [np.repeat(new, len(owned)), np.tile(owned, len(new))]
+                co_cols += [np.tile(owned, len(new)), np.repeat(new, len(owned))]
+
+            reviewed = group['review_count'].to_numpy() > 0
+            if reviewed.any():
+                rated_items |= self._add_ratings(
+                    customer,
+                    np.asarray(positions)[reviewed],
+                    group['review_sum'].to_numpy(dtype=float)[reviewed],
+                    group['review_count'].to_numpy()[reviewed]
+                )
+
+        # a changed rating shifts its item's mean, so only those similarity rows/columns are recomputed
+        sim_rows, sim_cols, renormalized = self._refresh_similarity(rated_items)
+
+        # columns whose own item changed (its co-purchase count with itself is the column's normalizer,
+        # and a new mean changes the whole similarity column) or whose similarity max moved are rescored
+        # outright. a new item is a candidate in every column, so adding items rescores everything
+        rows = np.concatenate(co_rows + [sim_rows]).astype(np.int64)
+        cols = np.concatenate(co_cols + [sim_cols]).astype(np.int64)
+        full = bought_items | rated_items | renormalized
+        if added:
+            full = set(range(len(self.items)))
+        self._refresh_bundles(full, rows, cols)
+
+        return {self.items[pos] for pos in full | set(cols.tolist())}
+
+    def monthly_sales(self):
+        # same layout as prepare_monthly_sales
+        monthly_sales = pd.DataFrame(
+            [(item, month, total, units) for (item, month), (total, units) in self.monthly.items()],
+            columns=['item', 'month', 'Total_Sales', 'Units_Sold']
+        )
+        return monthly_sales.sort_values(['item', 'month']).reset_index(drop=True)
+
+    def similarity_df(self, columns=None):
+        # same layout as compute_item_similarity (items with at least one rating, sorted); `columns`
+        # (positions) limits it to those items' columns
+        rated = self._rated_positions()
+        columns = rated if columns is None else self._subset(rated, columns)
+        return pd.DataFrame(self.similarity[np.ix_(rated, columns)],
+                            index=self._names(rated), columns=self._names(columns))
+
+    def co_purchase(self, columns=None):
+        columns = self.order if columns is None else self._subset(self.order, columns)
+        return pd.DataFrame(self.co_counts[np.ix_(self.order, columns)].astype(float),
+                            index=self._names(self.order), columns=self._names(columns))
+
+    def bundle_df(self):
+        # same layout as generate_bundle_recommendations
+        rows = [row for pos in self.order for row in self.bundles.get(self.items[pos], [])]
+        return pd.DataFrame(rows)
+
+    def _clean(self, batch):
+        # accept raw csv rows as well as frames with parsed dates
+        batch = batch.copy()
+        if not pd.api.types.is_datetime64_any_dtype(batch['date']):
+            batch['date'] = pd.to_datetime(batch['date'], format=date_format)
+        if 'month' in batch:
+            batch = batch.drop(columns='month')
+        return clean_sales_data(batch, self.catalogue)
+
+    def _rated_positions(self):
+        return [pos for pos in self.order if self.rating_count[pos] > 0]
+
+    def _subset(self, positions, keep):
+        keep = set(keep)
+        return [pos for pos in positions if pos in keep]
+
+    def _names(self, positions):
+        return pd.Index([self.items[pos] for pos in positions], name='item')
+
+    def _allocate(self, capacity):
+        # item-indexed statistics; pair matrices grow by doubling when new items appear
+        self.rating_sum = np.zeros(capacity)
+        self.rating_count = np.zeros(capacity, dtype=np.int64)
+        self.pair_products = np.zeros((capacity, capacity))              # sum of r_i * r_j over shared raters
+        self.pair_sums = np.zeros((capacity, capacity))                  # sum of r_i over raters of both i and j
+        self.pair_sumsq = np.zeros((capacity, capacity))                 # sum of r_i^2 over raters of both i and j
+        self.shared_counts = np.zeros((capacity, capacity), dtype=np.int64)
+        self.co_counts = np.zeros((capacity, capacity), dtype=np.int64)  # customers who bought both items
+        self.similarity = np.full((capacity, capacity), np.nan)
+
+        # per bundle column: its similarity max, the k-th best combined score (nan when unknown) and
+        # which candidates are listed
+        self.similarity_max = np.full(capacity, np.nan)
+        self.bundle_floor = np.full(capacity, np.nan)
+        self.listed = np.zeros((capacity, capacity), dtype=bool)
+
+    def _add_items(self, names):
+        new_names = [name for name in names if name not in self.item_index]
+        if not new_names:
+            return False
+        for name in new_names:
+            self.item_index[name] = len(self.items)
+            self.items.append(name)
+        self.order = sorted(range(len(self.items)), key=self.items.__getitem__)
+
+        capacity = len(self.rating_sum)
+        if len(self.items) <= capacity:
+            return True
+        old = {name: getattr(self, name) for name in [
+            'rating_sum', 'rating_count', 'pair_products', 'pair_sums', 'pair_sumsq',
+            'shared_counts', 'co_counts', 'similarity', 'similarity_max', 'bundle_floor', 'listed'
+        ]}
+        self._allocate(max(2 * capacity, len(self.items)))
+        for name, values in old.items():
+            getattr(self, name)[tuple(slice(0, capacity) for _ in values.shape)] = values
+        return True
+
+    def _add_purchases(self, customer, positions):
+        # returns the newly owned positions and everything the customer owns now
+        owned = self.purchases.setdefault(customer, set())
+        new = np.asarray([pos for pos in positions if pos not in owned], dtype=np.int64)
+        if not len(new):
+            return new, new
+        owned.update(new.tolist())
+
+        # every newly owned item now co-occurs with everything the customer owns (itself included)
+        owned_positions = np.fromiter(owned, dtype=np.int64)
+        self.co_counts[np.ix_(new, owned_positions)] += 1
+        self.co_counts[np.ix_(owned_positions, new)] += 1
+        self.co_counts[np.ix_(new, new)] -= 1
+        return new, owned_positions
+
+    def _add_ratings(self, customer, positions, review_sums, review_counts):
+        ratings = self.ratings.setdefault(customer, {})
+
+        # swap the customer's old mean ratings for the new ones in every sufficient statistic
+        self._apply_customer_ratings(ratings, -1)
+        for pos, review_sum, review_count in zip(positions, review_sums, review_counts):
+            totals = ratings.setdefault(pos, [0.0, 0])
+            totals[0] += review_sum
+            totals[1] += review_count
+        self._apply_customer_ratings(ratings, 1)
+
+        return set(positions.tolist())
+
+    def _apply_customer_ratings(self, ratings, sign):
+        if not ratings:
+            return
+        positions = np.fromiter(ratings, dtype=np.int64)
+        means = np.array([review_sum / review_count for review_sum, review_count in ratings.values()])
+        grid = np.ix_(positions, positions)
+
+        self.rating_sum[positions] += sign * means
+        self.rating_count[positions] += sign
+        self.pair_products[grid] += sign * np.outer(means, means)
+        self.pair_sums[grid] += sign * means[:, None]
+        self.pair_sumsq[grid] += sign * (means ** 2)[:, None]
+        self.shared_counts[grid] += sign
+
+    def _refresh_similarity(self, positions):
+        # recompute the rows/columns of `positions`; returns the changed entries (rows, columns) and the
+        # columns whose similarity max may have moved
+        empty = np.zeros(0, dtype=np.int64)
+        if not positions:
+            return empty, empty, set()
+        n_items = len(self.items)
+        rows = np.array(sorted(positions))
+        cols = slice(0, n_items)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.rating_sum[:n_items] / self.rating_count[:n_items]
+        row_means = means[rows][:, None]
+        col_means = means[None, :]
+
+        # centered cosine from sufficient statistics: sum((r_i - m_i)(r_j - m_j)) over shared raters, etc.
+        shared = self.shared_counts[rows, cols]
+        row_sums = self.pair_sums[rows, cols]
+        col_sums = self.pair_sums[cols, rows].T
+        numerators = (self.pair_products[rows, cols] - col_means * row_sums
+                      - row_means * col_sums + shared * row_means * col_means)
+        row_norms = self._centered_norms(self.pair_sumsq[rows, cols], row_sums, row_means, shared)
+        col_norms = self._centered_norms(self.pair_sumsq[cols, rows].T, col_sums, col_means, shared)
+
+        # zero-norm pairs score 0, pairs with fewer than two shared ratings are nan (as compute_item_similarity)
+        denominators = row_norms * col_norms
+        similarity = np.divide(numerators, denominators,
+                               out=np.zeros_like(denominators), where=denominators > 0)
+        similarity[shared < 2] = np.nan
+
+        old = self.similarity[rows, cols]
+        self.similarity[rows, cols] = similarity
+        self.similarity[cols, rows] = similarity.T
+
+        # a column's max moved if a changed entry now beats it or was it; columns without a max are
+        # treated as moved
+        changed = ~((old == similarity) | (np.isnan(old) & np.isnan(similarity)))
+        column_max = self.similarity_max[:n_items][None, :]
+        moved = changed & ((similarity > column_max) | (old == column_max) | np.isnan(column_max))
+        changed_rows, changed_cols = np.nonzero(changed)
+        return rows[changed_rows], changed_cols, set(np.flatnonzero(moved.any(axis=0)).tolist())
+
+    def _centered_norms(self, sumsq, sums, means, shared):
+        # sum((r - m)^2) expanded; cancellation noise on constant ratings is snapped back to zero
+        with np.errstate(invalid='ignore'):
+            squares = sumsq - 2 * means * sums + shared * means ** 2
+        squares[~(squares > 1e-9 * sumsq)] = 0.0
+        return np.sqrt(squares)
+
+    def _refresh_bundles(self, full, rows, cols):
+        # rescore the `full` columns, plus any column where a changed candidate (rows[i] in column
+        # cols[i]) is listed or now scores at least the column's k-th best. with its normalizers
+        # unchanged, no other candidate of the column moves, so the rest keep their lists
+        if len(rows):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = self._combined(rows, cols)
+            floor = self.bundle_floor[cols]
+            with np.errstate(invalid='ignore'):
+                affected = self.listed[rows, cols] | np.isnan(floor) | (scores >= floor)
+            full = full | set(cols[affected].tolist())
+        if not full:
+            return
+
+        positions = sorted(full)
+        names = [self.items[pos] for pos in positions]
+        with warnings.catch_warnings():
+            # unrated items are reported by score_bundles on every rescore; the full build reports them once
+            warnings.simplefilter('ignore', UserWarning)
+            bundle_df = score_bundles(self.co_purchase(positions), self.similarity_df(positions), items=names,
+                                      weight=self.weight, top_k=self.top_k)
+
+        # every rescored column's normalizer and listed candidates are recorded for the next update
+        n_items = len(self.items)
+        self.listed[:, positions] = False
+        self.bundle_floor[positions] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.similarity_max[positions] = np.nanmax(self.similarity[:n_items, positions], axis=0)
+        for name in names:
+            self.bundles.pop(name, None)
+        if bundle_df.empty:
+            return
+        for name, group in bundle_df.groupby('item', sort=False):
+            self.bundles[name] = group.to_dict('records')
+            col = self.item_index[name]
+            listed = np.array([self.item_index[item] for item in group['recommended_bundle']], dtype=np.int64)
+            self.listed[listed, col] = True
+            if len(listed) == min(self.top_k, n_items - 1):
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    floor = self._combined(listed, np.full(len(listed), col)).min()
+                self.bundle_floor[col] = floor if np.isfinite(floor) else np.nan
+
+    def _combined(self, rows, cols):
+        # score_bundles' combined score of candidates rows[i] in columns cols[i] (same operation order)
+        co = self.co_counts[rows, cols].astype(float)
+        sim = self.similarity[rows, cols]
+        return (co / self.co_counts[cols, cols]) * self.weight + \
+               (sim / self.similarity_max[cols]) * (1 - self.weight)
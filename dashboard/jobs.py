@@ -0,0 +1,275 @@
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from dashboard.artifacts import ARTIFACT_ROOT, load_artifact, load_artifacts
+from dashboard.build_artifacts import compute_artifacts
+from dashboard.components.forecast import fit_cache, forecast_item_backtest, forecast_item_future
+from dashboard.metrics import metrics
+
+# worker processes for background jobs (override with DASHBOARD_JOB_WORKERS)
+JOB_WORKERS = int(os.environ.get('DASHBOARD_JOB_WORKERS', 2))
+
+# shared result store; every app process (e.g. gunicorn workers) on the host uses the same file
+JOB_STORE = os.environ.get('DASHBOARD_JOB_STORE', str(Path(ARTIFACT_ROOT) / 'jobs.sqlite'))
+
+# a job may return its value with counter increments; the queue stores the value and adds the
+# increments to the store's counters, so state that lives in the workers can be read from any app process
+JobResult = namedtuple('JobResult', ['value', 'counters'])
+
+class JobQueue:
+    # expensive callback work runs in a local process pool and lands in a sqlite table keyed by the
+    # caller's job key; callbacks submit, return a placeholder and poll result() until the job is done
+    #
+    # a key is claimed with an insert, so identical requests (from any thread or app process) while
+    # the job is in flight attach to the same job instead of starting another one. the claiming process
+    # is recorded as the owner and refreshes a heartbeat while its jobs run: a pending job is taken over
+    # as soon as its owner process is gone (same host), or once the heartbeat is stale_after seconds old.
+    # finished results, failures included, are reused for ttl seconds; a retry request re-runs a failure
+
+    def __init__(self, path=JOB_STORE, workers=JOB_WORKERS, ttl=24 * 3600, stale_after=30,
+                 initializer=None, initargs=()):
+        self.path = str(path)
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._pool = None
+        self._lock = threading.Lock()
+        self._owned = set()          # keys this process claimed and has not stored yet
+        self._heartbeat_pid = None   # process the heartbeat thread runs in (threads don't survive a fork)
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    key TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    submitted REAL NOT NULL,
+                    finished REAL,
+                    result BLOB,
+                    error TEXT
+                )
+            """)
+            # stores created before jobs had owners
+            columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in [('owner_host', 'TEXT'), ('owner_pid', 'INTEGER'), ('heartbeat', 'REAL')]:
+                if column not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def submit(self, key, fn, *args, retry=False):
+        # start fn(*args) in the pool unless the same key is already running or recently finished
+        # (with retry, a recorded failure is run again instead of being reused)
+        now = time.time()
+        host, pid = socket.gethostname(), os.getpid()
+        claim = (now, host, pid, now)
+        with self._connect() as db:
+            claimed = db.execute(
+                "INSERT OR IGNORE INTO jobs (key, status, submitted, owner_host, owner_pid, heartbeat) "
+                "VALUES (?, 'pending', ?, ?, ?, ?)", (key, *claim)
+            ).rowcount
+            if not claimed:
+                # take over jobs without a recent heartbeat, expired results and (on retry) failures
+                claimed = db.execute(
+                    "UPDATE jobs SET status = 'pending', submitted = ?, finished = NULL, result = NULL, error = NULL, "
+                    "owner_host = ?, owner_pid = ?, heartbeat = ? "
+                    "WHERE key = ? AND ((status = 'pending' AND COALESCE(heartbeat, submitted) < ?) "
+                    "OR (status != 'pending' AND finished < ?) OR (status = 'failed' AND ?))",
+                    (*claim, key, now - self.stale_after, now - self.ttl, retry)
+                ).rowcount
+            if not claimed:
+                # or whose owner process on this host has exited
+                row = db.execute("SELECT owner_host, owner_pid FROM jobs WHERE key = ? AND status = 'pending'",
+                                 (key,)).fetchone()
+                if row is not None and row[0] == host and not _process_alive(row[1]):
+                    claimed = db.execute(
+                        "UPDATE jobs SET submitted = ?, owner_host = ?, owner_pid = ?, heartbeat = ? "
+                        "WHERE key = ? AND status = 'pending' AND owner_host = ? AND owner_pid = ?",
+                        (*claim, key, *row)
+                    ).rowcount
+        if not claimed:
+            return False
+
+        with self._lock:
+            self._owned.add(key)
+        self._start_heartbeat()
+
+        try:
+            future = self._executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # a crashed worker breaks the pool for good; start a fresh one
+            with self._lock:
+                self._pool = None
+            future = self._executor().submit(fn, *args)
+        future.add_done_callback(lambda done: self._store(key, done, fn.__qualname__, now))
+        return True
+
+    def result(self, key):
+        # (status, value): ('done', result), ('failed', error message), ('pending', None) or (None, None)
+        with self._connect() as db:
+            row = db.execute("SELECT status, result, error, finished FROM jobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        status, result, error, finished = row
+        if status == 'pending':
+            return 'pending', None
+        if finished < time.time() - self.ttl:
+            return None, None
+        if status == 'failed':
+            # kept like a result, so pollers (in any process) all see the failure until a retry
+            return 'failed', error
+        return 'done', pickle.loads(result)
+
+    def run(self, key, fn, *args, retry=False):
+        # submit if needed and return the current (status, value) in one call; retry marks an explicit
+        # new request, which runs a failed job again rather than reporting the stored failure
+        status, value = self.result(key)
+        if status == 'done' or (status == 'failed' and not retry):
+            return status, value
+        self.submit(key, fn, *args, retry=retry)
+        return 'pending', None
+
+    def shutdown(self):
+        with self._lock:
+            self._owned.clear()
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _executor(self):
+        # the pool starts on first use
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer,
+                                                 initargs=self.initargs)
+            return self._pool
+
+    def _start_heartbeat(self):
+        # one daemon thread per process refreshes the heartbeat of the jobs it owns
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        host, pid = socket.gethostname(), os.getpid()
+        while True:
+            time.sleep(self.stale_after / 3)
+            with self._lock:
+                keys = list(self._owned)
+            if not keys:
+                continue
+            try:
+                with self._connect() as db:
+                    db.executemany(
+                        "UPDATE jobs SET heartbeat = ? WHERE key = ? AND status = 'pending' "
+                        "AND owner_host = ? AND owner_pid = ?",
+                        [(time.time(), key, host, pid) for key in keys]
+                    )
+            except sqlite3.Error:
+                # a busy store just delays this beat; the next one is well within stale_after
+                pass
+
+    def _store(self, key, future, name, submitted):
+        # runs in the submitting process when the worker finishes, once per job, so the job's time from
+        # submission to result (queueing included) and its failures land in this process's /metrics
+        now = time.time()
+        counters = {}
+        try:
+            result = future.result()
+            if isinstance(result, JobResult):
+                result, counters = result
+            payload, error = pickle.dumps(result), None
+        except Exception as e:
+            payload, error = None, f"{type(e).__name__}: {e}"
+        metrics.observe('job', name, now - submitted, error is not None)
+        with self._lock:
+            self._owned.discard(key)
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE key = ?",
+                ('failed' if error else 'done', now, payload, error, key)
+            )
+            db.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                counters.items()
+            )
+
+    def counters(self, prefix=''):
+        # totals of the counters reported by finished jobs, across all workers and app processes
+        with self._connect() as db:
+            rows = db.execute("SELECT name, value FROM counters WHERE name LIKE ? || '%'", (prefix,)).fetchall()
+        return {name[len(prefix):]: value for name, value in rows}
+
+    @contextmanager
+    def _connect(self):
+        # one short-lived connection per use (sqlite connections can't be shared across threads),
+        # committed on success and rolled back on error
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+def _process_alive(pid):
+    # rows from before owners were recorded have no pid; those wait for the heartbeat check
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # alive, but another user's
+        return True
+    return True
+
+# job functions (run inside the pool's worker processes)
+
+_worker_tables = {}
+
+# fit cache counters a forecast job reports back (see JobResult)
+FIT_CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'coalesced')
+
+def split_fit_cache(workers):
+    # pool initializer: every worker keeps its own fit cache, so each gets a share of
+    # FORECAST_CACHE_SIZE and the pool as a whole stays within the configured bound
+    fit_cache.maxsize = max(1, fit_cache.maxsize // workers)
+
+def forecast_figure(csv, root, item_name, forecast_type, periods, order, seasonal_order, store=None):
+    # live arima forecast figure for one item; monthly sales are memory-mapped from the store once per
+    # worker (from `store` when the app serves a published version, see dashboard.shared_state).
+    # the worker's fit cache counters for this job come back with the figure
+    key = str(store) if store else (csv, root)
+    if key not in _worker_tables:
+        # only the version being served stays mapped
+        _worker_tables.clear()
+        if store:
+            _worker_tables[key] = load_artifact(store, 'monthly_sales')
+        else:
+            # on a cold store only the stages behind monthly_sales run
+            artifacts = load_artifacts(csv, root, names=['monthly_sales']) or compute_artifacts(csv, ['monthly_sales'])
+            _worker_tables[key] = artifacts['monthly_sales']
+    monthly_sales = _worker_tables[key]
+    before = fit_cache.stats()
+
+    if forecast_type == 'future':
+        fig = forecast_item_future(monthly_sales, item_name, periods, order, seasonal_order)
+    else:
+        fig = forecast_item_backtest(monthly_sales, item_name, order, seasonal_order)
+    after = fit_cache.stats()
+    return JobResult(fig.to_dict(), {f"fit_cache_{name}": after[name] - before[name] for name in FIT_CACHE_COUNTERS})
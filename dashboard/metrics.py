@@ -0,0 +1,201 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# histogram bucket upper bounds: latency in seconds, payloads in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PAYLOAD_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+
+# share of instrumented calls run under cProfile (0 = off); DASHBOARD_PROFILE_MEMORY=1 adds tracemalloc
+PROFILE_RATE = float(os.environ.get('DASHBOARD_PROFILE_RATE', 0.0))
+PROFILE_MEMORY = os.environ.get('DASHBOARD_PROFILE_MEMORY', '0') == '1'
+
+class Histogram:
+    # cumulative-bucket histogram in the prometheus layout (the caller holds the lock)
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, metric, labels):
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            yield f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{metric}_sum{{{labels}}} {self.total}'
+        yield f'{metric}_count{{{labels}}} {self.count}'
+
+class Metrics:
+    # latency, error and payload statistics per instrumented function, rendered as prometheus text
+    #
+    # every series is labelled by kind (callback, dataset, stage, job) and function name. a sampled share of
+    # calls additionally runs under cProfile (and optionally tracemalloc); the last few profiles per
+    # function are kept for /metrics/profiles. counters are per process, so each gunicorn worker
+    # reports its own traffic
+
+    def __init__(self, profile_rate=PROFILE_RATE, profile_memory=PROFILE_MEMORY, profiles_kept=5):
+        self.profile_rate = profile_rate
+        self.profile_memory = profile_memory
+        self.profiles_kept = profiles_kept
+        self._latency = {}
+        self._payload = {}
+        self._errors = {}
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+        # one profiled call at a time: cProfile and tracemalloc are process-wide
+        self._profile_lock = threading.Lock()
+
+    def timed(self, kind, name=None, expected=()):
+        # decorator: time every call; exceptions count as errors unless they are `expected` flow control
+        def decorate(fn):
+            label = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                return self.call(kind, label, fn, *args, expected=expected, **kwargs)
+            return wrapper
+        return decorate
+
+    def call(self, kind, name, fn, *args, expected=(), **kwargs):
+        sampled = self.profile_rate > 0 and random.random() < self.profile_rate
+        if sampled and self._profile_lock.acquire(blocking=False):
+            try:
+                return self._profiled(kind, name, fn, args, kwargs, expected)
+            finally:
+                self._profile_lock.release()
+
+        start = time.perf_counter()
+        error = False
+        try:
+            return fn(*args, **kwargs)
+        except expected:
+            raise
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(kind, name, time.perf_counter() - start, error)
+
+    def observe(self, kind, name, seconds, error=False):
+        key = (kind, name)
+        with self._lock:
+            if key not in self._latency:
+                self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._errors[key] = 0
+            self._latency[key].observe(seconds)
+            self._errors[key] += error
+
+    def observe_payload(self, kind, name, size):
+        key = (kind, name)
+        with self._lock:
+            if key not in self._payload:
+                self._payload[key] = Histogram(PAYLOAD_BUCKETS)
+            self._payload[key].observe(size)
+
+    def profiles(self):
+        with self._lock:
+            return {f'{kind}:{name}': list(kept) for (kind, name), kept in self._profiles.items()}
+
+    def render(self):
+        # prometheus text exposition format (version 0.0.4)
+        with self._lock:
+            lines = [
+                '# HELP dashboard_latency_seconds Wall time of instrumented callbacks, datasets and pipeline stages.',
+                '# TYPE dashboard_latency_seconds histogram',
+            ]
+            for key, histogram in sorted(self._latency.items()):
+                lines.extend(histogram.lines('dashboard_latency_seconds', _labels(*key)))
+
+            lines += ['# HELP dashboard_errors_total Calls that raised an exception.',
+                      '# TYPE dashboard_errors_total counter']
+            lines += [f'dashboard_errors_total{{{_labels(*key)}}} {count}' for key, count in sorted(self._errors.items())]
+
+            lines += ['# HELP dashboard_payload_bytes Size of the response sent for a callback.',
+                      '# TYPE dashboard_payload_bytes histogram']
+            for key, histogram in sorted(self._payload.items()):
+                lines.extend(histogram.lines('dashboard_payload_bytes', _labels(*key)))
+
+            lines += ['# HELP dashboard_profiles_total Calls sampled for profiling.',
+                      '# TYPE dashboard_profiles_total counter']
+            lines += [f'dashboard_profiles_total{{{_labels(*key)}}} {kept.total}'
+                      for key, kept in sorted(self._profiles.items())]
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._payload.clear()
+            self._errors.clear()
+            self._profiles.clear()
+
+    def _profiled(self, kind, name, fn, args, kwargs, expected):
+        profiler = cProfile.Profile()
+
+        # leave tracemalloc alone when something else (e.g. dashboard.benchmark) is already tracing
+        trace_memory = self.profile_memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        error = False
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        except expected:
+            raise
+        except Exception:
+            error = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            profile = {'timestamp': time.time(), 'seconds': seconds, 'error': error}
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                profile['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                profile['top_allocations'] = [str(stat) for stat in snapshot.statistics('lineno')[:10]]
+
+            # the 25 most expensive functions by cumulative time
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(25)
+            profile['stats'] = out.getvalue()
+
+            self.observe(kind, name, seconds, error)
+            with self._lock:
+                kept = self._profiles.setdefault((kind, name), _Profiles(self.profiles_kept))
+                kept.append(profile)
+
+class _Profiles(deque):
+    # the most recent profiles of one function plus how many were ever taken
+    def __init__(self, maxlen):
+        super().__init__(maxlen=maxlen)
+        self.total = 0
+
+    def append(self, profile):
+        super().append(profile)
+        self.total += 1
+
+def _labels(kind, name):
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'kind="{escape(kind)}",name="{escape(name)}"'
+
+# process-wide instance shared by the app, the data registry, the artifact pipeline and the job queue
+metrics = Metrics()
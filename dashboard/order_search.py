@@ -0,0 +1,168 @@
+import argparse
+import json
+import math
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from dashboard.artifacts import ARTIFACT_ROOT, artifact_path
+from dashboard.build_artifacts import load_or_build_artifacts
+from dashboard.components.forecast import prepare_item_series, backtest_split, NO_SEASONAL_ORDER
+
+# file name of the per-item winning orders inside an artifact directory
+ORDERS_FILE = 'forecast_orders.json'
+
+def search_item_order(sales, max_p=3, max_d=2, max_q=3, seasonal_period=None, patience=1, aic_margin=4.0):
+    # stage 1: rank (p, q) by aic on the pre-differenced series, stage 2: pick the shortlist's best backtest mape
+    values = np.asarray(sales, dtype=float)
+    train, test = (part.to_numpy() for part in backtest_split(pd.Series(values)))
+    seasonal_orders = _seasonal_candidates(len(values), seasonal_period)
+
+    shortlist = []
+    fitted = 0
+    for d in range(max_d + 1):
+        # difference once per d and reuse the differenced series for every (p, q) candidate; arima(p, d, q)
+        # carries no constant for d > 0, so the equivalent arma on the differenced data has no trend either
+        diffed = np.diff(values, n=d)
+        trend = 'c' if d == 0 else 'n'
+        candidates = []
+        best_aic, stale_levels = math.inf, 0
+
+        # grow model complexity level by level (p + q) and stop once more terms stop helping: a level is
+        # stale when none of its fits comes within aic_margin of the best so far, i.e. it adds nothing to
+        # the shortlist (a level that is slightly worse can still hold the best backtest, so it continues)
+        for level in range(max_p + max_q + 1):
+            level_aic = math.inf
+            for p in range(max(0, level - max_q), min(level, max_p) + 1):
+                q = level - p
+                for seasonal_order in seasonal_orders:
+                    n_params = p + q + sum(seasonal_order[:3]) + (trend == 'c') + 1
+                    if n_params >= len(diffed) - 1:
+                        continue
+                    aic = _fit_aic(diffed, (p, 0, q), seasonal_order, trend)
+                    fitted += 1
+                    if np.isfinite(aic):
+                        candidates.append((aic, (p, d, q), seasonal_order))
+                        level_aic = min(level_aic, aic)
+
+            if level_aic < best_aic:
+                best_aic, stale_levels = level_aic, 0
+            elif level_aic <= best_aic + aic_margin:
+                stale_levels = 0
+            else:
+                stale_levels += 1
+                if stale_levels >= patience:
+                    break
+
+        # aic is only comparable within one d; keep the candidates close to that d's best
+        shortlist += [c for c in candidates if c[0] <= best_aic + aic_margin]
+
+    if not shortlist:
+        return None
+
+    # stage 2: score the survivors on the same 80/20 backtest the forecast tab shows
+    best = None
+    for aic, order, seasonal_order in sorted(shortlist):
+        mape = _backtest_mape(train, test, order, seasonal_order) if len(values) >= 12 else math.nan
+        fitted += 1
+        score = (mape if np.isfinite(mape) else math.inf, aic)
+        if best is None or score < best[0]:
+            best = (score, order, seasonal_order, aic, mape)
+
+    _, order, seasonal_order, aic, mape = best
+    return {
+        'order': list(order),
+        'seasonal_order': list(seasonal_order),
+        'aic': float(aic),
+        'mape': None if not np.isfinite(mape) else float(mape),
+        'candidates_fitted': fitted,
+    }
+
+def _seasonal_candidates(n_obs, seasonal_period):
+    # seasonal terms only make sense with at least two full seasons of history
+    if not seasonal_period or n_obs < 2 * seasonal_period + 2:
+        return [NO_SEASONAL_ORDER]
+    s = seasonal_period
+    return [NO_SEASONAL_ORDER, (1, 0, 0, s), (0, 0, 1, s), (1, 0, 1, s)]
+
+def _fit_aic(values, order, seasonal_order, trend):
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return ARIMA(values, order=order, seasonal_order=seasonal_order, trend=trend).fit().aic
+    except Exception:
+        return math.inf
+
+def _backtest_mape(train, test, order, seasonal_order):
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model_fit = ARIMA(train, order=order, seasonal_order=seasonal_order).fit()
+            forecast_mean = np.asarray(model_fit.forecast(steps=len(test)))
+    except Exception:
+        return math.nan
+
+    # same mape as the forecast tab (months without sales are left out)
+    actual = np.where(test == 0, np.nan, test)
+    return float(np.nanmean(np.abs(forecast_mean - test) / actual) * 100)
+
+def search_all_orders(monthly_sales, workers=None, **search_args):
+    # each item's search runs in its own worker process
+    items = sorted(monthly_sales['item'].unique())
+    series = [prepare_item_series(monthly_sales, item)['Total_Sales'].to_numpy() for item in items]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_search_job, [(values, search_args) for values in series])
+        return {item: result for item, result in zip(items, results) if result is not None}
+
+def _search_job(job):
+    values, search_args = job
+    return search_item_order(values, **search_args)
+
+def save_item_orders(orders, path):
+    # write to a temporary name first so the app never reads a half-written file
+    path = str(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(orders, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_item_orders(path):
+    # item -> (order, seasonal_order); empty when no search has been run for this data/code version
+    try:
+        with open(path) as f:
+            orders = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {item: (tuple(result['order']), tuple(result['seasonal_order'])) for item, result in orders.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="search arima orders for every item")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--root', default=ARTIFACT_ROOT, help="artifact store directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--max-p', type=int, default=3)
+    parser.add_argument('--max-d', type=int, default=2)
+    parser.add_argument('--max-q', type=int, default=3)
+    parser.add_argument('--seasonal-period', type=int, default=None, help="e.g. 12 to also try seasonal terms")
+    parser.add_argument('--patience', type=int, default=1, help="complexity levels without a shortlisted fit before stopping")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    monthly_sales = load_or_build_artifacts(args.csv, args.root)['monthly_sales']
+    orders = search_all_orders(
+        monthly_sales, workers=args.workers, max_p=args.max_p, max_d=args.max_d, max_q=args.max_q,
+        seasonal_period=args.seasonal_period, patience=args.patience
+    )
+
+    path = artifact_path(args.csv, args.root) / ORDERS_FILE
+    save_item_orders(orders, path)
+    print(f"orders for {len(orders)} items -> {path} ({time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import threading
+import time
+
+class DataRegistry:
+    # named datasets that are computed on first use and then shared by every thread
+    #
+    # providers are registered up front but only run when something asks for their name; each name
+    # has its own lock, so concurrent first requests compute once while other names stay available.
+    # a provider may ask the registry for the datasets it depends on. `wrap(name, provider)`, if given,
+    # decorates every provider as it is registered (e.g. to time it)
+
+    def __init__(self, wrap=None):
+        self._wrap = wrap
+        self._providers = {}
+        self._values = {}
+        self._locks = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, provider):
+        with self._lock:
+            self._providers[name] = self._wrap(name, provider) if self._wrap else provider
+            self._locks[name] = threading.Lock()
+        return provider
+
+    def provides(self, name):
+        # decorator form of register
+        def decorate(provider):
+            return self.register(name, provider)
+        return decorate
+
+    def get(self, name):
+        # fast path: already materialized (in the current generation, see invalidate)
+        values = self._values
+        try:
+            return values[name]
+        except KeyError:
+            pass
+
+        with self._locks[name]:
+            # another thread may have finished it while this one waited
+            if name not in values:
+                start = time.perf_counter()
+                values[name] = self._providers[name]()
+                self._timings[name] = time.perf_counter() - start
+        return values[name]
+
+    __getitem__ = get
+
+    def invalidate(self):
+        # drop every materialized dataset at once (e.g. new data was published); threads holding values
+        # keep using them, and a computation that started before the swap lands in the discarded generation
+        self._values = {}
+        self._timings = {}
+
+    def loaded(self, name):
+        return name in self._values
+
+    def status(self):
+        # which datasets are materialized and how long each took to compute
+        return {
+            name: {'loaded': name in self._values, 'seconds': self._timings.get(name)}
+            for name in self._providers
+        }
+
+    def prewarm(self, names=None, delay=0.0):
+        # materialize datasets in a background thread, e.g. once the server is already answering requests
+        names = list(self._providers) if names is None else list(names)
+
+        def warm():
+            time.sleep(delay)
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    # leave it for the first real request, which will surface the error
+                    pass
+
+        thread = threading.Thread(target=warm, name='data-prewarm', daemon=True)
+        thread.start()
+        return thread
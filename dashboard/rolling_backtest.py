@@ -0,0 +1,147 @@
+import argparse
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from dashboard.artifacts import ARTIFACT_ROOT, artifact_path
+from dashboard.build_artifacts import load_or_build_artifacts
+from dashboard.components.forecast import prepare_item_series, FUTURE_ORDER, NO_SEASONAL_ORDER
+from dashboard.order_search import ORDERS_FILE, load_item_orders
+
+def rolling_backtest(monthly_sales, horizon=3, min_train=6, orders=None, workers=None, cutoffs_per_task=6):
+    # rolling-origin (expanding window) evaluation: forecast `horizon` months ahead from every cutoff
+    # month after the first `min_train`, for every item
+    items = sorted(monthly_sales['item'].unique())
+    orders = orders or {}
+    series = [prepare_item_series(monthly_sales, item)['Total_Sales'] for item in items]
+
+    # cutoffs are split into runs; within a run the fit is extended month by month instead of refit,
+    # and runs (across items and cutoffs) are spread over the worker processes
+    tasks = []
+    for i, (item, sales) in enumerate(zip(items, series)):
+        order, seasonal_order = orders.get(item, (FUTURE_ORDER, NO_SEASONAL_ORDER))
+        cutoffs = list(range(min_train, len(sales)))
+        for start in range(0, len(cutoffs), cutoffs_per_task):
+            run = cutoffs[start:start + cutoffs_per_task]
+            tasks.append((i, sales.to_numpy(dtype=float), run, horizon, order, seasonal_order))
+
+    # (item, cutoff position, mean/lower/upper, step) forecasts and the matching actuals
+    n_cutoffs = max([len(sales) - min_train for sales in series] + [0])
+    forecasts = np.full((len(items), n_cutoffs, 3, horizon), np.nan)
+    actuals = np.full((len(items), n_cutoffs, horizon), np.nan)
+    cutoff_months = np.full((len(items), n_cutoffs), np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for i, run, block in pool.map(_run_cutoffs, tasks):
+            positions = np.asarray(run) - min_train
+            forecasts[i, positions] = block
+
+    for i, sales in enumerate(series):
+        values = sales.to_numpy(dtype=float)
+        for position, cutoff in enumerate(range(min_train, len(values))):
+            steps = min(horizon, len(values) - cutoff)
+            actuals[i, position, :steps] = values[cutoff:cutoff + steps]
+            cutoff_months[i, position] = sales.index[cutoff - 1]
+
+    return score_backtest(items, cutoff_months, forecasts, actuals)
+
+def _run_cutoffs(task):
+    i, values, run, horizon, order, seasonal_order = task
+    block = np.full((len(run), 3, horizon), np.nan)
+    model_fit, fitted_until = None, None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for k, cutoff in enumerate(run):
+            try:
+                if model_fit is None:
+                    model_fit = ARIMA(values[:cutoff], order=order, seasonal_order=seasonal_order).fit()
+                else:
+                    # reuse the fitted parameters and only run the filter over the newly observed months
+                    model_fit = model_fit.append(values[fitted_until:cutoff], refit=False)
+                fitted_until = cutoff
+
+                forecast = model_fit.get_forecast(steps=horizon)
+                conf_int = np.asarray(forecast.conf_int(alpha=0.05))
+                block[k] = [np.asarray(forecast.predicted_mean), conf_int[:, 0], conf_int[:, 1]]
+            except Exception:
+                # leave this cutoff empty and start the next one from a fresh fit
+                model_fit = None
+    return i, run, block
+
+def score_backtest(items, cutoff_months, forecasts, actuals):
+    # every metric is computed over the whole (item, cutoff, step) array at once
+    mean, lower, upper = forecasts[:, :, 0], forecasts[:, :, 1], forecasts[:, :, 2]
+    valid = ~np.isnan(actuals) & ~np.isnan(mean)
+
+    abs_error = np.abs(mean - actuals)
+    # months without sales are left out of the mape, like the forecast tab
+    ape = abs_error / np.where(actuals == 0, np.nan, actuals) * 100
+    covered = np.where(valid, (actuals >= lower) & (actuals <= upper), np.nan)
+    abs_error[~valid] = np.nan
+    ape[~valid] = np.nan
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        summary = pd.DataFrame({
+            'item': items,
+            'forecasts': valid.sum(axis=(1, 2)),
+            'mape': np.nanmean(ape, axis=(1, 2)),
+            'mae': np.nanmean(abs_error, axis=(1, 2)),
+            'coverage': np.nanmean(covered, axis=(1, 2)),
+        })
+        by_horizon = pd.DataFrame({
+            'horizon': np.arange(1, actuals.shape[2] + 1),
+            'forecasts': valid.sum(axis=(0, 1)),
+            'mape': np.nanmean(ape, axis=(0, 1)),
+            'mae': np.nanmean(abs_error, axis=(0, 1)),
+            'coverage': np.nanmean(covered, axis=(0, 1)),
+        })
+
+    # long table of every evaluated forecast
+    item_idx, cutoff_idx, step_idx = np.nonzero(valid)
+    details = pd.DataFrame({
+        'item': np.asarray(items, dtype=object)[item_idx],
+        'cutoff': cutoff_months[item_idx, cutoff_idx],
+        'horizon': step_idx + 1,
+        'actual': actuals[valid],
+        'forecast': mean[valid],
+        'lower': lower[valid],
+        'upper': upper[valid],
+        'abs_error': abs_error[valid],
+        'ape': ape[valid],
+        'covered': covered[valid].astype(bool),
+    })
+    return {'summary': summary, 'by_horizon': by_horizon, 'details': details}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="rolling-origin forecast accuracy report for every item")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--root', default=ARTIFACT_ROOT, help="artifact store directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--horizon', type=int, default=3, help="months forecast from each cutoff")
+    parser.add_argument('--min-train', type=int, default=6, help="months of history before the first cutoff")
+    parser.add_argument('--cutoffs-per-task', type=int, default=6, help="cutoffs evaluated per fit before refitting")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    monthly_sales = load_or_build_artifacts(args.csv, args.root)['monthly_sales']
+    store = artifact_path(args.csv, args.root)
+    report = rolling_backtest(
+        monthly_sales, horizon=args.horizon, min_train=args.min_train,
+        orders=load_item_orders(store / ORDERS_FILE), workers=args.workers,
+        cutoffs_per_task=args.cutoffs_per_task
+    )
+
+    for name, table in report.items():
+        table.to_csv(store / f'backtest_{name}.csv', index=False)
+    print(report['summary'].to_string(index=False))
+    print(report['by_horizon'].to_string(index=False))
+    print(f"report written to {store} ({time.perf_counter() - start:.2f}s)")
+
+if __name__ == "__main__":
+    main()
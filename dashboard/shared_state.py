@@ -0,0 +1,191 @@
+import argparse
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+from dashboard.artifacts import ARTIFACT_ROOT, STORE_FORMAT, code_version, read_manifest
+from dashboard.build_artifacts import build_artifacts
+
+# pointer file naming the published store, and the layout version of that header
+CURRENT_FILE = 'CURRENT'
+# held (flock) by whoever rewrites the header, so a publish and a retirement sweep can't drop each other's change
+LOCK_FILE = 'CURRENT.lock'
+HEADER_FORMAT = 1
+
+# the published version a worker is serving: its number, store directory and manifest (tables are
+# mapped one at a time, as something asks for them)
+PublishedState = namedtuple('PublishedState', ['version', 'path', 'published', 'manifest'])
+
+# one loader process publishes, every worker follows
+#
+# the loader builds a store (dashboard.build_artifacts: one directory of .npy files per csv & code
+# version) and points CURRENT at it. CURRENT is a small versioned json header that is replaced in one
+# os.replace, so a reader sees either the old or the new version, never a mix. workers memory-map the
+# store read-only, so every process shares the same page-cache pages instead of holding its own copy,
+# and a refresh is a new store plus a new header rather than a restart. retired stores are deleted
+# only after a grace period, so workers still serving them finish their requests first
+
+def read_header(root=ARTIFACT_ROOT):
+    # the published header, or None before the first publish (or for an unknown header layout)
+    try:
+        header = json.loads((Path(root) / CURRENT_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if header.get('format') != HEADER_FORMAT:
+        return None
+    return header
+
+def publish(path, root=ARTIFACT_ROOT):
+    # point CURRENT at a built store; returns the new version number (the old one if already current)
+    path = Path(path)
+    if read_manifest(path) is None:
+        raise ValueError(f"{path} is not a complete artifact store")
+
+    with _header_lock(root):
+        header = read_header(root) or {'version': 0, 'path': None, 'retired': []}
+        if header['path'] == path.name:
+            return header['version']
+
+        retired = header.get('retired', [])
+        if header['path'] is not None:
+            retired = retired + [{'path': header['path'], 'retired': time.time()}]
+        new_header = {
+            'format': HEADER_FORMAT,
+            'store_format': STORE_FORMAT,
+            'code_version': code_version(),
+            'version': header['version'] + 1,
+            'path': path.name,
+            'published': time.time(),
+            'retired': retired,
+        }
+        _write_header(new_header, root)
+    return new_header['version']
+
+def collect_retired(root=ARTIFACT_ROOT, grace=600):
+    # delete stores that were replaced more than `grace` seconds ago
+    with _header_lock(root):
+        header = read_header(root)
+        if header is None:
+            return []
+
+        now = time.time()
+        removed, kept = [], []
+        for entry in header.get('retired', []):
+            if entry['path'] != header['path'] and now - entry['retired'] > grace:
+                shutil.rmtree(Path(root) / entry['path'], ignore_errors=True)
+                removed.append(entry['path'])
+            elif entry['path'] != header['path']:
+                kept.append(entry)
+        if removed:
+            header['retired'] = kept
+            _write_header(header, root)
+    return removed
+
+@contextmanager
+def _header_lock(root):
+    # exclusive across processes and threads (every holder opens its own descriptor); readers don't
+    # take it, they only ever see a whole header thanks to the rename in _write_header
+    Path(root).mkdir(parents=True, exist_ok=True)
+    with open(Path(root) / LOCK_FILE, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _write_header(header, root):
+    # write beside the header and swap it in with one rename
+    current = Path(root) / CURRENT_FILE
+    tmp_path = current.with_name(f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(header, indent=2))
+    os.replace(tmp_path, current)
+
+class SharedState:
+    # a worker's view of the published store
+    #
+    # current() rereads the header at most every check_interval seconds (one stat when it hasn't
+    # changed) and reads a newly published store's manifest before swapping it in with a single
+    # assignment, so concurrent readers get either the whole old or the whole new version. a header written by other
+    # code (a different code_version) is ignored, since the tables may not match this code's layout.
+    # on_change(state) runs after every swap (state is None when the published version went away)
+
+    def __init__(self, root=ARTIFACT_ROOT, check_interval=2.0, on_change=None):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self.on_change = on_change
+        self._state = None
+        self._header_stamp = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        # the published state this worker serves right now (None when nothing usable is published)
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.refresh()
+        return self._state
+
+    def refresh(self):
+        # pick up a new header; returns True when the served version changed
+        changed = self._refresh()
+        if changed and self.on_change is not None:
+            self.on_change(self._state)
+        return changed
+
+    def _refresh(self):
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stat = os.stat(self.root / CURRENT_FILE)
+                stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except OSError:
+                stamp = None
+            if stamp == self._header_stamp:
+                return False
+            self._header_stamp = stamp
+
+            header = read_header(self.root) if stamp else None
+            if header is None or header.get('code_version') != code_version():
+                changed, self._state = self._state is not None, None
+                return changed
+            if self._state is not None and self._state.version == header['version']:
+                return False
+
+            path = self.root / header['path']
+            manifest = read_manifest(path)
+            if manifest is None:
+                # the store vanished underneath the header; keep serving what is mapped
+                return False
+            self._state = PublishedState(header['version'], path, header['published'], manifest)
+            return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="build and publish the artifact store that dashboard workers share")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--root', default=ARTIFACT_ROOT, help="artifact store directory")
+    parser.add_argument('--watch', type=float, default=None,
+                        help="keep running and republish whenever the csv changes (poll interval in seconds)")
+    parser.add_argument('--grace', type=float, default=600, help="seconds before a replaced store is deleted")
+    args = parser.parse_args(argv)
+
+    while True:
+        start = time.perf_counter()
+        path = build_artifacts(args.csv, args.root)
+        header = read_header(args.root)
+        if header is None or header['path'] != path.name:
+            version = publish(path, args.root)
+            print(f"published version {version}: {path} ({time.perf_counter() - start:.2f}s)")
+        for removed in collect_retired(args.root, args.grace):
+            print(f"removed retired store {removed}")
+
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+
+if __name__ == "__main__":
+    main()
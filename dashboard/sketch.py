@@ -0,0 +1,342 @@
+import argparse
+import math
+import time
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data_loader import csv_dtypes, date_format, clean_sales_data, load_and_clean_data, build_interaction_matrix
+from dashboard.components.similarity import compute_item_similarity
+from dashboard.components.bundles import score_bundles
+
+# splitmix64 constants (finalizer used to derive one independent hash per signature slot)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+class MinHashSketch:
+    # per-item minhash signatures over the customers who bought the item, built in one streaming pass
+    #
+    # for items a and b with customer sets A and B and k = num_perm slots:
+    #   jaccard |A n B| / |A u B| is the share of equal slots; it is unbiased with standard deviation
+    #   sqrt(J (1 - J) / k), and |J_hat - J| <= sqrt(ln(2 / delta) / (2k)) with probability 1 - delta
+    #   |A u B| is estimated from the slot-wise minimum of both signatures as (k - 1) / sum(min hash in [0, 1)),
+    #   with relative standard deviation about 1 / sqrt(k - 2)
+    #   the co-purchase count |A n B| is J_hat * |A u B|_hat, so its error is roughly J * |A u B| times
+    #   the two relative errors combined (see error_bounds)
+    #
+    # signatures only ever take element-wise minimums, so sketches of any partitions of the transactions
+    # (by time, by customer, per process) merge into exactly the sketch of the whole
+    #
+    # two ways to read pairs out: jaccard / co_purchase estimate every pair (O(n_items^2 k) time and an
+    # n_items^2 result, meant for catalogs up to a few thousand items, e.g. checking against the exact
+    # product); top_co_purchase only estimates the pairs that lsh banding puts in a common bucket, so
+    # its cost follows the number of similar pairs instead, which is the regime for large catalogs
+
+    def __init__(self, num_perm=128, seed=0, block_rows=8192):
+        if num_perm < 3:
+            raise ValueError("num_perm must be at least 3")
+        self.num_perm = num_perm
+        self.seed = seed
+        self.block_rows = block_rows
+        self.seeds = np.random.default_rng(seed).integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self.items = []           # item names in order of first appearance
+        self.item_index = {}      # item name -> signature row
+        self.signatures = np.full((0, num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+
+    @classmethod
+    def from_frame(cls, df, **sketch_args):
+        sketch = cls(**sketch_args)
+        sketch.update(df['customerID'], df['item'])
+        return sketch
+
+    @classmethod
+    def from_csv(cls, csv="retail_sales.csv", chunksize=250_000, **sketch_args):
+        # same chunked, cleaned read as dashboard.streaming; memory follows the chunk size and item count
+        sketch = cls(**sketch_args)
+        dtypes = {**csv_dtypes, 'item': object, 'payment': object}
+        for chunk in pd.read_csv(csv, dtype=dtypes, chunksize=chunksize):
+            chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+            chunk = clean_sales_data(chunk)
+            sketch.update(chunk['customerID'], chunk['item'])
+        return sketch
+
+    def update(self, customer_ids, items):
+        # fold one batch of (customer, item) purchases into the signatures
+        pairs = pd.DataFrame({'customer': np.asarray(customer_ids), 'item': np.asarray(items, dtype=object)})
+        pairs = pairs.drop_duplicates()
+        if pairs.empty:
+            return self
+
+        codes, names = pd.factorize(pairs['item'])
+        rows = self._add_items(names)[codes]
+        customer_hashes = pd.util.hash_array(pairs['customer'].to_numpy())
+
+        # sort by signature row so each block reduces to one minimum per item with reduceat
+        order = np.argsort(rows, kind='stable')
+        for start in range(0, len(order), self.block_rows):
+            block = order[start:start + self.block_rows]
+            block_rows = rows[block]
+            hashes = self._slot_hashes(customer_hashes[block])
+            firsts = np.flatnonzero(np.r_[True, block_rows[1:] != block_rows[:-1]])
+            targets = block_rows[firsts]
+            self.signatures[targets] = np.minimum(self.signatures[targets], np.minimum.reduceat(hashes, firsts, axis=0))
+        return self
+
+    def merge(self, other):
+        # fold another partition's sketch into this one (in place)
+        if (other.num_perm, other.seed) != (self.num_perm, self.seed):
+            raise ValueError("only sketches with the same num_perm and seed can be merged")
+        rows = self._add_items(other.items)
+        self.signatures[rows] = np.minimum(self.signatures[rows], other.signatures[:len(other.items)])
+        return self
+
+    @classmethod
+    def merged(cls, sketches):
+        sketches = list(sketches)
+        if not sketches:
+            raise ValueError("no sketches to merge")
+        result = cls(sketches[0].num_perm, sketches[0].seed, sketches[0].block_rows)
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
+
+    def jaccard(self, block_bytes=64 * 2 ** 20):
+        return self._pairwise(block_bytes)[0]
+
+    def co_purchase(self, block_bytes=64 * 2 ** 20):
+        # estimated customers who bought both items, in the layout of the exact basket.T @ basket frame
+        # (the diagonal is each item's estimated number of customers)
+        return self._pairwise(block_bytes)[1]
+
+    def candidate_pairs(self, threshold=0.1, bands=None):
+        # item pairs (as signature row pairs i < j) that agree on every slot of at least one band.
+        # with b bands of r slots a pair with jaccard J becomes a candidate with probability
+        # 1 - (1 - J^r)^b, an s-curve around (1 / b)^(1 / r); bands defaults to the split that puts
+        # it closest to `threshold`
+        signatures = self.signatures[:len(self.items)]
+        bands = bands or _bands_for(threshold, self.num_perm)
+        width = self.num_perm // bands
+        n_items = len(signatures)
+
+        keys = []
+        for band in range(bands):
+            _, buckets = np.unique(signatures[:, band * width:(band + 1) * width], axis=0, return_inverse=True)
+            keys.append(_bucket_pairs(buckets.ravel(), n_items))
+        keys = np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64)
+        return keys // n_items, keys % n_items
+
+    def pair_estimates(self, first, second, block_bytes=64 * 2 ** 20):
+        # jaccard and co-purchase estimates for the given signature row pairs only, O(pairs k)
+        signatures = self.signatures
+        k = self.num_perm
+        jaccard = np.empty(len(first))
+        union = np.empty(len(first))
+        step = max(1, block_bytes // (k * 8))
+        for start in range(0, len(first), step):
+            a = signatures[first[start:start + step]]
+            b = signatures[second[start:start + step]]
+            jaccard[start:start + step] = (a == b).mean(axis=1)
+            union[start:start + step] = (k - 1) / _uniform(np.minimum(a, b)).sum(axis=1)
+        return jaccard, jaccard * union
+
+    def top_co_purchase(self, top_k=3, threshold=0.1, bands=None):
+        # each item's top_k partners by estimated co-purchase count among its lsh candidates; pairs
+        # below the threshold are mostly never compared, so items bought together by few shared
+        # customers may get fewer than top_k partners
+        first, second = self.candidate_pairs(threshold, bands)
+        jaccard, co_purchase = self.pair_estimates(first, second)
+        names = np.asarray(self.items, dtype=object)
+        pairs = pd.DataFrame({
+            'item': names[np.r_[first, second]],
+            'partner': names[np.r_[second, first]],
+            'co_purchase': np.r_[co_purchase, co_purchase],
+            'jaccard': np.r_[jaccard, jaccard],
+        })
+        pairs = pairs.sort_values(['item', 'co_purchase', 'partner'], ascending=[True, False, True], kind='stable')
+        return pairs.groupby('item', sort=False).head(top_k).reset_index(drop=True)
+
+    def error_bounds(self, delta=0.05):
+        # half-widths that hold with probability about 1 - delta for a single pair
+        k = self.num_perm
+        jaccard = math.sqrt(math.log(2 / delta) / (2 * k))
+        z = NormalDist().inv_cdf(1 - delta / 2)
+        union_relative = z / math.sqrt(k - 2)
+        return {
+            'jaccard': jaccard,                                     # absolute, hoeffding
+            'union_relative': union_relative,                       # relative, normal approximation
+            # |A n B| = J |A u B|: absolute error below (jaccard + J * union_relative) * |A u B|
+            'co_purchase_relative_to_union': jaccard + union_relative,
+        }
+
+    def bundle_recommendations(self, similarity_df, weight=0.5, top_k=3):
+        # bundle scoring on the estimated co-purchase counts instead of the exact basket product
+        return score_bundles(self.co_purchase(), similarity_df, weight=weight, top_k=top_k)
+
+    def _add_items(self, names):
+        # signature rows for the given item names, growing the signature array by doubling when needed
+        for name in names:
+            if name not in self.item_index:
+                self.item_index[name] = len(self.items)
+                self.items.append(name)
+
+        capacity = len(self.signatures)
+        if len(self.items) > capacity:
+            grown = np.full((max(2 * capacity, len(self.items)), self.num_perm),
+                            np.iinfo(np.uint64).max, dtype=np.uint64)
+            grown[:capacity] = self.signatures
+            self.signatures = grown
+        return np.array([self.item_index[name] for name in names], dtype=np.int64)
+
+    def _slot_hashes(self, customer_hashes):
+        # one splitmix64 hash per (customer, slot); uint64 arithmetic wraps around as intended
+        z = customer_hashes[:, None] ^ self.seeds[None, :]
+        z = z + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * _MIX_1
+        z = (z ^ (z >> np.uint64(27))) * _MIX_2
+        return z ^ (z >> np.uint64(31))
+
+    def _pairwise(self, block_bytes):
+        order = sorted(range(len(self.items)), key=self.items.__getitem__)
+        names = pd.Index([self.items[pos] for pos in order], name='item')
+        signatures = self.signatures[order]
+        uniform = _uniform(signatures)
+
+        n_items, k = signatures.shape
+        jaccard = np.empty((n_items, n_items))
+        union = np.empty((n_items, n_items))
+
+        # compare a block of rows against every item at a time; each step holds a (block, items, k) array
+        step = max(1, block_bytes // max(1, n_items * k * 8))
+        for start in range(0, n_items, step):
+            rows = slice(start, min(start + step, n_items))
+            jaccard[rows] = (signatures[rows, None, :] == signatures[None, :, :]).mean(axis=2)
+            union[rows] = (k - 1) / np.minimum(uniform[rows, None, :], uniform[None, :, :]).sum(axis=2)
+
+        return (pd.DataFrame(jaccard, index=names, columns=names),
+                pd.DataFrame(jaccard * union, index=names, columns=names))
+
+def _uniform(signatures):
+    # top 53 bits as a uniform value in [0, 1) for the union cardinality estimate
+    return (signatures >> np.uint64(11)).astype(float) * 2.0 ** -53
+
+def _bands_for(threshold, num_perm):
+    # number of bands (of num_perm // bands slots) whose s-curve midpoint is closest to the threshold
+    return min(range(1, num_perm + 1),
+               key=lambda bands: abs((1 / bands) ** (1 / (num_perm // bands)) - threshold))
+
+def _bucket_pairs(buckets, n_items):
+    # every pair of items sharing a bucket, as i * n_items + j with i < j. items are sorted by bucket and
+    # each is paired with the next 1, 2, ... positions while those stay in the same bucket, so the work
+    # follows the number of pairs produced rather than n_items^2
+    order = np.argsort(buckets, kind='stable')
+    sorted_buckets = buckets[order]
+    keys = []
+    for offset in range(1, n_items):
+        same = np.flatnonzero(sorted_buckets[offset:] == sorted_buckets[:-offset])
+        if not len(same):
+            break
+        i, j = order[same], order[same + offset]
+        keys.append(np.minimum(i, j) * n_items + np.maximum(i, j))
+    return np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+
+def _sketch_partition(job):
+    customer_ids, items, num_perm, seed = job
+    sketch = MinHashSketch(num_perm, seed)
+    return sketch.update(customer_ids, items)
+
+def sketch_partitions(df, partitions=4, workers=None, num_perm=128, seed=0):
+    # sketch row partitions in worker processes and merge the results
+    bounds = np.linspace(0, len(df), partitions + 1).astype(int)
+    jobs = [
+        (df['customerID'].to_numpy()[lo:hi], np.asarray(df['item'], dtype=object)[lo:hi], num_perm, seed)
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return MinHashSketch.merged(pool.map(_sketch_partition, jobs))
+
+def benchmark(df, num_perms=(64, 128, 256), top_k=3, seed=0, threshold=0.1):
+    # accuracy and speed of the sketch against the exact basket.T @ basket used by generate_bundle_recommendations
+    start = time.perf_counter()
+    basket = build_interaction_matrix(df)
+    exact = pd.DataFrame((basket.matrix.T @ basket.matrix).toarray(), index=basket.items, columns=basket.items)
+    exact_seconds = time.perf_counter() - start
+
+    counts = exact.to_numpy()
+    sizes = np.diag(counts)
+    exact_jaccard = counts / (sizes[:, None] + sizes[None, :] - counts)
+    off_diagonal = ~np.eye(len(counts), dtype=bool)
+    bought_together = off_diagonal & (counts > 0)
+
+    similarity_df = compute_item_similarity(build_interaction_matrix(df, values='review'))
+    exact_bundles = score_bundles(exact, similarity_df, top_k=top_k)
+    exact_sets = exact_bundles.groupby('item')['recommended_bundle'].apply(set)
+
+    rows = [{'method': 'exact', 'num_perm': None, 'build_s': exact_seconds, 'estimate_s': 0.0}]
+    for num_perm in num_perms:
+        start = time.perf_counter()
+        sketch = MinHashSketch.from_frame(df, num_perm=num_perm, seed=seed)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        jaccard, co_purchase = sketch._pairwise(64 * 2 ** 20)
+        estimate_seconds = time.perf_counter() - start
+
+        jaccard = jaccard.reindex(index=exact.index, columns=exact.columns).to_numpy()
+        co_purchase = co_purchase.reindex(index=exact.index, columns=exact.columns)
+        jaccard_error = np.abs(jaccard - exact_jaccard)[off_diagonal]
+        count_error = np.abs(co_purchase.to_numpy() - counts)[bought_together] / counts[bought_together]
+
+        # how many of each item's exact top-k bundle partners the sketch also recommends
+        approx_sets = score_bundles(co_purchase, similarity_df, top_k=top_k).groupby('item')['recommended_bundle'].apply(set)
+        overlap = np.mean([len(exact_sets[item] & approx_sets.get(item, set())) / max(1, len(exact_sets[item]))
+                           for item in exact_sets.index])
+
+        # the candidate path: share of all pairs it compares, and of the pairs above the threshold it finds
+        start = time.perf_counter()
+        first, second = sketch.candidate_pairs(threshold)
+        sketch.top_co_purchase(top_k, threshold)
+        lsh_seconds = time.perf_counter() - start
+        rows_order = pd.Index(sketch.items).get_indexer(exact.index)
+        found = np.zeros((len(sketch.items),) * 2, dtype=bool)
+        found[first, second] = found[second, first] = True
+        found = found[np.ix_(rows_order, rows_order)]
+        similar = off_diagonal & (exact_jaccard >= threshold)
+
+        bound = sketch.error_bounds()['jaccard']
+        rows.append({
+            'method': 'minhash', 'num_perm': num_perm, 'build_s': build_seconds, 'estimate_s': estimate_seconds,
+            'jaccard_mae': jaccard_error.mean(), 'jaccard_max': jaccard_error.max(),
+            'jaccard_bound': bound, 'within_bound': (jaccard_error <= bound).mean(),
+            'count_mre': count_error.mean(), f'top{top_k}_overlap': overlap,
+            'lsh_s': lsh_seconds, 'lsh_pairs': len(first) / max(1, off_diagonal.sum() / 2),
+            'lsh_recall': found[similar].mean() if similar.any() else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark approximate co-purchase counting against the exact product")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--num-perm', type=int, nargs='+', default=[64, 128, 256], help="signature sizes to try")
+    parser.add_argument('--partitions', type=int, default=4, help="partitions for the parallel merge check")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threshold', type=float, default=0.1, help="jaccard the lsh candidate search is tuned for")
+    args = parser.parse_args(argv)
+
+    df = load_and_clean_data(args.csv, columnar=True)
+    report = benchmark(df, args.num_perm, seed=args.seed, threshold=args.threshold)
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    # sketches of partitions built in separate processes merge into the single-pass sketch
+    start = time.perf_counter()
+    merged = sketch_partitions(df, args.partitions, args.workers, args.num_perm[0], args.seed)
+    single = MinHashSketch.from_frame(df, num_perm=args.num_perm[0], seed=args.seed)
+    identical = merged.jaccard().equals(single.jaccard())
+    print(f"{args.partitions}-way parallel sketch merged in {time.perf_counter() - start:.2f}s "
+          f"({'identical to' if identical else 'DIFFERS from'} the single-pass sketch)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data_loader import clothing_items, csv_dtypes, date_format, clean_sales_data, interaction_matrix
+from dashboard.components.segmentation import assign_review_level, review_labels
+
+def stream_aggregates(csv="retail_sales.csv", chunksize=250_000, items=clothing_items):
+    # read the export chunk by chunk, folding each cleaned chunk into the dashboard aggregates.
+    # folding a chunk costs time proportional to the chunk: the monthly and segment totals live in
+    # arrays indexed by group code, and the per customer/item pairs (which grow with the data and
+    # end up in the sparse matrices anyway) are combined tree-wise, so each row is re-aggregated
+    # O(log chunks) times instead of once per later chunk
+    catalogue = sorted(items)
+    monthly = _CodedSums(['Total_Sales', 'Units_Sold'], dims=2)
+    segments = _CodedSums(['total_sales', 'units_sold', 'review_sum'], dims=3)
+    pairs = _KeyedSums(['purchases', 'review_sum', 'review_count'])
+
+    # item/payment stay plain strings: per-chunk categoricals would not line up across chunks
+    dtypes = {**csv_dtypes, 'item': object, 'payment': object}
+
+    for chunk in pd.read_csv(csv, dtype=dtypes, chunksize=chunksize):
+        chunk['date'] = pd.to_datetime(chunk['date'], format=date_format)
+        chunk = clean_sales_data(chunk, items)
+        item_codes = pd.Categorical(chunk['item'], categories=catalogue).codes.astype(np.int64)
+        amount = chunk['amount_usd'].to_numpy(dtype=float)
+        review = chunk['review'].to_numpy(dtype=float)
+        reviewed = ~np.isnan(review)
+        ones = np.ones(len(chunk))
+
+        # monthly item totals (prepare_monthly_sales)
+        monthly.add([chunk['item'], chunk['month']], {'Total_Sales': amount, 'Units_Sold': ones})
+
+        # purchases and review sums/counts per customer & item (basket and similarity inputs); purchases
+        # without a customer id drop out like in the groupby this replaces
+        known = chunk['customerID'].notna().to_numpy()
+        customers = chunk['customerID'].to_numpy(dtype=float)[known].astype(np.int64)
+        pairs.add(customers * len(catalogue) + item_codes[known], {
+            'purchases': ones[known],
+            'review_sum': np.where(reviewed, review, 0.0)[known],
+            'review_count': reviewed[known].astype(float),
+        })
+
+        # segmentation groups (the review level only depends on the row, so it can be bucketed per
+        # chunk; rows without a level are left out, as in the groupby)
+        level = assign_review_level(chunk['review'])
+        leveled = level.notna().to_numpy()
+        segments.add([chunk['item'][leveled], chunk['payment'][leveled], level[leveled]], {
+            'total_sales': amount[leveled],
+            'units_sold': ones[leveled],
+            'review_sum': review[leveled],
+        })
+
+    monthly_sales = monthly.frame(['item', 'month'], count='Units_Sold')
+    monthly_sales['Units_Sold'] = monthly_sales['Units_Sold'].astype(np.int64)
+
+    # sparse basket over every purchase, ratings over the reviewed pairs only (as build_interaction_matrix)
+    keys, sums = pairs.result()
+    customer_ids = keys // len(catalogue)
+    item_ids = np.asarray(catalogue, dtype=object)[keys % len(catalogue)]
+    basket = interaction_matrix(customer_ids, item_ids)
+    with_reviews = sums['review_count'] > 0
+    user_item_matrix = interaction_matrix(
+        customer_ids[with_reviews], item_ids[with_reviews],
+        sums=sums['review_sum'][with_reviews], counts=sums['review_count'][with_reviews]
+    )
+
+    return {
+        'monthly_sales': monthly_sales,
+        'user_item_matrix': user_item_matrix,
+        'basket': basket,
+        'segmented_df': _finish_segments(segments, monthly_sales['item'].unique()),
+    }
+
+class _CodedSums:
+    # per-group sums for a small group space (items x months, items x payments x levels) in dense arrays
+    # indexed by one integer code per dimension. labels get codes in order of first appearance, so a
+    # chunk is folded in with one np.add.at and the arrays only grow when new labels show up
+
+    def __init__(self, columns, dims):
+        self.columns = columns
+        self.labels = [{} for _ in range(dims)]
+        self.sums = {column: np.zeros((0,) * dims) for column in columns}
+
+    def add(self, keys, values):
+        codes = tuple(self._codes(labels, key) for labels, key in zip(self.labels, keys))
+        self._grow()
+        for column in self.columns:
+            np.add.at(self.sums[column], codes, values[column])
+
+    def frame(self, names, count):
+        # one row per group with a non-zero `count` column (i.e. at least one row folded in), sorted by the labels
+        orders = [sorted(range(len(labels)), key=list(labels).__getitem__) for labels in self.labels]
+        grid = pd.MultiIndex.from_product([pd.Index(list(labels))[order] for labels, order in zip(self.labels, orders)],
+                                          names=names)
+        frame = pd.DataFrame({column: self.sums[column][np.ix_(*orders)].ravel() for column in self.columns},
+                             index=grid)
+        return frame[frame[count] > 0].reset_index()
+
+    def _codes(self, labels, key):
+        # chunk-local factorize, then map the few distinct labels to their running codes
+        local, uniques = pd.factorize(key)
+        mapping = np.array([labels.setdefault(label, len(labels)) for label in uniques], dtype=np.int64)
+        return mapping[local]
+
+    def _grow(self):
+        # pad every dimension to the number of labels seen (doubling, so growth is amortized)
+        current = self.sums[self.columns[0]].shape
+        wanted = tuple(len(labels) for labels in self.labels)
+        if all(w <= c for w, c in zip(wanted, current)):
+            return
+        shape = tuple(c if w <= c else max(w, 2 * c) for w, c in zip(wanted, current))
+        for column in self.columns:
+            grown = np.zeros(shape)
+            grown[tuple(slice(0, c) for c in current)] = self.sums[column]
+            self.sums[column] = grown
+
+class _KeyedSums:
+    # per-key sums for a group space that grows with the data (customer x item pairs), as a stack of
+    # sorted partial aggregates merged like a binary counter: a part is merged into the one below only
+    # once it is at least as large, so large aggregates are rarely touched by small chunks
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._parts = []   # (sorted unique keys, {column: sums}), largest first
+
+    def add(self, keys, values):
+        part = _aggregate(keys, values, self.columns)
+        while self._parts and len(self._parts[-1][0]) <= len(part[0]):
+            part = _merge(self._parts.pop(), part, self.columns)
+        self._parts.append(part)
+
+    def result(self):
+        part = (np.zeros(0, dtype=np.int64), {column: np.zeros(0) for column in self.columns})
+        while self._parts:
+            part = _merge(self._parts.pop(), part, self.columns)
+        self._parts = [part]
+        return part
+
+def _aggregate(keys, values, columns):
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    return uniques, {column: np.bincount(inverse, weights=values[column], minlength=len(uniques))
+                     for column in columns}
+
+def _merge(a, b, columns):
+    return _aggregate(np.concatenate([a[0], b[0]]),
+                      {column: np.concatenate([a[1][column], b[1][column]]) for column in columns}, columns)
+
+def _finish_segments(segments, items):
+    # same full item x payment x review level grid as segment_sales_by_review_and_payment
+    segments = segments.frame(['item', 'payment', 'review_level'], count='units_sold')
+    segments = segments.set_index(['item', 'payment', 'review_level'])
+    levels = pd.CategoricalIndex(review_labels, categories=review_labels, ordered=True)
+    payments = sorted(segments.index.get_level_values('payment').unique())
+    grid = pd.MultiIndex.from_product(
+        [sorted(items), payments, levels],
+        names=['item', 'payment', 'review_level']
+    )
+    segments = segments.reindex(grid, fill_value=0)
+    segments['units_sold'] = segments['units_sold'].astype(np.int64)
+
+    # average review is only defined for groups with sales
+    segments['avg_review'] = segments['review_sum'] / segments['units_sold'].where(segments['units_sold'] > 0)
+
+    return segments.drop(columns='review_sum').reset_index().sort_values(
+        ['item', 'total_sales'], ascending=[True, False]
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="fold a sales export into the dashboard aggregates chunk by chunk")
+    parser.add_argument('--csv', default="retail_sales.csv", help="source sales export")
+    parser.add_argument('--chunksize', type=int, default=250_000, help="rows read per chunk")
+    parser.add_argument('--memory', action='store_true', help="also report the traced peak allocation")
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    aggregates = stream_aggregates(args.csv, args.chunksize)
+    seconds = time.perf_counter() - start
+
+    basket = aggregates['basket'].matrix
+    print(f"{len(aggregates['monthly_sales'])} item-months, {basket.shape[0]} customers x {basket.shape[1]} items "
+          f"({basket.nnz} pairs), {len(aggregates['segmented_df'])} segments in {seconds:.2f}s")
+    if args.memory:
+        print(f"peak traced memory {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB")
+        tracemalloc.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.cube import GRANULARITIES, SalesCube, SalesRollups
+from dashboard.data_loader import load_and_clean_data, prepare_monthly_sales
+from dashboard.components.segmentation import segment_sales_by_review_and_payment
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+@pytest.fixture(scope='module')
+def sales():
+    return load_and_clean_data(str(CSV), columnar=True)
+
+@pytest.fixture
+def sparse_sales():
+    # few rows, so most payment x review level cells of an item are empty; 'Vest' is only paid in cash
+    # and one purchase has no review (no level)
+    return pd.DataFrame({
+        'customerID': [1, 2, 3, 4, 5, 6],
+        'item': pd.Categorical(['Coat', 'Coat', 'Coat', 'Vest', 'Vest', 'Coat']),
+        'amount_usd': [100.0, 40.0, 60.0, 25.0, 30.0, 80.0],
+        'review': [4.5, 1.0, np.nan, 3.0, 3.2, 4.0],
+        'payment': pd.Categorical(['Cash', 'Credit Card', 'Cash', 'Cash', 'Cash', 'Cash']),
+        'date': pd.to_datetime(['2023-01-05', '2023-01-20', '2023-02-03', '2023-02-10', '2023-03-01', '2023-03-15']),
+        'month': pd.to_datetime(['2023-01-01', '2023-01-01', '2023-02-01', '2023-02-01', '2023-03-01', '2023-03-01']),
+    })
+
+def plain(frame):
+    # categorical labels as plain objects (the cube and the groupby don't keep the same categoricals)
+    frame = frame.reset_index(drop=True)
+    return frame.astype({column: object for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)})
+
+def expected_item_segments(df, item):
+    segments = segment_sales_by_review_and_payment(df)
+    return plain(segments[segments['item'] == item].drop(columns='item'))
+
+def assert_same_item_segments(cube, df, item):
+    result = pd.DataFrame(cube.item_segments(item))
+    pd.testing.assert_frame_equal(result, expected_item_segments(df, item))
+
+def test_item_segments_match_groupby_with_empty_cells(sparse_sales):
+    cube = SalesCube.from_frame(sparse_sales)
+    for item in ['Coat', 'Vest']:
+        assert_same_item_segments(cube, sparse_sales, item)
+
+    # every payment x level cell is listed, the empty ones with zero sales and no average review
+    vest = pd.DataFrame(cube.item_segments('Vest'))
+    assert len(vest) == 2 * 3
+    empty = vest[vest['units_sold'] == 0]
+    assert (empty['total_sales'] == 0).all() and empty['avg_review'].isna().all()
+    assert set(vest.loc[vest['units_sold'] == 0, 'payment']) == {'Cash', 'Credit Card'}
+
+def test_item_segments_match_groupby(sales):
+    cube = SalesCube.from_frame(sales)
+    for item in sales['item'].cat.categories:
+        assert_same_item_segments(cube, sales, item)
+
+    # an unknown item has no segments
+    assert len(pd.DataFrame(cube.item_segments('Umbrella'))) == 0
+
+def test_segments_match_groupby(sparse_sales, sales):
+    for df in [sparse_sales, sales]:
+        result = SalesCube.from_frame(df).segments()
+        expected = segment_sales_by_review_and_payment(df)
+        pd.testing.assert_frame_equal(plain(result), plain(expected))
+
+@pytest.mark.parametrize('granularity', GRANULARITIES)
+def test_rollups_add_up_to_monthly_sales(sales, granularity):
+    rollups = SalesRollups.from_frame(sales)
+    monthly = prepare_monthly_sales(sales).groupby('item', observed=True)[['Total_Sales', 'Units_Sold']].sum()
+    assert list(rollups.items) == list(monthly.index)
+    for item, totals in monthly.iterrows():
+        series = rollups.item_series(item, granularity)
+        assert series['Total_Sales'].sum() == pytest.approx(totals['Total_Sales'])
+        assert series['Units_Sold'].sum() == totals['Units_Sold']
+
+def test_monthly_rollup_matches_monthly_sales(sales):
+    rollups = SalesRollups.from_frame(sales)
+    monthly = prepare_monthly_sales(sales)
+    for item, expected in monthly.groupby('item', observed=True):
+        series = rollups.item_series(item, 'month')
+        np.testing.assert_array_equal(series['period'], expected['month'].to_numpy().astype('datetime64[D]'))
+        np.testing.assert_allclose(series['Total_Sales'], expected['Total_Sales'])
+        np.testing.assert_array_equal(series['Units_Sold'], expected['Units_Sold'])
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.data_loader import load_and_clean_data
+from dashboard.components.customer_insights import (CUSTOMER_PAGE_SIZE, build_customer_index, customer_options,
+                                                    get_customer_purchase_history, history_columns, search_customers)
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+@pytest.fixture(scope='module')
+def sales():
+    return load_and_clean_data(str(CSV), columnar=True)
+
+@pytest.fixture(scope='module')
+def index(sales):
+    return build_customer_index(sales)
+
+def test_history_matches_filter(sales, index):
+    # first, last and a few customers in between, against the per-request filter it replaces
+    for customer_id in [index.customers[0], index.customers[-1], *index.customers[1:-1:997]]:
+        expected = sales[sales['customerID'] == customer_id].sort_values('date', kind='stable')[history_columns]
+        result = get_customer_purchase_history(index, customer_id)
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+def test_unknown_customer_has_empty_history():
+    df = pd.DataFrame({
+        'customerID': [12, 3, 7, 7],
+        'date': pd.to_datetime(['2023-01-01', '2023-02-01', '2023-03-01', '2023-01-15']),
+        'item': ['Coat', 'Vest', 'Coat', 'Tunic'],
+        'amount_usd': [10.0, 20.0, 30.0, 40.0],
+        'review': [4.0, np.nan, 2.0, 5.0],
+        'payment': ['Cash'] * 4,
+    })
+    index = build_customer_index(df)
+    assert get_customer_purchase_history(index, 7)['item'].tolist() == ['Tunic', 'Coat']
+
+    # below the smallest id, above the largest and in the gaps between ids
+    for customer_id in [0, 2, 5, 8, 11, 13]:
+        history = get_customer_purchase_history(index, customer_id)
+        assert history.empty
+        assert list(history.columns) == history_columns
+
+def brute_force_search(index, query):
+    # every id whose string starts with the query, in string order
+    keys = sorted(str(i) for i in index.customers)
+    return [int(key) for key in keys if key.startswith(query)]
+
+def test_prefix_search_matches_brute_force(index):
+    last = index.search_keys[-1]
+    # short and long prefixes, and prefixes at the very end of the sorted key range
+    for query in ['1', '39', '40', '4018', last, last[:-1], last[0], '9']:
+        assert search_customers(index, query, limit=len(index.customers)) == brute_force_search(index, query)
+
+    # past every key, or not an id at all
+    for query in [last + '0', '99999999', 'x']:
+        assert search_customers(index, query) == []
+
+def test_search_is_capped_at_the_page_size(index):
+    assert len(brute_force_search(index, '40')) > CUSTOMER_PAGE_SIZE
+    assert search_customers(index, '40', CUSTOMER_PAGE_SIZE) == brute_force_search(index, '40')[:CUSTOMER_PAGE_SIZE]
+    assert len(search_customers(index, '', CUSTOMER_PAGE_SIZE)) == CUSTOMER_PAGE_SIZE
+
+def test_options_keep_the_current_selection(index):
+    page = search_customers(index, '40', CUSTOMER_PAGE_SIZE)
+    outside = brute_force_search(index, '39')[0]
+
+    options = customer_options(index, '40', outside, CUSTOMER_PAGE_SIZE)
+    assert [o['value'] for o in options] == page + [outside]
+
+    # a selection already on the page, or none at all, adds nothing
+    assert [o['value'] for o in customer_options(index, '40', page[3], CUSTOMER_PAGE_SIZE)] == page
+    assert [o['value'] for o in customer_options(index, '40', None, CUSTOMER_PAGE_SIZE)] == page
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.data_loader import build_interaction_matrix, load_and_clean_data, prepare_monthly_sales
+from dashboard.components.customer_insights import build_customer_index, search_customers
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+@pytest.fixture
+def blank_id_csv(tmp_path):
+    # a slice of the export where one clothing purchase has no customer id
+    raw = pd.read_csv(CSV, dtype=str, keep_default_na=False).head(500)
+    blank = raw.index[raw['item'] == 'Tunic'][0]
+    raw.loc[blank, 'customerID'] = ''
+    path = tmp_path / 'sales.csv'
+    raw.to_csv(path, index=False)
+    return path, raw.loc[blank]
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_blank_customer_id(blank_id_csv, columnar):
+    path, blank = blank_id_csv
+    df = load_and_clean_data(str(path), columnar=columnar)
+
+    # the purchase still counts towards the sales totals
+    assert df['customerID'].isna().sum() == 1
+    month = pd.Timestamp(pd.to_datetime(blank['date'], format='%m/%d/%Y')).to_period('M').to_timestamp()
+    monthly = prepare_monthly_sales(df).set_index(['item', 'month'])
+    expected = df[(df['item'] == 'Tunic') & (df['month'] == month)]['amount_usd'].sum()
+    assert monthly.loc[('Tunic', month), 'Total_Sales'] == expected
+
+    # but everything keyed by customer drops it and keeps integer ids
+    index = build_customer_index(df)
+    assert index.customers.dtype == np.int64
+    assert len(index.history) == len(df) - 1
+    assert all(isinstance(i, int) for i in search_customers(index, '4'))
+    assert '.' not in ''.join(index.search_keys)
+    assert build_interaction_matrix(df).customers.dtype == np.int64
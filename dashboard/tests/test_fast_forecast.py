@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.batch_forecast import batch_forecast
+from dashboard.components.fast_forecast import FAST_MODELS, fast_batch_forecasts, fast_forecasts, holt, naive, seasonal_naive
+from dashboard.components.forecast import backtest_split, prepare_item_series
+from dashboard.data_loader import load_and_clean_data, prepare_monthly_sales
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+@pytest.fixture(scope='module')
+def monthly_sales():
+    return prepare_monthly_sales(load_and_clean_data(str(CSV), columnar=True))
+
+@pytest.fixture
+def constant_sales():
+    # 'Vest' starts ten months after 'Coat', so its series is padded on the left
+    months = pd.date_range('2021-01-01', periods=30, freq='MS')
+    return pd.concat([
+        pd.DataFrame({'item': 'Coat', 'month': months, 'Total_Sales': 250.0, 'Units_Sold': 5}),
+        pd.DataFrame({'item': 'Vest', 'month': months[10:], 'Total_Sales': 80.0, 'Units_Sold': 2}),
+    ], ignore_index=True)
+
+@pytest.mark.parametrize('model', FAST_MODELS)
+def test_constant_series_gives_a_flat_forecast_without_error(constant_sales, model):
+    forecasts = fast_batch_forecasts(constant_sales, model, max_horizon=6)
+    for item, level in [('Coat', 250.0), ('Vest', 80.0)]:
+        for forecast_type in ['future', 'backtest']:
+            mean, lower, upper = batch_forecast(forecasts, item, forecast_type, 6)
+            np.testing.assert_allclose(mean, level)
+            np.testing.assert_allclose(lower, level)
+            np.testing.assert_allclose(upper, level)
+
+def test_holt_continues_a_linear_series():
+    t = np.arange(36.0)
+    series = np.vstack([5 + 3 * t, np.r_[np.full(12, np.nan), 5 + 3 * t[:24]]])
+    mean, variance = holt(series, 6)
+    np.testing.assert_allclose(mean[0], 5 + 3 * np.arange(36, 42), rtol=1e-3)
+    np.testing.assert_allclose(mean[1], 5 + 3 * np.arange(24, 30), rtol=1e-3)
+    # intervals widen with the horizon
+    assert np.all(np.diff(variance, axis=1) > 0)
+
+def test_seasonal_naive_falls_back_to_naive_without_a_full_season():
+    rng = np.random.default_rng(0)
+    series = np.vstack([
+        rng.normal(100, 10, 30),
+        np.r_[np.full(18, np.nan), rng.normal(100, 10, 12)],   # exactly one season: no year to repeat
+    ])
+    mean, variance = seasonal_naive(series, 15)
+    naive_mean, naive_variance = naive(series, 15)
+    np.testing.assert_array_equal(mean[1], naive_mean[1])
+    np.testing.assert_array_equal(variance[1], naive_variance[1])
+    # the longer series repeats its last year
+    np.testing.assert_array_equal(mean[0], series[0, -12:][np.arange(15) % 12])
+
+    # a matrix shorter than a season has no seasonal rows at all
+    mean, variance = seasonal_naive(series[:, -6:], 4)
+    np.testing.assert_array_equal(mean, naive(series[:, -6:], 4)[0])
+
+@pytest.mark.parametrize('model', FAST_MODELS)
+def test_figure_slices_match_the_item_series(monthly_sales, model):
+    forecasts = fast_batch_forecasts(monthly_sales, model, max_horizon=24)
+    assert list(forecasts['items']) == sorted(monthly_sales['item'].unique())
+    for item in forecasts['items']:
+        item_data = prepare_item_series(monthly_sales, item)
+        series = item_data['Total_Sales'].to_numpy()[None, :]
+
+        # the future slice for a horizon is the first `periods` steps of that item's own forecast
+        for periods in [1, 6, 24]:
+            sliced = batch_forecast(forecasts, item, 'future', periods)
+            assert all(part.shape == (periods,) for part in sliced)
+            for part, expected in zip(sliced, fast_forecasts(series, periods, model)):
+                np.testing.assert_allclose(part, expected[0], rtol=1e-9, atol=1e-6)
+        assert batch_forecast(forecasts, item, 'future', 25) is None
+
+        # the backtest slice covers the test split of backtest_split, when there is a year of history
+        backtest = batch_forecast(forecasts, item, 'backtest')
+        if len(item_data) < 12:
+            assert backtest is None
+        else:
+            _, test = backtest_split(item_data)
+            assert all(part.shape == (len(test),) for part in backtest)
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.data_loader import build_interaction_matrix, load_and_clean_data, prepare_monthly_sales
+from dashboard.incremental import IncrementalState
+from dashboard.components.bundles import generate_bundle_recommendations, score_bundles
+from dashboard.components.similarity import compute_item_similarity
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+@pytest.fixture(scope='module')
+def raw():
+    return pd.read_csv(CSV)
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+def test_small_batches_keep_bundles_exact(raw):
+    # after every batch the maintained bundle lists equal a rescoring of every column
+    state = IncrementalState.from_frame(raw.iloc[:1500])
+    rng = np.random.default_rng(0)
+    start = 1500
+    while start < len(raw):
+        size = int(rng.choice([1, 3, 20]))
+        state.update(raw.iloc[start:start + size])
+        start += size
+        expected = score_bundles(state.co_purchase(), state.similarity_df())
+        pd.testing.assert_frame_equal(state.bundle_df().reset_index(drop=True), expected.reset_index(drop=True))
+
+@pytest.mark.filterwarnings('ignore::UserWarning')
+def test_matches_full_recompute(raw):
+    state = IncrementalState.from_frame(raw.iloc[:2000])
+    for start in range(2000, len(raw), 100):
+        state.update(raw.iloc[start:start + 100])
+
+    df = load_and_clean_data(str(CSV))
+    pd.testing.assert_frame_equal(state.monthly_sales(), prepare_monthly_sales(df).astype({'item': object}),
+                                  check_dtype=False)
+    similarity = compute_item_similarity(build_interaction_matrix(df, values='review'))
+    np.testing.assert_allclose(state.similarity_df().to_numpy(), similarity.to_numpy(), atol=1e-12, equal_nan=True)
+    pd.testing.assert_frame_equal(state.bundle_df().reset_index(drop=True),
+                                  generate_bundle_recommendations(df, similarity).reset_index(drop=True))
@@ -0,0 +1,87 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from dashboard.components.forecast import NO_SEASONAL_ORDER
+from dashboard.jobs import JobQueue, forecast_figure
+from dashboard.metrics import metrics
+
+def fail():
+    raise ValueError("no fit")
+
+def answer():
+    return 42
+
+def wait_for(queue, key, attempts=200):
+    for _ in range(attempts):
+        status, value = queue.result(key)
+        if status != 'pending':
+            return status, value
+        time.sleep(0.05)
+    raise AssertionError(f"{key} still pending")
+
+def test_failure_is_kept_until_retried(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.sqlite', workers=1)
+    try:
+        assert queue.run('job', fail) == ('pending', None)
+        assert wait_for(queue, 'job') == ('failed', "ValueError: no fit")
+
+        # every poller sees the failure, and polling does not start the job again
+        assert queue.run('job', answer) == ('failed', "ValueError: no fit")
+        assert queue.result('job') == ('failed', "ValueError: no fit")
+
+        # an explicit new request does
+        assert queue.run('job', answer, retry=True) == ('pending', None)
+        assert wait_for(queue, 'job') == ('done', 42)
+    finally:
+        queue.shutdown()
+
+def test_jobs_are_timed_in_the_submitting_process(tmp_path):
+    metrics.reset()
+    queue = JobQueue(tmp_path / 'jobs.sqlite', workers=1)
+    try:
+        queue.submit('failing', fail)
+        queue.submit('answering', answer)
+        assert wait_for(queue, 'failing')[0] == 'failed'
+        assert wait_for(queue, 'answering')[0] == 'done'
+    finally:
+        queue.shutdown()
+    text = metrics.render()
+    assert 'dashboard_latency_seconds_count{kind="job",name="fail"} 1' in text
+    assert 'dashboard_errors_total{kind="job",name="fail"} 1' in text
+    assert 'dashboard_errors_total{kind="job",name="answer"} 0' in text
+
+def test_job_of_exited_owner_is_taken_over(tmp_path):
+    path = tmp_path / 'jobs.sqlite'
+    # another process claims the job and exits before finishing it
+    subprocess.run([sys.executable, '-c', f"""
+from dashboard.components.forecast import NO_SEASONAL_ORDER
+from dashboard.jobs import JobQueue, forecast_figure
+from dashboard.metrics import metrics
+queue = JobQueue({str(path)!r}, workers=1)
+queue.submit('job', __import__('time').sleep, 2)
+import os; os._exit(0)
+"""], check=True, cwd=Path(__file__).resolve().parents[2])
+
+    queue = JobQueue(path, workers=1)
+    try:
+        assert queue.result('job') == ('pending', None)
+        assert queue.submit('job', answer)
+        assert wait_for(queue, 'job') == ('done', 42)
+    finally:
+        queue.shutdown()
+
+def test_fit_cache_counters_come_back_from_the_workers(tmp_path):
+    csv = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+    queue = JobQueue(tmp_path / 'jobs.sqlite', workers=1)
+    try:
+        # the horizon changes, the fit is the same: a miss, then a hit in the worker's cache
+        for periods in [6, 12]:
+            key = f"forecast:{periods}"
+            queue.submit(key, forecast_figure, str(csv), str(tmp_path), 'Tunic', 'future', periods, None, NO_SEASONAL_ORDER)
+            status, figure = wait_for(queue, key, attempts=2400)
+            assert status == 'done' and figure['data']
+        assert queue.counters('fit_cache_') == {'hits': 1, 'misses': 1, 'evictions': 0, 'coalesced': 0}
+    finally:
+        queue.shutdown()
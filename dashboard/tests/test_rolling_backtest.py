@@ -0,0 +1,52 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.arima.model import ARIMA
+
+from dashboard.components.forecast import FUTURE_ORDER, NO_SEASONAL_ORDER
+from dashboard.rolling_backtest import rolling_backtest
+
+HORIZON, MIN_TRAIN = 2, 8
+
+@pytest.fixture(scope='module')
+def monthly_sales():
+    rng = np.random.default_rng(0)
+    months = pd.date_range('2022-01-01', periods=14, freq='MS')
+    frames = []
+    for item, level in [('Coat', 500.0), ('Vest', 200.0)]:
+        sales = level + np.cumsum(rng.normal(0, level / 10, len(months)))
+        frames.append(pd.DataFrame({'item': item, 'month': months, 'Total_Sales': sales, 'Units_Sold': 1}))
+    return pd.concat(frames, ignore_index=True)
+
+def loop_metrics(values, cutoffs_per_task):
+    # forecast from every cutoff one at a time; the parameters are refit at the start of each run of
+    # cutoffs_per_task cutoffs and only re-filtered over the longer history within it (append(refit=False))
+    ape, abs_error, covered = [], [], []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for position, cutoff in enumerate(range(MIN_TRAIN, len(values))):
+            model = ARIMA(values[:cutoff], order=FUTURE_ORDER, seasonal_order=NO_SEASONAL_ORDER)
+            if position % cutoffs_per_task == 0:
+                params = ARIMA(values[:cutoff], order=FUTURE_ORDER).fit().params
+            forecast = model.filter(params).get_forecast(steps=HORIZON)
+            mean, interval = np.asarray(forecast.predicted_mean), np.asarray(forecast.conf_int(alpha=0.05))
+            actual = values[cutoff:cutoff + HORIZON]
+            steps = len(actual)
+            abs_error += list(np.abs(mean[:steps] - actual))
+            ape += list(np.abs(mean[:steps] - actual) / actual * 100)
+            covered += list((actual >= interval[:steps, 0]) & (actual <= interval[:steps, 1]))
+    return np.mean(ape), np.mean(abs_error), np.mean(covered), len(abs_error)
+
+# 1: a fresh fit per cutoff; 3: fits reused through append(refit=False) within runs of three cutoffs
+@pytest.mark.parametrize('cutoffs_per_task', [1, 3])
+def test_matches_per_cutoff_loop(monthly_sales, cutoffs_per_task):
+    report = rolling_backtest(monthly_sales, horizon=HORIZON, min_train=MIN_TRAIN, workers=2,
+                              cutoffs_per_task=cutoffs_per_task)
+    summary = report['summary'].set_index('item')
+    for item, sales in monthly_sales.groupby('item'):
+        mape, mae, coverage, forecasts = loop_metrics(sales['Total_Sales'].to_numpy(), cutoffs_per_task)
+        assert summary.loc[item, 'forecasts'] == forecasts
+        np.testing.assert_allclose(summary.loc[item, ['mape', 'mae', 'coverage']].to_numpy(dtype=float),
+                                   [mape, mae, coverage], rtol=1e-8)
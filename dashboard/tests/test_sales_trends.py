@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from dashboard.components.sales_trends import lttb
+
+@pytest.fixture(scope='module')
+def series():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000)
+    return x, np.sin(x / 40) * 100 + rng.normal(0, 10, len(x))
+
+@pytest.mark.parametrize('threshold', [3, 10, 137, 999])
+def test_lttb_keeps_threshold_points_including_the_ends(series, threshold):
+    x, y = series
+    keep = lttb(x, y, threshold)
+    assert len(keep) == threshold
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    # one point per bucket, in order
+    assert np.all(np.diff(keep) > 0)
+
+@pytest.mark.parametrize('threshold', [1000, 5000])
+def test_lttb_keeps_short_series_whole(series, threshold):
+    x, y = series
+    np.testing.assert_array_equal(lttb(x, y, threshold), np.arange(len(x)))
+
+def test_lttb_keeps_a_spike(series):
+    # the point making the largest triangle in its bucket survives
+    x, y = series
+    y = y.copy()
+    y[500] = 10_000
+    assert 500 in lttb(x, y, 50)
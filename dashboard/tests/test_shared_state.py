@@ -0,0 +1,37 @@
+import json
+import threading
+
+from dashboard.artifacts import STORE_FORMAT
+from dashboard.shared_state import collect_retired, publish, read_header
+
+def make_store(root, name):
+    path = root / name
+    path.mkdir()
+    (path / 'manifest.json').write_text(json.dumps({'format': STORE_FORMAT, 'artifacts': {}}))
+    return path
+
+def test_retirement_sweep_never_loses_a_publish(tmp_path):
+    stores = [make_store(tmp_path, f'store{i}') for i in range(40)]
+    publishing = threading.Event()
+
+    def sweep():
+        while not publishing.is_set():
+            collect_retired(tmp_path, grace=0)
+
+    sweeper = threading.Thread(target=sweep)
+    sweeper.start()
+    try:
+        for version, store in enumerate(stores, start=1):
+            assert publish(store, tmp_path) == version
+            # the sweep rewrites the header too, but never back to an older version
+            assert read_header(tmp_path)['path'] == store.name
+    finally:
+        publishing.set()
+        sweeper.join()
+
+    collect_retired(tmp_path, grace=0)
+    header = read_header(tmp_path)
+    assert header['version'] == len(stores)
+    assert header['retired'] == []
+    # every replaced store was retired and deleted; only the published one is left
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == [stores[-1].name]
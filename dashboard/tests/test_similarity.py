@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from dashboard.data_loader import build_interaction_matrix, load_and_clean_data
+from dashboard.components.similarity import (build_neighbor_index, compute_item_similarity, generate_similarity_heatmap,
+                                             heatmap_items, similarity_submatrix)
+from dashboard.components.bundles import blockwise_bundle_recommendations, generate_bundle_recommendations
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+def baseline_item_similarity(user_item_matrix):
+    # the original per-pair loop the vectorized version replaces
+    item_mat = user_item_matrix.to_numpy(dtype=float)
+    item_mat_centered = item_mat - np.nanmean(item_mat, axis=0)
+    item_names = user_item_matrix.columns
+    n_items = item_mat_centered.shape[1]
+    similarity_df = pd.DataFrame(index=item_names, columns=item_names, dtype=float)
+    for i in range(n_items):
+        for j in range(n_items):
+            vec_i = item_mat_centered[:, i]
+            vec_j = item_mat_centered[:, j]
+            shared = ~np.isnan(vec_i) & ~np.isnan(vec_j)
+            if np.sum(shared) > 1:
+                sim = cosine_similarity(vec_i[shared].reshape(1, -1), vec_j[shared].reshape(1, -1))[0, 0]
+            else:
+                sim = np.nan
+            similarity_df.iloc[i, j] = sim
+    return similarity_df
+
+def assert_same_similarity(result, expected):
+    assert list(result.index) == list(expected.index)
+    assert list(result.columns) == list(expected.columns)
+    np.testing.assert_allclose(result.to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                               rtol=1e-12, atol=1e-12, equal_nan=True)
+
+@pytest.fixture(scope='module')
+def sales():
+    return load_and_clean_data(str(CSV))
+
+@pytest.fixture
+def synthetic_ratings():
+    # 'flat' is rated the same by everyone (zero norm after centering), 'unrated' has no ratings,
+    # and 'early'/'late' are rated by disjoint customers (no overlap)
+    nan = np.nan
+    return pd.DataFrame({
+        'a':       [5.0, 3.0, 4.0, 1.0, nan, 2.0],
+        'b':       [4.0, 2.0, 5.0, nan, 1.0, 3.0],
+        'flat':    [3.0, 3.0, 3.0, 3.0, nan, nan],
+        'unrated': [nan, nan, nan, nan, nan, nan],
+        'early':   [1.0, 4.0, 2.0, nan, nan, nan],
+        'late':    [nan, nan, nan, 5.0, 2.0, 4.0],
+    }, index=pd.Index(range(6), name='customerID'))
+
+# the unrated item has no mean in either version
+@pytest.mark.filterwarnings('ignore:Mean of empty slice:RuntimeWarning')
+def test_matches_baseline_on_synthetic_edge_cases(synthetic_ratings):
+    expected = baseline_item_similarity(synthetic_ratings)
+    result = compute_item_similarity(synthetic_ratings)
+    assert_same_similarity(result, expected)
+
+    # the edge cases really are exercised
+    assert result.loc['a', 'flat'] == 0.0
+    assert result['unrated'].isna().all()
+    assert np.isnan(result.loc['early', 'late'])
+
+def test_matches_baseline_on_retail_sales(sales):
+    pivot = sales.pivot_table(index='customerID', columns='item', values='review', aggfunc='mean', observed=True)
+    expected = baseline_item_similarity(pivot)
+    assert_same_similarity(compute_item_similarity(pivot), expected)
+
+    # the sparse interaction matrix gives the same matrix without the dense pivot
+    interactions = build_interaction_matrix(sales, values='review')
+    assert_same_similarity(compute_item_similarity(interactions), expected)
+
+def test_neighbor_index_agrees_with_full_matrix(sales):
+    interactions = build_interaction_matrix(sales, values='review')
+    similarity = compute_item_similarity(interactions).to_numpy()
+    index = build_neighbor_index(interactions, k=5, block_size=7)
+    for i, (neighbors, scores) in enumerate(zip(index.neighbors, index.scores)):
+        np.testing.assert_array_equal(scores, similarity[i, neighbors])
+        assert i not in neighbors
+
+def test_submatrix_is_corner_of_full_matrix(sales):
+    interactions = build_interaction_matrix(sales, values='review')
+    items = list(interactions.items[[0, 5, 12]])
+    expected = compute_item_similarity(interactions).loc[items, items]
+    assert_same_similarity(similarity_submatrix(interactions, items), expected)
+
+@pytest.mark.parametrize('block_size', [1, 7, 1024])
+def test_blockwise_bundles_match_dense_scoring(sales, block_size):
+    interactions = build_interaction_matrix(sales, values='review')
+    basket = build_interaction_matrix(sales)
+    expected = generate_bundle_recommendations(sales, compute_item_similarity(interactions), basket)
+    result = blockwise_bundle_recommendations(basket, interactions, block_size=block_size)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+def test_heatmap_notes_when_it_shows_only_the_top_items(sales):
+    interactions = build_interaction_matrix(sales, values='review')
+    n_items = len(interactions.items)
+
+    # a catalogue this small is drawn whole, with no note
+    items = heatmap_items(interactions)
+    assert items == list(interactions.items)
+    title = generate_similarity_heatmap(similarity_submatrix(interactions, items), n_items).layout.title.text
+    assert 'top' not in title
+
+    # above the limit, the most-rated items are drawn and the title says how many of how many
+    items = heatmap_items(interactions, limit=10)
+    ratings = pd.Series(np.diff(interactions.matrix.tocsc().indptr), index=interactions.items)
+    assert set(items) == set(ratings.sort_values(ascending=False, kind='stable').index[:10])
+    title = generate_similarity_heatmap(similarity_submatrix(interactions, items), n_items).layout.title.text
+    assert title.endswith(f"top 10 of {n_items} items by ratings")
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from dashboard.sketch import MinHashSketch
+
+def test_candidate_estimates_match_all_pairs():
+    # items in groups of ten share their customers, so lsh should pair items within a group
+    rng = np.random.default_rng(0)
+    items = rng.integers(0, 200, 20_000)
+    customers = (items // 10) * 50 + rng.integers(0, 60, len(items))
+    sketch = MinHashSketch.from_frame(pd.DataFrame({'customerID': customers, 'item': items}), num_perm=128)
+
+    first, second = sketch.candidate_pairs(threshold=0.3)
+    assert len(first) and (first < second).all()
+    names = np.asarray(sketch.items)
+    assert (names[first] // 10 == names[second] // 10).mean() > 0.9
+
+    jaccard, co_purchase = sketch.pair_estimates(first, second)
+    all_jaccard, all_co_purchase = sketch._pairwise(64 * 2 ** 20)
+    np.testing.assert_array_equal(jaccard, all_jaccard.to_numpy()[names[first], names[second]])
+    np.testing.assert_allclose(co_purchase, all_co_purchase.to_numpy()[names[first], names[second]])
+
+    top = sketch.top_co_purchase(top_k=3, threshold=0.3)
+    assert top.groupby('item').size().max() <= 3
+    assert (top['item'] != top['partner']).all()
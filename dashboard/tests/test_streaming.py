@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.build_artifacts import compute_artifacts
+from dashboard.streaming import stream_aggregates
+
+CSV = Path(__file__).resolve().parents[2] / 'retail_sales.csv'
+
+@pytest.fixture(scope='module')
+def in_memory():
+    return compute_artifacts(str(CSV), names=['monthly_sales', 'user_item_matrix', 'basket', 'segmented_df'])
+
+def plain(frame):
+    # the in-memory pipeline reads item/payment as categoricals, the chunked one as strings
+    frame = frame.reset_index(drop=True)
+    return frame.astype({column: object for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)})
+
+def assert_same_interactions(result, expected):
+    assert list(result.customers) == list(expected.customers)
+    assert list(result.items) == list(expected.items)
+    # same stored pairs; values only differ by float summation order between chunked and one-pass sums
+    assert result.matrix.nnz == expected.matrix.nnz
+    np.testing.assert_allclose(result.matrix.toarray(), expected.matrix.toarray(), rtol=1e-12, atol=1e-12)
+
+# small chunks, so months, customers and segments are split across many of them
+@pytest.mark.parametrize('chunksize', [997, 5000])
+def test_matches_in_memory_pipeline(in_memory, chunksize):
+    streamed = stream_aggregates(str(CSV), chunksize=chunksize)
+
+    pd.testing.assert_frame_equal(plain(streamed['monthly_sales']), plain(in_memory['monthly_sales']))
+    pd.testing.assert_frame_equal(plain(streamed['segmented_df']), plain(in_memory['segmented_df']))
+    assert_same_interactions(streamed['basket'], in_memory['basket'])
+    assert_same_interactions(streamed['user_item_matrix'], in_memory['user_item_matrix'])